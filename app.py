@@ -1,26 +1,62 @@
-
 import os
-import io
+import asyncio
+import time
+from functools import partial
+from typing import List, Optional
 import numpy as np
-from PIL import Image
-import tensorflow as tf
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
-# Configure GPU memory (if available)
-gpus = tf.config.list_physical_devices('GPU')
-if gpus:
-    try:
-        for gpu in gpus:
-            tf.config.experimental.set_memory_growth(gpu, True)
-        # Limit GPU memory to 3.5GB for GTX 1650
-        tf.config.set_logical_device_configuration(
-            gpus[0],
-            [tf.config.LogicalDeviceConfiguration(memory_limit=3500)]
-        )
-    except RuntimeError as e:
-        print(f"GPU configuration error: {e}")
+from serving.archives import extract_images, is_archive
+from serving.backends import artifact_path, load_backend
+from serving.batching import MicroBatcher, QueueFullError
+from serving.faces import DetectionCache, aggregate_faces
+from serving.metrics import RequestMemory, StageTimings, StartupProgress
+from serving.phash_index import PerceptualHashIndex
+from serving.preprocessing import DecodePool, IMAGE_SIZE
+from serving.result_cache import ResultCache, content_key, model_identity
+from serving.uploads import (
+    UnsupportedImageError,
+    UploadLimitMiddleware,
+    UploadTooLargeError,
+    read_upload,
+    sniff_image_type,
+)
+from serving.temporal import SlidingWindowScorer
+from serving.video import FrameSampler, VideoAggregator, sniff_video_type, spool_to_file
+
+# TensorFlow is imported on first use: importing it takes seconds and is not
+# needed to bind the port, answer /health or serve a TFLite model
+tf = None
+
+# Model loading progress, reported by /health and /ready
+startup_progress = StartupProgress()
+
+def import_tensorflow():
+    """Import TensorFlow once, timing it as a startup stage"""
+    global tf
+    if tf is None:
+        with startup_progress.stage("import_tensorflow"):
+            import tensorflow
+        tf = tensorflow
+    return tf
+
+def configure_gpu():
+    """Configure GPU memory (if available)"""
+    import_tensorflow()
+    gpus = tf.config.list_physical_devices('GPU')
+    if gpus:
+        try:
+            for gpu in gpus:
+                tf.config.experimental.set_memory_growth(gpu, True)
+            # Limit GPU memory to 3.5GB for GTX 1650
+            tf.config.set_logical_device_configuration(
+                gpus[0],
+                [tf.config.LogicalDeviceConfiguration(memory_limit=3500)]
+            )
+        except RuntimeError as e:
+            print(f"GPU configuration error: {e}")
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -29,6 +65,20 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Upload limits: /predict files are capped at UPLOAD_MAX_MB; any request body past
+# UPLOAD_MAX_REQUEST_MB is cut off with 413 while it streams in (0 disables the cap),
+# and a /predict upload that is not an image is rejected from its first bytes
+UPLOAD_MAX_MB = float(os.environ.get("UPLOAD_MAX_MB", "10"))
+UPLOAD_MAX_REQUEST_MB = float(os.environ.get("UPLOAD_MAX_REQUEST_MB", "512"))
+
+# Registered before CORSMiddleware, which then wraps it: its 413/400 responses
+# carry CORS headers the browser frontend can read
+app.add_middleware(
+    UploadLimitMiddleware,
+    max_bytes=int(UPLOAD_MAX_REQUEST_MB * 1024 * 1024),
+    image_paths=("/predict",)
+)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -38,9 +88,138 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global variable for model
+# Global variable for model (an inference backend from serving.backends)
 model = None
 
+# Ensemble served instead of the single model when SERVING_MODE=ensemble
+ensemble = None
+
+# Identity of the loaded model (file name, size, mtime); part of every cache key
+model_id = None
+
+# (width, height) the loaded model expects; read from its input layer
+input_size = IMAGE_SIZE
+
+# Inference backend for single-model serving: "keras" (.h5), "savedmodel", "tflite",
+# "tflite_int8" or "onnx" (artifacts written by `python -m src.export_models` next to each .h5)
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "keras")
+INFERENCE_THREADS = int(os.environ["INFERENCE_THREADS"]) if os.environ.get("INFERENCE_THREADS") else None
+
+# Keras models are served through bucketed tf.functions (serving.compiled) warmed at startup;
+# batches are padded up to the nearest bucket so serving never retraces
+INFERENCE_COMPILE = os.environ.get("INFERENCE_COMPILE", "1") == "1"
+INFERENCE_XLA = os.environ.get("INFERENCE_XLA", "0") == "1"
+INFERENCE_BUCKETS = tuple(int(b) for b in os.environ.get("INFERENCE_BUCKETS", "1,4,16,64").split(","))
+
+# Startup mode: "blocking" loads the model before the server accepts connections;
+# "background" binds immediately and loads in a thread while /ready reports progress
+STARTUP_MODE = os.environ.get("STARTUP_MODE", "blocking")
+
+# Serving mode: "single" (one CNN from MODEL_PATHS), "ensemble" (CNN + ResNeXt + LSTM) or
+# "multihead" (the three heads on one shared trunk, src/train_multihead.py; served like a single model)
+# or "student" (the ensemble distilled into one slim CNN, src/train_distill.py)
+SERVING_MODE = os.environ.get("SERVING_MODE", "single")
+MULTIHEAD_MODEL_PATH = os.environ.get("MULTIHEAD_MODEL_PATH", "src/models/multihead_serving.h5")
+STUDENT_MODEL_PATH = os.environ.get("STUDENT_MODEL_PATH", "src/models/student_cnn_best.h5")
+
+# Ensemble settings: "parallel" runs members on separate threads, "fused" runs one combined graph,
+# "cascade" runs the CNN first and escalates only uncertain images to the other members
+ENSEMBLE_STRATEGY = os.environ.get("ENSEMBLE_STRATEGY", "parallel")
+ENSEMBLE_CASCADE_BAND = tuple(float(v) for v in os.environ.get("ENSEMBLE_CASCADE_BAND", "0.3,0.7").split(","))
+ENSEMBLE_LATENCY_BUDGET_MS = float(os.environ["ENSEMBLE_LATENCY_BUDGET_MS"]) if os.environ.get("ENSEMBLE_LATENCY_BUDGET_MS") else None
+ENSEMBLE_MODEL_PATHS = {
+    'cnn': 'src/models/basic_cnn_best.h5',
+    'resnext': 'src/models/resnext_best.h5',
+    'lstm': 'src/models/lstm_best.h5'
+}
+# Weights fitted by src/ensemble_weights.py; equal weights when the file is absent
+ENSEMBLE_WEIGHTS_PATH = os.environ.get("ENSEMBLE_WEIGHTS_PATH", "src/models/ensemble_weights.json")
+
+# Micro-batching queue in front of model.predict
+batcher = None
+
+# Batching settings (override via environment)
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "5"))
+BATCH_MAX_QUEUE = int(os.environ.get("BATCH_MAX_QUEUE", "256"))
+
+# Decode pool settings: "thread" or "process"
+DECODE_POOL = os.environ.get("DECODE_POOL", "thread")
+DECODE_WORKERS = int(os.environ.get("DECODE_WORKERS", str(min(8, os.cpu_count() or 1))))
+DECODE_USE_DRAFT = os.environ.get("DECODE_USE_DRAFT", "1") == "1"
+
+# Background initialization task (STARTUP_MODE=background)
+startup_task = None
+
+# Decode pool and per-stage latency stats
+decode_pool = None
+stage_timings = StageTimings()
+
+# Result cache settings (RESULT_CACHE_SIZE=0 disables the cache)
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "10000"))
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", "86400"))
+RESULT_CACHE_PATH = os.environ.get("RESULT_CACHE_PATH") or None
+
+# Content-hash result cache
+result_cache = None
+
+# Near-duplicate index settings (off by default: a deepfake can hash within a few bits
+# of its real source image and would inherit the source's verdict)
+PHASH_ENABLED = os.environ.get("PHASH_ENABLED", "0") == "1"
+PHASH_FUNCTION = os.environ.get("PHASH_FUNCTION", "phash")  # "phash" or "dhash"
+PHASH_MAX_DISTANCE = int(os.environ.get("PHASH_MAX_DISTANCE", "4"))
+PHASH_MAX_ENTRIES = int(os.environ.get("PHASH_MAX_ENTRIES", "5000000"))
+PHASH_INDEX_PATH = os.environ.get("PHASH_INDEX_PATH") or None
+
+# Perceptual-hash near-duplicate index
+phash_index = None
+
+# /predict/batch limits
+BATCH_ENDPOINT_MAX_FILES = int(os.environ.get("BATCH_ENDPOINT_MAX_FILES", "256"))
+BATCH_ENDPOINT_MAX_FILE_MB = float(os.environ.get("BATCH_ENDPOINT_MAX_FILE_MB", "10"))
+
+# /predict/video settings: frames are sampled by "stride" (every VIDEO_STRIDE_SECONDS)
+# or "scene" (on scene change), scored VIDEO_BATCH_SIZE at a time, and sampling stops
+# early once the running verdict is confident (after at least VIDEO_MIN_FRAMES frames)
+VIDEO_MAX_MB = float(os.environ.get("VIDEO_MAX_MB", "200"))
+VIDEO_SAMPLING = os.environ.get("VIDEO_SAMPLING", "stride")
+VIDEO_STRIDE_SECONDS = float(os.environ.get("VIDEO_STRIDE_SECONDS", "0.5"))
+VIDEO_SCENE_THRESHOLD = float(os.environ.get("VIDEO_SCENE_THRESHOLD", "0.25"))
+VIDEO_MAX_FRAMES = int(os.environ.get("VIDEO_MAX_FRAMES", "300"))
+VIDEO_MIN_FRAMES = int(os.environ.get("VIDEO_MIN_FRAMES", "16"))
+VIDEO_BATCH_SIZE = int(os.environ.get("VIDEO_BATCH_SIZE", "16"))
+VIDEO_SEGMENT_SECONDS = float(os.environ.get("VIDEO_SEGMENT_SECONDS", "2"))
+VIDEO_EARLY_STOP = os.environ.get("VIDEO_EARLY_STOP", "1") == "1"
+
+# Video model: "frame" scores sampled frames with the image model; "temporal" runs the
+# temporal LSTM (src/train_temporal_lstm.py) over sliding windows of CNN frame embeddings.
+# Its windows assume the training stride, so keep VIDEO_STRIDE_SECONDS in step with it.
+VIDEO_MODEL = os.environ.get("VIDEO_MODEL", "frame")
+TEMPORAL_ENCODER_PATH = os.environ.get("TEMPORAL_ENCODER_PATH", "src/models/temporal_encoder.h5")
+TEMPORAL_LSTM_PATH = os.environ.get("TEMPORAL_LSTM_PATH", "src/models/temporal_lstm_best.h5")
+TEMPORAL_HOP = int(os.environ.get("TEMPORAL_HOP", "4"))
+
+# Frame encoder and LSTM head backends (VIDEO_MODEL=temporal)
+temporal_encoder = None
+temporal_head = None
+
+# Face stage (FACE_DETECTION=1): /predict detects faces, classifies each crop and combines
+# the per-face scores (FACE_AGGREGATION: "min", "mean" or "max"); images without a
+# detected face fall back to whole-image classification
+FACE_DETECTION = os.environ.get("FACE_DETECTION", "0") == "1"
+FACE_DETECTOR = os.environ.get("FACE_DETECTOR", "haar")  # "haar" or "yunet"
+FACE_DETECTOR_MODEL = os.environ.get("FACE_DETECTOR_MODEL") or None
+FACE_AGGREGATION = os.environ.get("FACE_AGGREGATION", "min")
+FACE_MARGIN = float(os.environ.get("FACE_MARGIN", "0.25"))
+FACE_MAX = int(os.environ.get("FACE_MAX", "8"))
+FACE_CACHE_SIZE = int(os.environ.get("FACE_CACHE_SIZE", "10000"))
+
+# Face boxes by upload content (independent of the classifier, so they survive model swaps)
+detection_cache = None
+
+# Per-request peak memory (upload + decode buffers)
+request_memory = RequestMemory()
+
 # Model path - check multiple locations
 MODEL_PATHS = [
     "deepfake_cnn_gpu.h5",
@@ -48,15 +227,94 @@ MODEL_PATHS = [
     "src/models/basic_cnn_final.h5"
 ]
 
+def model_input_size(keras_model):
+    """(width, height) expected by a Keras image model, or the API default"""
+    shape = keras_model.input_shape
+    if shape[1] is None or shape[2] is None:
+        return IMAGE_SIZE
+    return (shape[2], shape[1])
+
+def load_ensemble():
+    """Load the CNN, ResNeXt and LSTM members for ensemble serving"""
+    global ensemble, model_id, input_size
+    
+    # Both modules import TensorFlow, so they are only imported when the ensemble is served
+    configure_gpu()
+    from serving.compiled import CompiledPredictor
+    from src.model_ensemble import EnsembleModel
+    
+    member_wrapper = None
+    if INFERENCE_COMPILE:
+        member_wrapper = partial(CompiledPredictor, buckets=INFERENCE_BUCKETS, jit_compile=INFERENCE_XLA)
+    ensemble = EnsembleModel(
+        model_paths=ENSEMBLE_MODEL_PATHS,
+        cascade_band=ENSEMBLE_CASCADE_BAND,
+        member_wrapper=member_wrapper,
+        # The fused strategy only calls the fused graph: don't trace and warm every member too
+        wrap_members=(ENSEMBLE_STRATEGY != "fused")
+    )
+    sizes = {model_input_size(m) for m in ensemble.models.values()}
+    if len(sizes) != 1:
+        raise RuntimeError(f"Ensemble members expect different input sizes: {sizes}")
+    input_size = sizes.pop()
+    if ENSEMBLE_STRATEGY == "fused":
+        ensemble.fuse()
+    model_id = "ensemble:" + "+".join(model_identity(path) for path in ENSEMBLE_MODEL_PATHS.values())
+    if ENSEMBLE_WEIGHTS_PATH and os.path.exists(ENSEMBLE_WEIGHTS_PATH):
+        combination = ensemble.load_combination(ENSEMBLE_WEIGHTS_PATH)
+        print(f"Ensemble uses {combination['method']} weights from {ENSEMBLE_WEIGHTS_PATH}")
+        # Different weights give different scores: keep cached results apart
+        model_id += ":" + model_identity(ENSEMBLE_WEIGHTS_PATH)
+
+def compiled_stats():
+    """Trace/compile counters of the tf.function inference path, if in use"""
+    if ensemble is not None:
+        if ensemble.fused_predictor is not None:
+            return {"fused": ensemble.fused_predictor.stats()}
+        return {name: p.stats() for name, p in ensemble.predictors.items()} or None
+    if model is not None and getattr(model, "stats", None):
+        return model.stats()
+    return None
+
+def is_model_loaded() -> bool:
+    return model is not None or ensemble is not None
+
 def load_model():
     """Load the trained CNN model"""
-    global model
+    global model, model_id, input_size
     
-    for model_path in MODEL_PATHS:
+    if SERVING_MODE == "ensemble":
+        load_ensemble()
+        return
+    
+    if INFERENCE_BACKEND in ("keras", "savedmodel"):
+        # Probing GPUs starts the TensorFlow runtime, so only do it when TF will run the model
+        configure_gpu()
+    elif INFERENCE_BACKEND.startswith("tflite"):
+        try:
+            import tflite_runtime.interpreter  # noqa: F401
+        except ImportError:
+            import_tensorflow()
+    
+    candidates = {"multihead": [MULTIHEAD_MODEL_PATH], "student": [STUDENT_MODEL_PATH]}
+    for h5_path in candidates.get(SERVING_MODE, MODEL_PATHS):
+        model_path = artifact_path(h5_path, INFERENCE_BACKEND)
         if os.path.exists(model_path):
-            print(f"Loading model from: {model_path}")
+            print(f"Loading model from: {model_path} ({INFERENCE_BACKEND} backend)")
             try:
-                model = tf.keras.models.load_model(model_path)
+                options = {}
+                if INFERENCE_BACKEND == "keras":
+                    options = {
+                        "compiled": INFERENCE_COMPILE,
+                        "buckets": INFERENCE_BUCKETS,
+                        "jit_compile": INFERENCE_XLA
+                    }
+                elif INFERENCE_BACKEND.startswith("tflite"):
+                    options = {"buckets": INFERENCE_BUCKETS}
+                with startup_progress.stage("load_model"):
+                    model = load_backend(INFERENCE_BACKEND, model_path, num_threads=INFERENCE_THREADS, **options)
+                model_id = model_identity(model_path)
+                input_size = model.input_size or IMAGE_SIZE
                 print("Model loaded successfully!")
                 return
             except Exception as e:
@@ -65,32 +323,252 @@ def load_model():
     
     raise RuntimeError("No trained model found! Please train the CNN model first.")
 
-def preprocess_image(image: Image.Image) -> np.ndarray:
+def load_temporal_model():
+    """Load the frame encoder and temporal LSTM head for /predict/video"""
+    global temporal_encoder, temporal_head
+    import_tensorflow()
+    with startup_progress.stage("load_temporal_model"):
+        temporal_encoder = load_backend("keras", TEMPORAL_ENCODER_PATH, num_threads=INFERENCE_THREADS,
+                                        compiled=INFERENCE_COMPILE, buckets=INFERENCE_BUCKETS)
+        temporal_head = load_backend("keras", TEMPORAL_LSTM_PATH, num_threads=INFERENCE_THREADS,
+                                     compiled=INFERENCE_COMPILE, buckets=INFERENCE_BUCKETS)
+    with startup_progress.stage("warm_up"):
+        temporal_encoder.warm_up()
+        temporal_head.warm_up()
+    print(f"Temporal video model loaded (window {temporal_head.model.input_shape[1]} frames)")
+
+def format_prediction(prediction: float) -> dict:
+    """Build the /predict response body for a single sigmoid score"""
+    # Convert to percentage
+    confidence = float(prediction) * 100
+    
+    # Determine label (sigmoid output: 0 = Fake, 1 = Real)
+    # prediction > 0.5 means closer to 1 (Real)
+    is_real = bool(prediction > 0.5)
+    label = "Real" if is_real else "Fake"
+    
+    # Adjust confidence for display
+    # If Real (p > 0.5), confidence is p * 100
+    # If Fake (p <= 0.5), confidence is (1 - p) * 100
+    display_confidence = confidence if is_real else (100 - confidence)
+    
+    return {
+        "success": True,
+        "prediction": label,
+        "confidence": round(display_confidence, 2),
+        "raw_score": round(float(prediction), 4),
+        "details": {
+            "is_fake": not is_real,
+            "fake_probability": round(100 - confidence, 2),
+            "real_probability": round(confidence, 2)
+        }
+    }
+
+def lookup_near_duplicate(hash_value):
+    """Return (score, distance) of a previously scored near-identical image, or None"""
+    if phash_index is None or hash_value is None:
+        return None
+    return phash_index.query(hash_value, PHASH_MAX_DISTANCE)
+
+def warm_up_model():
+    """Run the model once (and trace every tf.function bucket) before taking traffic"""
+    with startup_progress.stage("warm_up"):
+        if model is not None:
+            model.warm_up()
+        elif ensemble is not None:
+            width, height = input_size
+            predict_batch(np.zeros((1, height, width, 3), dtype=np.float32))
+
+def require_ready():
+    """Raise 503 unless the model is loaded and the batching queue is running"""
+    if batcher is not None and startup_progress.ready:
+        return
+    if startup_progress.state == "failed":
+        detail = f"Model failed to load: {startup_progress.error}"
+    elif startup_progress.state in ("starting", "loading"):
+        detail = "Model is still loading, retry shortly"
+    else:
+        detail = "Model not loaded"
+    raise HTTPException(status_code=503, detail=detail)
+
+def predict_batch(batch: np.ndarray) -> list:
+    """
+    Run one forward pass over a stacked batch of preprocessed images
+    
+    Returns:
+        One (score, extra) tuple per image. extra holds additional response
+        fields (per-member ensemble scores) or is None.
     """
-    Preprocess image for CNN model
-    - Resize to 224x224
-    - Convert to RGB
-    - Normalize to [0, 1]
+    if ensemble is None:
+        return [(float(p[0]), None) for p in model.predict(batch)]
+    
+    if ENSEMBLE_STRATEGY == "cascade":
+        combined, stages = ensemble.predict_cascade(batch)
+        return [
+            (float(combined[i][0]), {"ensemble": {"stage": str(stages[i]), "dropped": []}})
+            for i in range(len(batch))
+        ]
+    
+    if ENSEMBLE_STRATEGY == "fused":
+        combined, members = ensemble.predict_fused(batch)
+        dropped = []
+    else:
+        combined, members, dropped = ensemble.predict_parallel(
+            batch, latency_budget_ms=ENSEMBLE_LATENCY_BUDGET_MS
+        )
+    
+    rows = []
+    for i in range(len(batch)):
+        extra = {"ensemble": {
+            "members": {name: round(float(pred[i][0]), 4) for name, pred in members.items()},
+            "dropped": dropped
+        }}
+        rows.append((float(combined[i][0]), extra))
+    return rows
+
+def is_cacheable(extra) -> bool:
+    """Scores computed without every ensemble member are not reused"""
+    return not (extra and extra["ensemble"]["dropped"])
+
+async def predict_faces(contents, cache_key):
     """
-    # Convert to RGB if needed
-    if image.mode != 'RGB':
-        image = image.convert('RGB')
+    Face stage for /predict: detect, crop and classify every face as one batch
+    
+    Face boxes are cached by upload content; per-face scores go in the result
+    cache under "<cache_key>:face<i>", so a repeated upload skips both stages.
     
-    # Resize to model input size
-    image = image.resize((224, 224))
+    Returns:
+        The response body, or None when no face was found (the caller then
+        classifies the whole image)
+    """
+    detection_key = content_key(contents, f"faces:{FACE_DETECTOR}:{FACE_MAX}")
+    boxes = detection_cache.get(detection_key)
+    if boxes is not None and not boxes:
+        return None
     
-    # Convert to numpy array and normalize
-    img_array = np.array(image, dtype=np.float32) / 255.0
+    scores, timings = None, {}
+    if boxes is not None and cache_key is not None:
+        cached = [await result_cache.aget(f"{cache_key}:face{i}") for i in range(len(boxes))]
+        if all(score is not None for score in cached):
+            scores = cached
     
-    # Add batch dimension
-    img_array = np.expand_dims(img_array, axis=0)
+    if scores is None:
+        crops, detected, timings = await decode_pool.crop_faces(
+            contents,
+            boxes=boxes,
+            detector_kind=FACE_DETECTOR,
+            detector_model=FACE_DETECTOR_MODEL,
+            margin=FACE_MARGIN,
+            max_faces=FACE_MAX
+        )
+        if boxes is None:
+            detection_cache.put(detection_key, detected)
+            boxes = detected
+        if not boxes:
+            stage_timings.record_all(timings)
+            return None
+        
+        infer_start = time.perf_counter()
+        predictions = await batcher.run_batch(crops)
+        timings["inference_ms"] = (time.perf_counter() - infer_start) * 1000.0
+        stage_timings.record_all(timings)
+        scores = [score for score, _ in predictions]
+        if cache_key is not None and all(is_cacheable(extra) for _, extra in predictions):
+            for i, score in enumerate(scores):
+                result_cache.put(f"{cache_key}:face{i}", score)
     
-    return img_array
+    response = format_prediction(aggregate_faces(scores, FACE_AGGREGATION))
+    response["faces"] = [
+        {
+            "box": {"x": box[0], "y": box[1], "width": box[2], "height": box[3]},
+            "detector_score": box[4],
+            "raw_score": round(float(score), 4),
+            "prediction": "Real" if score > 0.5 else "Fake"
+        }
+        for box, score in zip(boxes, scores)
+    ]
+    response["face_aggregation"] = FACE_AGGREGATION
+    if timings:
+        response["timing"] = {stage: round(ms, 2) for stage, ms in timings.items()}
+    else:
+        response["cached"] = True
+    return response
+
+async def initialize():
+    """Load and warm the model, then start the caches, decode pool and batching queue"""
+    global batcher, decode_pool, result_cache, phash_index, detection_cache
+    # Under serve_prefork.py the model may already be loaded in the parent process
+    if not is_model_loaded():
+        await asyncio.to_thread(load_model)
+    await asyncio.to_thread(warm_up_model)
+    if VIDEO_MODEL == "temporal" and temporal_head is None:
+        await asyncio.to_thread(load_temporal_model)
+    if RESULT_CACHE_SIZE > 0:
+        result_cache = ResultCache(
+            max_entries=RESULT_CACHE_SIZE,
+            ttl_seconds=RESULT_CACHE_TTL,
+            disk_path=RESULT_CACHE_PATH
+        )
+    if PHASH_ENABLED:
+        if PHASH_INDEX_PATH and os.path.exists(PHASH_INDEX_PATH):
+            phash_index = PerceptualHashIndex.load(
+                PHASH_INDEX_PATH, model_id=model_id, max_entries=PHASH_MAX_ENTRIES
+            )
+        else:
+            phash_index = PerceptualHashIndex(max_entries=PHASH_MAX_ENTRIES)
+    if FACE_DETECTION:
+        detection_cache = DetectionCache(max_entries=FACE_CACHE_SIZE)
+    decode_pool = DecodePool(
+        kind=DECODE_POOL,
+        workers=DECODE_WORKERS,
+        target_size=input_size,
+        use_draft=DECODE_USE_DRAFT,
+        hash_name=PHASH_FUNCTION if PHASH_ENABLED else None
+    )
+    batcher = MicroBatcher(
+        predict_batch,
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS,
+        max_queue_size=BATCH_MAX_QUEUE
+    )
+    await batcher.start()
+    startup_progress.mark_ready()
+    print(f"Ready: {startup_progress.summary()['stage_seconds']}")
+
+async def initialize_in_background():
+    try:
+        await initialize()
+    except Exception as e:
+        startup_progress.mark_failed(e)
+        print(f"Startup failed: {e}")
 
 @app.on_event("startup")
 async def startup_event():
-    """Load model on startup"""
-    load_model()
+    """Load model and start the batching queue on startup"""
+    global startup_task
+    if STARTUP_MODE == "background":
+        # Bind now; requests get 503 with progress until initialization finishes
+        startup_task = asyncio.create_task(initialize_in_background())
+        return
+    try:
+        await initialize()
+    except Exception as e:
+        startup_progress.mark_failed(e)
+        raise
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the batching queue and decode pool"""
+    if startup_task is not None and not startup_task.done():
+        startup_task.cancel()
+    if batcher is not None:
+        await batcher.stop()
+    if decode_pool is not None:
+        decode_pool.shutdown()
+    if result_cache is not None:
+        result_cache.close()
+    if phash_index is not None and PHASH_INDEX_PATH:
+        phash_index.save(PHASH_INDEX_PATH, model_id=model_id)
 
 @app.get("/")
 async def root():
@@ -98,15 +576,44 @@ async def root():
     return {
         "message": "Deepfake Detection API",
         "status": "running",
-        "model_loaded": model is not None
+        "model_loaded": is_model_loaded()
     }
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (liveness: answers as soon as the server is bound)"""
     return {
         "status": "healthy",
-        "model_loaded": model is not None
+        "model_loaded": is_model_loaded(),
+        "startup": startup_progress.summary(),
+        "serving_mode": SERVING_MODE,
+        "worker_pid": os.getpid(),
+        "backend": model.name if model is not None else "keras",
+        "batching": batcher.metrics() if batcher is not None else None,
+        "cache": result_cache.stats() if result_cache is not None else None,
+        "face_detection": detection_cache.stats() if detection_cache is not None else None,
+        "near_duplicates": phash_index.stats() if phash_index is not None else None
+    }
+
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 200 once the model is loaded and warm, 503 with progress before that"""
+    summary = startup_progress.summary()
+    status_code = 200 if startup_progress.ready and batcher is not None else 503
+    return JSONResponse(status_code=status_code, content=summary)
+
+@app.get("/metrics")
+async def metrics():
+    """Inference queue depth and batching statistics"""
+    require_ready()
+    return {
+        "batching": batcher.metrics(),
+        "compiled": compiled_stats(),
+        "ensemble_member_latency_ms": ensemble.member_latency_ms if ensemble is not None else None,
+        "cascade": ensemble.cascade_stats() if ensemble is not None and ENSEMBLE_STRATEGY == "cascade" else None,
+        "stages": stage_timings.summary(),
+        "memory": request_memory.summary(),
+        "decode_pool": {"kind": decode_pool.kind, "workers": decode_pool.workers}
     }
 
 @app.post("/predict")
@@ -120,8 +627,7 @@ async def predict(file: UploadFile = File(...)):
     Returns:
         JSON with prediction result and confidence
     """
-    if model is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
+    require_ready()
     
     # Validate file type
     if not file.content_type.startswith('image/'):
@@ -130,48 +636,351 @@ async def predict(file: UploadFile = File(...)):
             detail="Invalid file type. Please upload an image file."
         )
     
+    # Read the upload into one buffer, rejecting oversized files and non-images
+    # from their first bytes
     try:
-        # Read image file
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
+        contents, _ = await read_upload(file, int(UPLOAD_MAX_MB * 1024 * 1024))
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        cache_key = content_key(contents, model_id) if result_cache is not None else None
         
-        # Preprocess image
-        processed_image = preprocess_image(image)
+        # Face stage: classify face crops instead of the whole image
+        if FACE_DETECTION:
+            response = await predict_faces(contents, cache_key)
+            if response is not None:
+                request_memory.record(len(contents))
+                return JSONResponse(content=response)
         
-        # Make prediction
-        prediction = model.predict(processed_image, verbose=0)[0][0]
+        # Repeated uploads skip decode and inference entirely
+        if cache_key is not None:
+            cached = await result_cache.aget(cache_key)
+            if cached is not None:
+                request_memory.record(len(contents))
+                response = format_prediction(cached)
+                response["cached"] = True
+                return JSONResponse(content=response)
         
-        # Convert to percentage
-        confidence = float(prediction) * 100
+        # Decode and preprocess in the worker pool
+        processed_image, timings, hash_value, peak_bytes = await decode_pool.decode(contents)
+        request_memory.record(peak_bytes)
         
-        # Determine label (sigmoid output: 0 = Fake, 1 = Real)
-        # prediction > 0.5 means closer to 1 (Real)
-        is_real = prediction > 0.5
-        label = "Real" if is_real else "Fake"
+        # Re-encoded or resized copies of a scored image reuse its verdict
+        # (the index scan holds a lock, so it runs off the event loop)
+        near_duplicate = None
+        if phash_index is not None and hash_value is not None:
+            near_duplicate = await asyncio.to_thread(lookup_near_duplicate, hash_value)
+        if near_duplicate is not None:
+            score, distance = near_duplicate
+            stage_timings.record_all(timings)
+            if cache_key is not None:
+                result_cache.put(cache_key, score)
+            response = format_prediction(score)
+            response["near_duplicate"] = {"hit": True, "distance": distance}
+            return JSONResponse(content=response)
         
-        # Adjust confidence for display
-        # If Real (p > 0.5), confidence is p * 100
-        # If Fake (p <= 0.5), confidence is (1 - p) * 100
-        display_confidence = confidence if is_real else (100 - confidence)
+        # Make prediction (coalesced with concurrent requests)
+        infer_start = time.perf_counter()
+        prediction, extra = await batcher.submit(processed_image)
+        timings["inference_ms"] = (time.perf_counter() - infer_start) * 1000.0
+        stage_timings.record_all(timings)
         
-        return JSONResponse(content={
-            "success": True,
-            "prediction": label,
-            "confidence": round(display_confidence, 2),
-            "raw_score": round(float(prediction), 4),
-            "details": {
-                "is_fake": not is_real,
-                "fake_probability": round(100 - confidence, 2),
-                "real_probability": round(confidence, 2)
-            }
-        })
+        if is_cacheable(extra):
+            if cache_key is not None:
+                result_cache.put(cache_key, prediction)
+            if hash_value is not None:
+                phash_index.add(hash_value, prediction)
         
+        response = format_prediction(prediction)
+        if extra:
+            response.update(extra)
+        response["timing"] = {stage: round(ms, 2) for stage, ms in timings.items()}
+        return JSONResponse(content=response)
+        
+    except QueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry shortly."
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error processing image: {str(e)}"
         )
 
+@app.post("/predict/batch")
+async def predict_batch_endpoint(files: List[UploadFile] = File(...)):
+    """
+    Predict many images in one request
+    
+    Accepts any number of image files and/or zip/tar archives of images.
+    Images are decoded in parallel and scored as a single batch.
+    
+    Args:
+        files: Uploaded image files or archives
+    
+    Returns:
+        JSON with one result per image, in upload order. Each result has the
+        same shape as /predict, plus "filename"; failures carry "error" instead.
+    """
+    require_ready()
+    
+    max_member_bytes = int(BATCH_ENDPOINT_MAX_FILE_MB * 1024 * 1024)
+    
+    # Expand archives into (filename, contents, error) entries
+    entries = []
+    for file in files:
+        if is_archive(file.filename, file.content_type):
+            # Read members straight from the spooled upload rather than copying the archive
+            file.file.seek(0)
+            try:
+                # Decompression is blocking work: keep it off the event loop
+                members = await asyncio.to_thread(
+                    extract_images,
+                    file.file,
+                    # One past the limit so an oversized archive trips the 413 below
+                    max_files=BATCH_ENDPOINT_MAX_FILES - len(entries) + 1,
+                    max_member_bytes=max_member_bytes
+                )
+            except ValueError as e:
+                entries.append((file.filename, None, str(e)))
+                continue
+            for name, data, error in members:
+                if data is not None and sniff_image_type(data) is None:
+                    data, error = None, "File is not a supported image"
+                entries.append((f"{file.filename}/{name}", data, error))
+        elif not (file.content_type or "").startswith('image/'):
+            entries.append((file.filename, None, "Invalid file type. Please upload an image file."))
+        else:
+            try:
+                contents, _ = await read_upload(file, max_member_bytes)
+            except (UploadTooLargeError, UnsupportedImageError) as e:
+                entries.append((file.filename, None, str(e)))
+            else:
+                entries.append((file.filename, contents, None))
+        
+        if len(entries) > BATCH_ENDPOINT_MAX_FILES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Too many images in one request (max {BATCH_ENDPOINT_MAX_FILES})"
+            )
+    
+    results = [None] * len(entries)
+    cache_keys = {}
+    
+    # Serve repeated uploads from the cache
+    pending = []
+    for i, (name, data, error) in enumerate(entries):
+        if error is not None:
+            results[i] = {"filename": name, "success": False, "error": error}
+            continue
+        if result_cache is not None:
+            cache_keys[i] = content_key(data, model_id)
+            cached = await result_cache.aget(cache_keys[i])
+            if cached is not None:
+                results[i] = {"filename": name, **format_prediction(cached), "cached": True}
+                continue
+        pending.append(i)
+    
+    # Decode in parallel in the worker pool
+    decoded = await asyncio.gather(
+        *(decode_pool.decode(entries[i][1]) for i in pending),
+        return_exceptions=True
+    )
+    
+    # One scan of the near-duplicate index per upload, all off the event loop
+    near_duplicates = [None] * len(decoded)
+    if phash_index is not None:
+        near_duplicates = await asyncio.to_thread(
+            lambda: [None if isinstance(item, Exception) else lookup_near_duplicate(item[2]) for item in decoded]
+        )
+    arrays, array_index, hash_values = [], [], {}
+    for i, item, near_duplicate in zip(pending, decoded, near_duplicates):
+        if isinstance(item, Exception):
+            results[i] = {
+                "filename": entries[i][0],
+                "success": False,
+                "error": f"Error processing image: {str(item)}"
+            }
+        else:
+            array, timings, hash_value, peak_bytes = item
+            stage_timings.record_all(timings)
+            request_memory.record(peak_bytes)
+            if near_duplicate is not None:
+                score, distance = near_duplicate
+                results[i] = {
+                    "filename": entries[i][0],
+                    **format_prediction(score),
+                    "near_duplicate": {"hit": True, "distance": distance}
+                }
+                continue
+            arrays.append(array)
+            array_index.append(i)
+            hash_values[i] = hash_value
+    
+    # One forward pass over every decoded image
+    if arrays:
+        try:
+            infer_start = time.perf_counter()
+            predictions = await batcher.run_batch(np.concatenate(arrays, axis=0))
+            stage_timings.record("batch_inference_ms", (time.perf_counter() - infer_start) * 1000.0)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error running model: {str(e)}")
+        for i, (prediction, extra) in zip(array_index, predictions):
+            results[i] = {"filename": entries[i][0], **format_prediction(prediction), **(extra or {})}
+            if not is_cacheable(extra):
+                continue
+            if i in cache_keys:
+                result_cache.put(cache_keys[i], prediction)
+            if hash_values[i] is not None:
+                phash_index.add(hash_values[i], prediction)
+    
+    failed = sum(1 for result in results if not result["success"])
+    return JSONResponse(content={
+        "success": True,
+        "count": len(results),
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "results": results
+    })
+
+@app.post("/predict/video")
+async def predict_video(file: UploadFile = File(...), sampling: Optional[str] = None):
+    """
+    Predict if an uploaded video is real or fake
+    
+    Frames are decoded one at a time, sampled by stride or scene change,
+    scored in batches and combined into a running verdict; sampling stops
+    early once that verdict is confident.
+    
+    Args:
+        file: Uploaded video (MP4/MOV, MKV/WebM or AVI)
+        sampling: "stride" or "scene" (defaults to VIDEO_SAMPLING; the temporal
+            model always samples by stride)
+    
+    Returns:
+        JSON with the video-level prediction (same fields as /predict), plus
+        "video" with sampling details and a per-segment "timeline"
+    """
+    require_ready()
+    
+    file.file.seek(0)
+    container = sniff_video_type(file.file.read(16))
+    if container is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid file type. Please upload an MP4, MOV, MKV, WebM or AVI video."
+        )
+    
+    temporal = VIDEO_MODEL == "temporal"
+    if temporal and sampling == "scene":
+        raise HTTPException(
+            status_code=400,
+            detail="The temporal video model needs evenly spaced frames; use sampling=stride"
+        )
+    
+    try:
+        import cv2  # noqa: F401
+    except ImportError:
+        raise HTTPException(
+            status_code=501,
+            detail="Video support is not installed (pip install opencv-python-headless)"
+        )
+    
+    try:
+        path = await asyncio.to_thread(
+            spool_to_file, file.file, int(VIDEO_MAX_MB * 1024 * 1024), os.path.splitext(file.filename or "")[1]
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    timings = {"decode_ms": 0.0, "inference_ms": 0.0}
+    aggregator = VideoAggregator(segment_seconds=VIDEO_SEGMENT_SECONDS, min_frames=VIDEO_MIN_FRAMES)
+    scorer = None
+    if temporal:
+        # Each frame is encoded once; overlapping windows reuse the cached embeddings
+        scorer = SlidingWindowScorer(
+            temporal_encoder.predict, temporal_head.predict,
+            window=temporal_head.model.input_shape[1], hop=TEMPORAL_HOP
+        )
+    stopped_early = False
+    try:
+        try:
+            sampler = await asyncio.to_thread(
+                FrameSampler, path, temporal_encoder.input_size if temporal else input_size,
+                mode="stride" if temporal else (sampling or VIDEO_SAMPLING),
+                stride_seconds=VIDEO_STRIDE_SECONDS,
+                scene_threshold=VIDEO_SCENE_THRESHOLD,
+                max_frames=VIDEO_MAX_FRAMES
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        try:
+            while True:
+                # Only one batch of model-sized frames is held at a time
+                decode_start = time.perf_counter()
+                pixels, timestamps = await asyncio.to_thread(sampler.next_batch, VIDEO_BATCH_SIZE)
+                timings["decode_ms"] += (time.perf_counter() - decode_start) * 1000.0
+                if not timestamps:
+                    break
+                
+                infer_start = time.perf_counter()
+                frames = pixels.astype(np.float32) / 255.0
+                if scorer is not None:
+                    windows = await asyncio.to_thread(scorer.push, frames, timestamps)
+                    aggregator.update([end for end, _ in windows], [score for _, score in windows])
+                else:
+                    predictions = await batcher.run_batch(frames)
+                    aggregator.update(timestamps, [score for score, _ in predictions])
+                timings["inference_ms"] += (time.perf_counter() - infer_start) * 1000.0
+                
+                if VIDEO_EARLY_STOP and aggregator.converged and not sampler.exhausted:
+                    stopped_early = True
+                    break
+            
+            if scorer is not None:
+                # Clips shorter than one window get a single padded window
+                windows = await asyncio.to_thread(scorer.flush)
+                aggregator.update([end for end, _ in windows], [score for _, score in windows])
+        finally:
+            sampler.close()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing video: {str(e)}"
+        )
+    finally:
+        os.unlink(path)
+    
+    if aggregator.count == 0:
+        raise HTTPException(status_code=400, detail="No frames could be decoded from the video")
+    
+    stage_timings.record("video_decode_ms", timings["decode_ms"])
+    stage_timings.record("video_inference_ms", timings["inference_ms"])
+    
+    response = format_prediction(aggregator.mean)
+    response["video"] = {
+        "container": container,
+        "fps": round(sampler.fps, 3),
+        "duration_s": round(sampler.duration, 3) if sampler.duration else None,
+        "sampling": sampler.mode,
+        "frames_read": sampler.position,
+        "model": VIDEO_MODEL,
+        "frames_scored": sampler.sampled if temporal else aggregator.count,
+        "temporal": scorer.stats() if scorer is not None else None,
+        "stopped_early": stopped_early,
+        "standard_error": round(aggregator.standard_error, 4) if aggregator.count > 1 else None,
+        "timeline": aggregator.timeline()
+    }
+    response["timing"] = {stage: round(ms, 2) for stage, ms in timings.items()}
+    return JSONResponse(content=response)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
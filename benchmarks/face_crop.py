@@ -0,0 +1,122 @@
+# benchmarks/face_crop.py
+"""
+Added latency and accuracy change of the face detection + crop stage.
+
+Every labelled image is classified twice with the same backend: once with
+the whole image resized to the model input (the default /predict path), and
+once through serving.faces (detect, crop each face, classify the crops as a
+batch, aggregate). Images with no detected face fall back to the whole-image
+score, as the API does.
+
+Run from the project root (needs opencv-python-headless<5 for the haar detector):
+    python benchmarks/face_crop.py --data data/Dataset/Test --limit 500
+    python benchmarks/face_crop.py --detector yunet --detector-model face_detection_yunet_2023mar.onnx
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serving.backends import artifact_path, load_backend  # noqa: E402
+from serving.faces import aggregate_faces, detect_and_crop  # noqa: E402
+from serving.preprocessing import decode_image_bytes, normalize  # noqa: E402
+
+CLASS_NAMES = ["Fake", "Real"]
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def labelled_images(data_dir, limit):
+    """(path, label) pairs, alternating classes so a --limit keeps them balanced."""
+    per_class = [
+        sorted(p for p in (Path(data_dir) / name).rglob("*") if p.suffix.lower() in IMAGE_EXTENSIONS)
+        for name in CLASS_NAMES
+    ]
+    items = []
+    for pair in zip(*per_class):
+        items.extend((path, label) for label, path in enumerate(pair))
+    return items[:limit] if limit else items
+
+
+def percentiles(values):
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "mean_ms": round(float(np.mean(values)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the face detection + crop stage")
+    parser.add_argument("--data", default="data/Dataset/Test", help="Directory with Fake/ and Real/ subfolders")
+    parser.add_argument("--model", default="src/models/basic_cnn_best.h5")
+    parser.add_argument("--backend", default="keras")
+    parser.add_argument("--detector", default="haar", choices=["haar", "yunet"])
+    parser.add_argument("--detector-model", default=None)
+    parser.add_argument("--aggregation", default="min", choices=["min", "mean", "max"])
+    parser.add_argument("--margin", type=float, default=0.25)
+    parser.add_argument("--limit", type=int, default=500)
+    args = parser.parse_args()
+
+    backend = load_backend(args.backend, artifact_path(args.model, args.backend))
+    backend.warm_up()
+    target_size = backend.input_size
+
+    whole_ms, face_ms, detect_ms = [], [], []
+    whole_correct = face_correct = with_faces = faces_total = 0
+    images = labelled_images(args.data, args.limit)
+    if not images:
+        sys.exit(f"No labelled images under {args.data}")
+
+    for path, label in images:
+        contents = path.read_bytes()
+
+        start = time.perf_counter()
+        pixels, _, _, _ = decode_image_bytes(contents, target_size)
+        whole_score = float(backend.predict(normalize(pixels))[0][0])
+        whole_ms.append((time.perf_counter() - start) * 1000.0)
+
+        start = time.perf_counter()
+        crops, boxes, timings = detect_and_crop(
+            contents, target_size, detector_kind=args.detector, detector_model=args.detector_model,
+            margin=args.margin
+        )
+        if boxes:
+            scores = backend.predict(crops.astype(np.float32) / 255.0)[:, 0]
+            face_score = aggregate_faces(scores, args.aggregation)
+            with_faces += 1
+            faces_total += len(boxes)
+        else:
+            face_score = whole_score
+        # Fallback images would be decoded and classified again by the API
+        elapsed = (time.perf_counter() - start) * 1000.0
+        face_ms.append(elapsed + (0.0 if boxes else whole_ms[-1]))
+        detect_ms.append(timings.get("detect_ms", 0.0))
+
+        whole_correct += int((whole_score > 0.5) == bool(label))
+        face_correct += int((face_score > 0.5) == bool(label))
+
+    n = len(images)
+    report = {
+        "images": n,
+        "detector": args.detector,
+        "aggregation": args.aggregation,
+        "images_with_faces": with_faces,
+        "faces_per_image": round(faces_total / with_faces, 2) if with_faces else 0.0,
+        "whole_image": {"accuracy": round(whole_correct / n, 4), **percentiles(whole_ms)},
+        "face_crops": {"accuracy": round(face_correct / n, 4), **percentiles(face_ms)},
+        "detect_only": percentiles(detect_ms),
+    }
+    report["added_p50_ms"] = round(report["face_crops"]["p50_ms"] - report["whole_image"]["p50_ms"], 2)
+    report["accuracy_gain"] = round(report["face_crops"]["accuracy"] - report["whole_image"]["accuracy"], 4)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# benchmarks/input_pipeline.py
+"""
+Throughput of the training input pipeline (src/data_utils.py) per configuration.
+
+Each configuration iterates one split for a few epochs, without a model, in
+a fresh process so that peak RSS is its own. The first epoch pays for
+decoding (and fills a cache); later epochs show the steady state.
+
+Configurations:
+    legacy_float32   image_dataset_from_directory + float32 .cache() (old data_utils)
+    fixed_4x1        no cache, 4 parallel decodes, prefetch 1 (old train_cnn/train_lstm)
+    stream           no cache, autotuned under the budget
+    ram              uint8 in-memory cache, autotuned
+    disk             uint8 tf.data cache files under --disk-cache, autotuned
+    shards           dataset_cache.py shards (skipped unless materialized)
+
+Run from the project root:
+    python benchmarks/input_pipeline.py --data data/Dataset --split Validation --img-size 160
+    python benchmarks/input_pipeline.py --configs stream ram --ram-budget-mb 2000 --epochs 3
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CONFIGS = ("legacy_float32", "fixed_4x1", "stream", "ram", "disk", "shards")
+
+
+def legacy_dataset(split_dir, img_size, batch):
+    import tensorflow as tf
+
+    ds = tf.keras.preprocessing.image_dataset_from_directory(
+        split_dir, image_size=img_size, batch_size=batch, shuffle=True
+    )
+    ds = ds.map(lambda x, y: (tf.cast(x, tf.float32) / 255.0, y), num_parallel_calls=tf.data.AUTOTUNE)
+    return ds.cache().prefetch(tf.data.AUTOTUNE)
+
+
+def build(config, args, disk_cache):
+    """(dataset, plan description) for one configuration."""
+    from src.data_utils import describe_plan, make_split_dataset, plan_pipeline
+    from src.dataset_cache import list_split, read_meta
+
+    img_size = (args.img_size, args.img_size)
+    if config == "legacy_float32":
+        return legacy_dataset(os.path.join(args.data, args.split), img_size, args.batch), "float32 cache in RAM"
+
+    meta = read_meta(args.data, args.split, img_size)
+    count = meta["count"] if meta else len(list_split(args.data, args.split)[0])
+    options = {"ram_budget_mb": args.ram_budget_mb}
+    if config == "fixed_4x1":
+        options.update(parallel_calls=4, prefetch=1)
+    elif config == "disk":
+        options["disk_cache"] = disk_cache
+    plan = plan_pipeline({"Train": count}, img_size, args.batch, materialized=(config == "shards"), **options)
+    if config in ("fixed_4x1", "stream"):
+        plan["cache"] = None
+    elif config == "disk":
+        plan["cache"], plan["disk_cache"] = "disk", disk_cache
+    elif config == "ram":
+        plan["cache"] = "ram"
+
+    if config == "shards":
+        ds = make_split_dataset(args.data, args.split, img_size, args.batch, shuffle=True, plan=plan)
+    else:
+        # Hide any materialized shards so the JPEG path is what gets measured
+        ds = make_split_dataset(args.data, args.split, img_size, args.batch, shuffle=True, plan=plan,
+                                cache_root=os.path.join(disk_cache, "no-shards"))
+    return ds, describe_plan(plan)
+
+
+def run_config(config, args):
+    """Runs in a fresh process; returns the configuration's report."""
+    disk_cache = tempfile.mkdtemp(prefix="pipeline-bench-")
+    try:
+        ds, description = build(config, args, disk_cache)
+        epochs = []
+        for _ in range(args.epochs):
+            start = time.perf_counter()
+            batches = images = 0
+            for x, _ in ds:
+                batches += 1
+                images += int(x.shape[0])
+            elapsed = time.perf_counter() - start
+            epochs.append({
+                "seconds": round(elapsed, 2),
+                "batches_per_second": round(batches / elapsed, 2),
+                "images_per_second": round(images / elapsed, 1),
+            })
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {
+            "config": config,
+            "pipeline": description,
+            "batches_per_epoch": batches,
+            "epochs": epochs,
+            "peak_rss_mb": round(peak_kb / 1024.0, 1),
+        }
+    finally:
+        shutil.rmtree(disk_cache, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark input pipeline configurations")
+    parser.add_argument("--data", default="data/Dataset", help="Directory with Train/Validation/Test")
+    parser.add_argument("--split", default="Validation")
+    parser.add_argument("--img-size", type=int, default=160)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--epochs", type=int, default=2, help="First epoch is cold; later ones are steady state")
+    parser.add_argument("--ram-budget-mb", type=int, default=None, help="Default: half of physical memory")
+    parser.add_argument("--configs", nargs="+", default=list(CONFIGS), choices=CONFIGS)
+    args = parser.parse_args()
+
+    from src.dataset_cache import read_meta
+
+    reports = []
+    for config in args.configs:
+        if config == "shards" and read_meta(args.data, args.split, (args.img_size, args.img_size)) is None:
+            print(f"{config}: skipped (run python -m src.dataset_cache --data-dir {args.data} "
+                  f"--img-size {args.img_size} first)")
+            continue
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            report = pool.submit(run_config, config, args).result()
+        reports.append(report)
+        rates = ", ".join(f"{epoch['batches_per_second']:.1f}" for epoch in report["epochs"])
+        print(f"{config:15s} batches/s per epoch: {rates}  peak RSS {report['peak_rss_mb']:.0f} MB"
+              f"  [{report['pipeline']}]")
+        sys.stdout.flush()
+
+    print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# benchmarks/multihead_vs_ensemble.py
+"""
+Latency and accuracy of the shared-trunk multi-head model against the
+three-model ensemble it replaces.
+
+Latency (random inputs, per batch size, median and p90 over --runs calls):
+    ensemble_sequential  the three members called one after another
+    ensemble_fused       the members in one Keras graph (EnsembleModel.fuse)
+    multihead            one forward pass through the shared trunk and heads
+
+Accuracy: one pass over the test split, scoring every member / head and the
+equal-weight average of each model family.
+
+Train the models first (src/train_cnn.py, train_resnext.py, train_lstm.py,
+train_multihead.py), then run from the project root:
+    python benchmarks/multihead_vs_ensemble.py --data data/Dataset --batch-sizes 1 8 32
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tensorflow as tf  # noqa: E402
+
+from src.data_utils import make_split_dataset  # noqa: E402
+from src.eval_metrics import StreamingBinaryMetrics  # noqa: E402
+from src.model_ensemble import EnsembleModel  # noqa: E402
+from src.latency import time_calls  # noqa: E402
+from src.model_multihead import HEADS  # noqa: E402
+
+MEMBER_PATHS = {
+    'cnn': 'src/models/basic_cnn_best.h5',
+    'resnext': 'src/models/resnext_best.h5',
+    'lstm': 'src/models/lstm_best.h5'
+}
+MULTIHEAD_PATH = "src/models/multihead_best.h5"
+
+
+def as_numpy(outputs):
+    outputs = outputs if isinstance(outputs, (list, tuple)) else [outputs]
+    return [np.asarray(output) for output in outputs]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-head model vs three-model ensemble")
+    parser.add_argument("--data", default="data/Dataset", help="Directory with Train/Validation/Test")
+    parser.add_argument("--split", default="Test")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--eval-batch", type=int, default=32)
+    parser.add_argument("--skip-accuracy", action="store_true")
+    parser.add_argument("--out", default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    ensemble = EnsembleModel(model_paths=MEMBER_PATHS)
+    multihead = tf.keras.models.load_model(MULTIHEAD_PATH, compile=False)
+    shape = tuple(multihead.input_shape[1:])
+    img_size = shape[:2]
+
+    members = {name: tf.function(m, reduce_retracing=True) for name, m in ensemble.models.items()}
+    fused = tf.function(ensemble.fuse(), reduce_retracing=True)
+    heads = tf.function(multihead, reduce_retracing=True)
+    configs = {
+        "ensemble_sequential": lambda x: [members[name](x, training=False) for name in members],
+        "ensemble_fused": lambda x: fused(x, training=False),
+        "multihead": lambda x: heads(x, training=False),
+    }
+
+    report = {
+        "parameters": {
+            "ensemble": int(sum(m.count_params() for m in ensemble.models.values())),
+            "multihead": int(multihead.count_params()),
+        },
+        "latency": {},
+    }
+    print(f"Parameters: ensemble {report['parameters']['ensemble']:,}, "
+          f"multihead {report['parameters']['multihead']:,}")
+
+    rng = np.random.default_rng(0)
+    for batch_size in args.batch_sizes:
+        x = tf.constant(rng.random((batch_size,) + shape, dtype=np.float32))
+        report["latency"][batch_size] = {}
+        for name, fn in configs.items():
+            result = time_calls(fn, x, args.runs)
+            report["latency"][batch_size][name] = result
+            print(f"batch {batch_size:3d}  {name:20s} p50 {result['p50_ms']:8.2f} ms  p90 {result['p90_ms']:8.2f} ms")
+
+    if not args.skip_accuracy:
+        names = [f"member_{n}" for n in members] + ["ensemble_average"] + [f"head_{n}" for n in HEADS] + ["multihead_average"]
+        metrics = {name: StreamingBinaryMetrics() for name in names}
+        dataset = make_split_dataset(args.data, args.split, img_size, args.eval_batch)
+        for x_batch, y_batch in dataset:
+            member_scores = as_numpy(fused(x_batch, training=False))
+            head_scores = as_numpy(heads(x_batch, training=False))
+            for name, score in zip(members, member_scores):
+                metrics[f"member_{name}"].update(y_batch, score)
+            for name, score in zip(HEADS, head_scores):
+                metrics[f"head_{name}"].update(y_batch, score)
+            metrics["ensemble_average"].update(y_batch, sum(member_scores) / len(member_scores))
+            metrics["multihead_average"].update(y_batch, sum(head_scores) / len(head_scores))
+
+        report["accuracy"] = {}
+        for name, m in metrics.items():
+            result = m.result()
+            report["accuracy"][name] = {key: result[key] for key in ("accuracy", "loss", "roc_auc", "pr_auc")}
+            print(f"{name:20s} accuracy {result['accuracy']:.4f}  loss {result['loss']:.4f}  "
+                  f"ROC-AUC {result['roc_auc']:.4f}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
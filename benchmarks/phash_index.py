@@ -0,0 +1,96 @@
+# benchmarks/phash_index.py
+"""
+Lookup latency of serving/phash_index.py's PerceptualHashIndex at serving
+scale (PHASH_MAX_ENTRIES defaults to 5M).
+
+The index is filled with random 64-bit hashes the way the API fills it at
+startup (PerceptualHashIndex.load on a saved .npz), then queried with
+near-duplicates of stored hashes at each --distances value. Distances up to
+MAX_INDEXED_DISTANCE use the band tables; "scan" compares every entry, for
+reference. Also reports the table build time and add() throughput.
+
+Run from the project root:
+    python benchmarks/phash_index.py --entries 5000000
+    python benchmarks/phash_index.py --entries 1000000 --distances 4 8 --queries 500
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from serving.phash_index import HASH_BITS, PerceptualHashIndex  # noqa: E402
+
+
+def near_duplicates(hashes, distance, count, rng):
+    """Stored hashes with `distance` random bits flipped."""
+    queries = []
+    for value in hashes[rng.integers(0, len(hashes), count)]:
+        value = int(value)
+        for bit in rng.choice(HASH_BITS, size=distance, replace=False):
+            value ^= 1 << int(bit)
+        queries.append(value)
+    return queries
+
+
+def time_queries(index, queries, max_distance):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        index.query(query, max_distance)
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return {"p50_ms": round(float(np.median(samples)), 3), "p90_ms": round(float(np.percentile(samples, 90)), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PerceptualHashIndex lookup latency at scale")
+    parser.add_argument("--entries", type=int, default=5_000_000)
+    parser.add_argument("--distances", type=int, nargs="+", default=[4, 8, 12])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--adds", type=int, default=100_000, help="add() calls timed after loading")
+    parser.add_argument("--out", default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    hashes = rng.integers(0, 1 << 63, size=args.entries, dtype=np.int64).view(np.uint64) << np.uint64(1)
+    hashes |= rng.integers(0, 2, size=args.entries, dtype=np.int64).view(np.uint64)
+    scores = rng.random(args.entries, dtype=np.float32)
+
+    report = {"entries": args.entries, "numpy": np.__version__, "lookup": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index.npz")
+        np.savez(path, hashes=hashes, scores=scores, next=np.int64(0), model_id=np.str_(""))
+        start = time.perf_counter()
+        index = PerceptualHashIndex.load(path, max_entries=args.entries)
+        report["load_s"] = round(time.perf_counter() - start, 2)
+    print(f"{args.entries:,} entries loaded and indexed in {report['load_s']:.2f}s (numpy {np.__version__})")
+
+    print(f"{'distance':>10s} {'p50':>10s} {'p90':>10s}")
+    for distance in args.distances:
+        queries = near_duplicates(hashes, distance, args.queries, rng)
+        report["lookup"][distance] = time_queries(index, queries, distance)
+        latency = report["lookup"][distance]
+        print(f"{distance:>10d} {latency['p50_ms']:>8.3f}ms {latency['p90_ms']:>8.3f}ms")
+    report["lookup"]["scan"] = time_queries(index, near_duplicates(hashes, 4, 20, rng), HASH_BITS)
+    latency = report["lookup"]["scan"]
+    print(f"{'scan':>10s} {latency['p50_ms']:>8.3f}ms {latency['p90_ms']:>8.3f}ms")
+
+    start = time.perf_counter()
+    for value in hashes[:args.adds]:
+        index.add(int(value), 0.5)
+    report["add_us"] = round((time.perf_counter() - start) / max(args.adds, 1) * 1e6, 2)
+    print(f"add(): {report['add_us']:.2f} us per call ({index.stats()['rebuilds']} table rebuilds so far)")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
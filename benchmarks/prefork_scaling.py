@@ -0,0 +1,164 @@
+# benchmarks/prefork_scaling.py
+"""
+Throughput scaling and per-worker memory of serve_prefork.py.
+
+For each worker count this starts the pre-fork server, drives /predict with
+concurrent clients for a fixed duration, and reports requests/second,
+latency percentiles and each worker's RSS and PSS. PSS (proportional set
+size) splits shared pages between the processes using them, so when weights
+are shared it stays well below RSS.
+
+Linux only (reads /proc). Run from the project root:
+    INFERENCE_BACKEND=tflite python benchmarks/prefork_scaling.py --workers 1 2 4
+"""
+
+import argparse
+import http.client
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_jpeg(seed, size=(640, 480)):
+    rng = np.random.default_rng(seed)
+    pixels = (rng.random((size[1], size[0], 3)) * 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def multipart_body(data, filename="image.jpg"):
+    boundary = "----deepfakebench"
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def wait_ready(port, timeout=300):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError("Server did not become ready")
+
+
+def worker_pids(parent_pid):
+    path = f"/proc/{parent_pid}/task/{parent_pid}/children"
+    with open(path) as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def memory_mb(pid):
+    """(RSS, PSS) of a process in MB."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                values[key] = int(rest.split()[0]) / 1024.0
+    return values.get("Rss", 0.0), values.get("Pss", 0.0)
+
+
+def drive(port, payloads, concurrency, duration):
+    """Send requests from `concurrency` clients for `duration` seconds."""
+    deadline = time.time() + duration
+    latencies = []
+    errors = 0
+
+    def client(idx):
+        nonlocal errors
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        i = idx
+        while time.time() < deadline:
+            body, content_type = payloads[i % len(payloads)]
+            start = time.perf_counter()
+            try:
+                conn.request("POST", "/predict", body=body, headers={"Content-Type": content_type})
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors += 1
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            i += concurrency
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serve_prefork.py scaling")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--images", type=int, default=64, help="Distinct synthetic images to cycle through")
+    args = parser.parse_args()
+
+    payloads = [multipart_body(make_jpeg(i)) for i in range(args.images)]
+    env = dict(os.environ)
+    # Measure the model, not the caches
+    env.setdefault("RESULT_CACHE_SIZE", "0")
+    env.setdefault("PHASH_ENABLED", "0")
+
+    rows = []
+    for workers in args.workers:
+        server = subprocess.Popen(
+            [sys.executable, "serve_prefork.py", "--workers", str(workers), "--port", str(args.port)],
+            cwd=PROJECT_ROOT, env=env
+        )
+        try:
+            wait_ready(args.port)
+            drive(args.port, payloads, args.concurrency, 2.0)  # warm-up
+            latencies, errors = drive(args.port, payloads, args.concurrency, args.duration)
+            memory = [memory_mb(pid) for pid in worker_pids(server.pid)]
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+
+        row = {
+            "workers": workers,
+            "requests_per_s": len(latencies) / args.duration,
+            "p50_ms": float(np.percentile(latencies, 50)) if latencies else None,
+            "p99_ms": float(np.percentile(latencies, 99)) if latencies else None,
+            "errors": errors,
+            "worker_rss_mb": [round(rss, 1) for rss, _ in memory],
+            "worker_pss_mb": [round(pss, 1) for _, pss in memory],
+        }
+        rows.append(row)
+        print(json.dumps(row))
+
+    print(f"\n{'workers':>8s} {'req/s':>9s} {'speedup':>8s} {'p50 ms':>8s} {'p99 ms':>8s} "
+          f"{'RSS/worker':>11s} {'PSS/worker':>11s}")
+    base = rows[0]["requests_per_s"] or 1.0
+    for row in rows:
+        rss = np.mean(row["worker_rss_mb"]) if row["worker_rss_mb"] else 0.0
+        pss = np.mean(row["worker_pss_mb"]) if row["worker_pss_mb"] else 0.0
+        print(f"{row['workers']:8d} {row['requests_per_s']:9.1f} {row['requests_per_s'] / base:7.2f}x "
+              f"{row['p50_ms'] or 0:8.1f} {row['p99_ms'] or 0:8.1f} {rss:10.1f}M {pss:10.1f}M")
+
+
+if __name__ == "__main__":
+    main()
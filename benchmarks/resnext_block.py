@@ -0,0 +1,127 @@
+# benchmarks/resnext_block.py
+"""
+Cost of the ResNeXt block variants in src/model_resnext.py. Each one is
+measured on its own (input at the first block's resolution) and inside
+build_resnext:
+
+    legacy     the original block: eight full-input 3x3 branch convs, concatenated
+    dense      the same function as one 3x3 conv (what convert_resnext --block dense produces)
+    grouped    bottleneck + grouped 3x3 conv (groups=cardinality) + residual
+    separable  bottleneck + depthwise 3x3 conv + residual
+
+For each variant this reports parameters, analytic FLOPs per image (2 x
+multiply-adds of the conv and dense layers) and CPU latency (median and p90
+over --runs calls, per batch size).
+
+Run from the project root:
+    python benchmarks/resnext_block.py --batch-sizes 1 8 --threads 4
+    python benchmarks/resnext_block.py --cardinality 16 --group-width 4
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tensorflow as tf  # noqa: E402
+from tensorflow.keras import layers  # noqa: E402
+
+from src.latency import time_calls  # noqa: E402
+from src.model_resnext import BLOCKS, build_resnext, dense_block, grouped_block, resnext_block  # noqa: E402
+
+
+def layer_flops(layer):
+    """2 x multiply-adds of a conv / dense layer (0 for everything else)."""
+    if isinstance(layer, (layers.Conv2D, layers.DepthwiseConv2D)):
+        _, h, w, c_out = layer.output.shape
+        c_in = layer.input.shape[-1]
+        kh, kw = layer.kernel_size
+        if isinstance(layer, layers.DepthwiseConv2D):
+            macs = h * w * kh * kw * c_in * layer.depth_multiplier
+        else:
+            macs = h * w * kh * kw * (c_in // layer.groups) * c_out
+        return 2 * int(macs)
+    if isinstance(layer, layers.Dense):
+        return 2 * int(layer.input.shape[-1]) * int(layer.units)
+    return 0
+
+
+def model_flops(model):
+    return sum(layer_flops(layer) for layer in model.layers)
+
+
+def block_model(block, input_shape, filters, cardinality, group_width):
+    inputs = layers.Input(shape=input_shape)
+    if block == "legacy":
+        outputs = resnext_block(inputs, filters, cardinality=cardinality)
+    elif block == "dense":
+        outputs = dense_block(inputs, filters)
+    else:
+        outputs = grouped_block(inputs, filters, cardinality=cardinality, group_width=group_width,
+                                separable=(block == "separable"))
+    return tf.keras.Model(inputs, outputs, name=f"{block}_block")
+
+
+def measure(model, batch_sizes, runs):
+    fn = tf.function(lambda x: model(x, training=False), reduce_retracing=True)
+    rng = np.random.default_rng(0)
+    result = {"parameters": int(model.count_params()), "mflops": round(model_flops(model) / 1e6, 1), "latency": {}}
+    for batch_size in batch_sizes:
+        x = tf.constant(rng.random((batch_size,) + tuple(model.input_shape[1:]), dtype=np.float32))
+        try:
+            result["latency"][batch_size] = time_calls(fn, x, runs)
+        except (tf.errors.UnimplementedError, tf.errors.InvalidArgumentError) as e:
+            # Some CPU builds have no kernel for grouped convolutions
+            result["latency"][batch_size] = {"error": str(e).splitlines()[0]}
+    return result
+
+
+def print_row(label, result, batch_sizes):
+    cells = []
+    for batch_size in batch_sizes:
+        latency = result["latency"][batch_size]
+        cells.append(f"b{batch_size}: {latency['p50_ms']:8.2f} / {latency['p90_ms']:8.2f} ms"
+                     if "p50_ms" in latency else f"b{batch_size}: unsupported")
+    print(f"{label:22s} {result['parameters']:>11,} {result['mflops']:>10,.1f}  " + "  ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ResNeXt block variants: parameters, FLOPs, CPU latency")
+    parser.add_argument("--img-size", type=int, default=160)
+    parser.add_argument("--filters", type=int, default=64, help="Output channels of the standalone block")
+    parser.add_argument("--cardinality", type=int, default=8)
+    parser.add_argument("--group-width", type=int, default=None)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads (default: TensorFlow's)")
+    parser.add_argument("--out", default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    if args.threads:
+        tf.config.threading.set_intra_op_parallelism_threads(args.threads)
+
+    report = {"block": {}, "model": {}}
+    print(f"{'variant':22s} {'parameters':>11s} {'MFLOPs':>10s}  latency p50 / p90 (CPU)")
+    with tf.device("/CPU:0"):
+        for block in BLOCKS:
+            model = block_model(block, (args.img_size, args.img_size, 32), args.filters,
+                                args.cardinality, args.group_width)
+            report["block"][block] = measure(model, args.batch_sizes, args.runs)
+            print_row(f"{block} block", report["block"][block], args.batch_sizes)
+        for block in BLOCKS:
+            model = build_resnext((args.img_size, args.img_size, 3), block=block,
+                                  cardinality=args.cardinality, group_width=args.group_width)
+            report["model"][block] = measure(model, args.batch_sizes, args.runs)
+            print_row(f"{block} model", report["model"][block], args.batch_sizes)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# benchmarks/startup_time.py
+"""
+Cold-start breakdown of the inference API for each model format.
+
+For every backend this runs two measurements in fresh processes:
+
+  1. In-process breakdown: time to import app.py, then the import_tensorflow,
+     load_model and warm_up stages recorded by app.startup_progress, plus
+     the latency of the first real prediction.
+  2. End-to-end: start uvicorn with STARTUP_MODE=background and measure how
+     long until /health answers (port bound) and until /ready returns 200.
+
+Export the artifacts first (python -m src.export_models --savedmodel), then
+run from the project root:
+    python benchmarks/startup_time.py --backends keras savedmodel tflite
+"""
+
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executed in a fresh interpreter so nothing is warm
+BREAKDOWN_SNIPPET = r"""
+import json, time
+start = time.perf_counter()
+import app
+import_app = time.perf_counter() - start
+app.load_model()
+app.warm_up_model()
+import numpy as np
+width, height = app.input_size
+x = np.random.default_rng(0).random((1, height, width, 3), dtype=np.float32)
+t = time.perf_counter()
+app.predict_batch(x)
+first_predict = time.perf_counter() - t
+print("RESULT " + json.dumps({
+    "import_app_s": import_app,
+    "stages_s": app.startup_progress.summary()["stage_seconds"],
+    "first_predict_ms": first_predict * 1000.0,
+    "total_s": time.perf_counter() - start,
+}))
+"""
+
+
+def breakdown(backend, env):
+    env = dict(env, INFERENCE_BACKEND=backend)
+    out = subprocess.run([sys.executable, "-c", BREAKDOWN_SNIPPET], cwd=PROJECT_ROOT, env=env,
+                         capture_output=True, text=True, timeout=600)
+    for line in out.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise RuntimeError(f"{backend} breakdown failed:\n{out.stderr[-2000:]}")
+
+
+def poll(port, path, deadline):
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", path)
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.02)
+    return False
+
+
+def end_to_end(backend, env, port):
+    env = dict(env, INFERENCE_BACKEND=backend, STARTUP_MODE="background")
+    start = time.time()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=PROJECT_ROOT, env=env
+    )
+    try:
+        deadline = start + 600
+        bound = time.time() - start if poll(port, "/health", deadline) else None
+        ready = time.time() - start if poll(port, "/ready", deadline) else None
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+    return {"time_to_bind_s": bound, "time_to_ready_s": ready}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API cold-start time per model format")
+    parser.add_argument("--backends", nargs="+", default=["keras", "savedmodel", "tflite"])
+    parser.add_argument("--port", type=int, default=8200)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    rows = {}
+    for backend in args.backends:
+        print(f"Measuring {backend}...")
+        try:
+            rows[backend] = {**breakdown(backend, env), **end_to_end(backend, env, args.port)}
+        except Exception as e:
+            print(f"  {backend}: {e}")
+            continue
+        print("  " + json.dumps(rows[backend]))
+
+    print(f"\n{'backend':12s} {'import app':>10s} {'import tf':>10s} {'load':>8s} {'warm-up':>8s} "
+          f"{'1st pred':>9s} {'bind':>7s} {'ready':>7s}")
+    for backend, r in rows.items():
+        stages = r["stages_s"]
+        print(f"{backend:12s} {r['import_app_s']:9.2f}s {stages.get('import_tensorflow', 0.0):9.2f}s "
+              f"{stages.get('load_model', 0.0):7.2f}s {stages.get('warm_up', 0.0):7.2f}s "
+              f"{r['first_predict_ms']:7.1f}ms {r['time_to_bind_s'] or float('nan'):6.2f}s "
+              f"{r['time_to_ready_s'] or float('nan'):6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
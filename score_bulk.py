@@ -0,0 +1,265 @@
+# score_bulk.py
+"""
+Offline bulk scoring of image archives, without going through the HTTP API.
+
+Images come from a directory walk or a manifest (one path per line, or a CSV
+with a "path" column). They are decoded and preprocessed in a process pool
+with the API's preprocessing (serving.preprocessing: RGB, resize, /255) and
+scored in large batches by any serving backend.
+
+The input list is frozen into <out>/inputs.txt on the first run and split
+into fixed-size shards. Each finished shard is written atomically as
+<out>/shard-NNNNN.<format>, so an interrupted run resumes by skipping the
+shards already on disk. The settings that decide what a shard contains
+(shard size, format, model, backend, preprocessing) are frozen alongside in
+<out>/run.json; resuming with different ones is refused.
+
+Usage (from the project root):
+    python score_bulk.py /data/archive --out results/ --format parquet
+    python score_bulk.py --manifest paths.csv --out results/ --backend tflite --batch-size 256
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from serving.backends import artifact_path, load_backend
+from serving.preprocessing import IMAGE_SIZE, decode_image_bytes
+from serving.result_cache import model_identity
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp", ".tif", ".tiff"}
+FORMATS = ("csv", "jsonl", "parquet")
+COLUMNS = ["path", "raw_score", "prediction", "confidence", "error"]
+
+DEFAULT_MODEL = "src/models/basic_cnn_best.h5"
+# Arguments that change shard boundaries or contents; frozen in run.json
+RUN_SETTINGS = ("shard_size", "format", "model", "backend", "no_draft")
+
+
+# ---------- Inputs ----------
+def walk_images(root):
+    """Image paths under root, in a stable order."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                yield os.path.join(dirpath, name)
+
+
+def read_manifest(path):
+    """Paths from a text manifest (one per line) or a CSV with a "path" column."""
+    with open(path, newline="") as f:
+        if path.lower().endswith(".csv"):
+            return [row["path"] for row in csv.DictReader(f) if row.get("path")]
+        return [line.strip() for line in f if line.strip()]
+
+
+def frozen_inputs(args, out_dir):
+    """
+    The run's input list, written once to inputs.txt so that shard boundaries
+    stay fixed across resumes even if the source directory changes.
+    """
+    listing = out_dir / "inputs.txt"
+    if listing.exists():
+        return listing.read_text().splitlines()
+    paths = read_manifest(args.manifest) if args.manifest else list(walk_images(args.source))
+    tmp = listing.with_suffix(".tmp")
+    tmp.write_text("\n".join(paths) + ("\n" if paths else ""))
+    os.replace(tmp, listing)
+    return paths
+
+
+def run_config(args):
+    config = {name: getattr(args, name) for name in RUN_SETTINGS}
+    artifact = artifact_path(args.model, args.backend)
+    config["model_file"] = model_identity(artifact) if os.path.exists(artifact) else None
+    return config
+
+
+def frozen_run_config(args, out_dir):
+    """
+    Write the run's settings to run.json on the first run.
+
+    Returns:
+        List of "name: frozen -> requested" differences from an earlier run
+        (empty when this run may resume it)
+    """
+    config_path = out_dir / "run.json"
+    current = run_config(args)
+    if not config_path.exists():
+        tmp = config_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(current, indent=2))
+        os.replace(tmp, config_path)
+        return []
+    frozen = json.loads(config_path.read_text())
+    return [f"{name}: {frozen.get(name)!r} -> {value!r}" for name, value in current.items()
+            if frozen.get(name) != value]
+
+
+# ---------- Decoding (runs in worker processes) ----------
+def decode_path(task):
+    """Read and preprocess one image; returns (uint8 pixels or None, error or None)."""
+    path, target_size, use_draft = task
+    try:
+        with open(path, "rb") as f:
+            pixels, _, _, _ = decode_image_bytes(f.read(), target_size, use_draft)
+        return pixels, None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+# ---------- Output ----------
+def result_row(path, score, error):
+    if error is not None:
+        return {"path": path, "raw_score": None, "prediction": None, "confidence": None, "error": error}
+    is_real = score > 0.5
+    return {
+        "path": path,
+        "raw_score": round(score, 6),
+        "prediction": "Real" if is_real else "Fake",
+        "confidence": round((score if is_real else 1.0 - score) * 100.0, 2),
+        "error": None,
+    }
+
+
+def write_shard(rows, path, fmt):
+    """Write one shard to a temporary file and rename it into place."""
+    tmp = path.with_name(path.name + ".tmp")
+    if fmt == "csv":
+        with open(tmp, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+    elif fmt == "jsonl":
+        with open(tmp, "w") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+    else:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        pq.write_table(pa.Table.from_pylist(rows), tmp)
+    os.replace(tmp, path)
+
+
+# ---------- Scoring ----------
+def score_shard(paths, pool, backend, target_size, args):
+    """Decode (in the pool) and score one shard; returns result rows in input order."""
+    width, height = target_size
+    batch = np.empty((args.batch_size, height, width, 3), dtype=np.uint8)
+    batch_paths = []
+    rows = []
+
+    def flush():
+        if not batch_paths:
+            return
+        n = len(batch_paths)
+        scores = backend.predict(batch[:n].astype(np.float32) / 255.0)
+        rows.extend(result_row(p, float(s[0]), None) for p, s in zip(batch_paths, scores))
+        batch_paths.clear()
+
+    tasks = ((path, target_size, not args.no_draft) for path in paths)
+    for path, (pixels, error) in zip(paths, pool.imap(decode_path, tasks, chunksize=args.chunksize)):
+        if error is not None:
+            # Keep output order stable: flush what's batched before recording the failure
+            flush()
+            rows.append(result_row(path, None, error))
+            continue
+        batch[len(batch_paths)] = pixels
+        batch_paths.append(path)
+        if len(batch_paths) == args.batch_size:
+            flush()
+    flush()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score an image archive offline, resumably")
+    parser.add_argument("source", nargs="?", help="Directory to walk for images")
+    parser.add_argument("--manifest", help="Text file of paths, or CSV with a 'path' column")
+    parser.add_argument("--out", required=True, help="Output directory (shards + checkpoint)")
+    parser.add_argument("--format", default="jsonl", choices=FORMATS)
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Trained .h5; exported artifacts sit next to it")
+    parser.add_argument("--backend", default="keras", help="keras, savedmodel, tflite, tflite_int8 or onnx")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads for the backend")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="Decode processes")
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--shard-size", type=int, default=10000, help="Images per checkpointed shard")
+    parser.add_argument("--chunksize", type=int, default=32, help="Images handed to a decode worker at a time")
+    parser.add_argument("--no-draft", action="store_true", help="Decode JPEGs at full size before resizing")
+    args = parser.parse_args()
+
+    if not args.source and not args.manifest:
+        parser.error("give a source directory or --manifest")
+    if args.format == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            parser.error("--format parquet needs pyarrow (pip install pyarrow)")
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    changed = frozen_run_config(args, out_dir)
+    if changed:
+        parser.error(f"{out_dir} was started with different settings ({'; '.join(changed)}); "
+                     "rerun with the original ones or use a new --out")
+    paths = frozen_inputs(args, out_dir)
+    shards = [paths[i:i + args.shard_size] for i in range(0, len(paths), args.shard_size)]
+    shard_path = lambda i: out_dir / f"shard-{i:05d}.{args.format}"  # noqa: E731
+    pending = [i for i in range(len(shards)) if not shard_path(i).exists()]
+    print(f"{len(paths)} images in {len(shards)} shards; {len(shards) - len(pending)} already done")
+    if not pending:
+        return
+
+    # Start the decode workers (spawn) before the backend loads TensorFlow
+    pool = multiprocessing.get_context("spawn").Pool(args.workers)
+    try:
+        # TFLite: one interpreter sized for the full batch (the last, short batch is padded)
+        options = {"buckets": (args.batch_size,)} if args.backend.startswith("tflite") else {}
+        backend = load_backend(args.backend, artifact_path(args.model, args.backend), num_threads=args.threads,
+                               **options)
+        backend.warm_up()
+        target_size = backend.input_size or IMAGE_SIZE
+
+        run_start = time.perf_counter()
+        scored = failed = 0
+        for i in pending:
+            start = time.perf_counter()
+            rows = score_shard(shards[i], pool, backend, target_size, args)
+            write_shard(rows, shard_path(i), args.format)
+
+            errors = sum(1 for row in rows if row["error"] is not None)
+            scored += len(rows)
+            failed += errors
+            elapsed = time.perf_counter() - start
+            overall = scored / (time.perf_counter() - run_start)
+            print(f"shard {i + 1}/{len(shards)}: {len(rows)} images ({errors} failed) "
+                  f"in {elapsed:.1f}s, {len(rows) / elapsed:.1f} img/s (run {overall:.1f} img/s)")
+            sys.stdout.flush()
+    finally:
+        pool.terminate()
+
+    total = time.perf_counter() - run_start
+    with open(out_dir / "progress.json", "w") as f:
+        json.dump({
+            "images": len(paths),
+            "shards": len(shards),
+            "scored_this_run": scored,
+            "failed_this_run": failed,
+            "seconds_this_run": round(total, 2),
+            "images_per_second": round(scored / total, 2) if total else None,
+            "backend": args.backend,
+            "model": args.model,
+        }, f, indent=2)
+    print(f"Done: {scored} images in {total:.1f}s ({scored / total:.1f} img/s), {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
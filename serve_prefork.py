@@ -0,0 +1,145 @@
+# serve_prefork.py
+"""
+Pre-fork multi-worker server for the Deepfake Detection API.
+
+The parent process binds the listening socket and, for fork-safe backends,
+loads the model once. It then forks N uvicorn workers that inherit the socket
+and the loaded model. Model weights are shared copy-on-write: TFLite
+flatbuffers are mmap'd read-only, so every worker reads the same physical
+pages and only the per-worker tensor arena is private.
+
+TensorFlow's runtime (Keras backend, ensemble mode) starts thread pools that
+do not survive fork(), so in those modes each worker loads its own copy after
+forking; export with `python -m src.export_models` and serve with
+INFERENCE_BACKEND=tflite (or tflite_int8) to get shared weights. The TFLite
+backends fall back to tf.lite.Interpreter when tflite_runtime is not
+installed, which is just as unsafe to fork, so without tflite_runtime the
+workers load the model themselves as well.
+
+Usage (POSIX only):
+    INFERENCE_BACKEND=tflite python serve_prefork.py --workers 4 --port 8000
+"""
+
+import argparse
+import importlib.util
+import os
+import signal
+import socket
+import sys
+import time
+
+# Backends whose loaded state is safe to inherit across fork()
+FORK_SAFE_BACKENDS = {"tflite", "tflite_int8"}
+
+
+def fork_safe(serving_mode, backend):
+    """True if the model can be loaded in the parent and inherited by the workers."""
+    if serving_mode != "single" or backend not in FORK_SAFE_BACKENDS:
+        return False
+    # Without tflite_runtime the backend imports TensorFlow; check without importing anything
+    return importlib.util.find_spec("tflite_runtime") is not None
+
+
+def bind_socket(host, port, reuseport=False):
+    """Create a listening TCP socket that forked workers can inherit."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuseport:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app_module, sock, args):
+    """Serve the app on an inherited socket until told to stop (runs in the child)."""
+    import uvicorn
+
+    config = uvicorn.Config(app_module.app, log_level=args.log_level, timeout_keep_alive=5)
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork multi-worker API server")
+    cores = os.cpu_count() or 1
+    parser.add_argument("--workers", type=int, default=cores, help="Worker processes (default: one per core)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--reuseport", action="store_true",
+                        help="Give each worker its own SO_REUSEPORT socket so the kernel balances connections")
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        sys.exit("serve_prefork.py needs fork(); on Windows run `uvicorn app:app` instead.")
+
+    # Split cores evenly so N workers don't each spin up a full-size thread pool
+    os.environ.setdefault("INFERENCE_THREADS", str(max(1, cores // args.workers)))
+
+    # Imported after the environment is final: app reads its settings at import time
+    import app as app_module
+
+    if fork_safe(app_module.SERVING_MODE, app_module.INFERENCE_BACKEND):
+        start = time.perf_counter()
+        app_module.load_model()
+        print(f"[parent {os.getpid()}] Model loaded once in {time.perf_counter() - start:.2f}s; "
+              f"workers share its pages copy-on-write")
+    elif app_module.INFERENCE_BACKEND in FORK_SAFE_BACKENDS and app_module.SERVING_MODE == "single":
+        print(f"[parent {os.getpid()}] tflite_runtime is not installed and the TensorFlow interpreter "
+              f"is not fork-safe; each worker loads its own model")
+    else:
+        print(f"[parent {os.getpid()}] Backend '{app_module.INFERENCE_BACKEND}' "
+              f"({app_module.SERVING_MODE} mode) is not fork-safe; each worker loads its own model")
+
+    sock = None if args.reuseport else bind_socket(args.host, args.port)
+    children = {}
+    shutting_down = False
+
+    def spawn(slot):
+        pid = os.fork()
+        if pid == 0:
+            # Child: restore default signal handling, then serve
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            worker_sock = bind_socket(args.host, args.port, reuseport=True) if args.reuseport else sock
+            try:
+                run_worker(app_module, worker_sock, args)
+            finally:
+                os._exit(0)
+        children[pid] = slot
+        print(f"[parent {os.getpid()}] Started worker {slot} (pid {pid})")
+
+    def stop(signum, frame):
+        nonlocal shutting_down
+        shutting_down = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for slot in range(args.workers):
+        spawn(slot)
+    print(f"[parent {os.getpid()}] Serving on http://{args.host}:{args.port} with {args.workers} workers")
+
+    # Supervise: restart workers that die unexpectedly
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        slot = children.pop(pid, None)
+        if slot is not None and not shutting_down:
+            print(f"[parent {os.getpid()}] Worker {slot} (pid {pid}) exited with status {status}; restarting")
+            spawn(slot)
+
+
+if __name__ == "__main__":
+    main()
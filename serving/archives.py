@@ -0,0 +1,88 @@
+# serving/archives.py
+"""
+Helpers for unpacking zip/tar uploads into individual image payloads.
+"""
+
+import io
+import tarfile
+import zipfile
+import zlib
+from pathlib import PurePosixPath
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp", ".tif", ".tiff"}
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+
+def is_archive(filename, content_type=None):
+    """Return True if the upload looks like a zip or tar archive."""
+    name = (filename or "").lower()
+    if name.endswith(ARCHIVE_EXTENSIONS):
+        return True
+    return content_type in ("application/zip", "application/x-zip-compressed",
+                            "application/x-tar", "application/gzip", "application/x-gzip")
+
+
+def _is_image_name(name):
+    path = PurePosixPath(name)
+    # Skip hidden files and macOS resource forks (__MACOSX/._foo.jpg)
+    if any(part.startswith(".") or part == "__MACOSX" for part in path.parts):
+        return False
+    return path.suffix.lower() in IMAGE_EXTENSIONS
+
+
+def extract_images(data, max_files, max_member_bytes):
+    """
+    Extract image members from a zip or tar archive.
+
+    Args:
+        data: Raw archive bytes or a seekable binary file object
+        max_files: Maximum number of images to return
+        max_member_bytes: Members larger than this are skipped with an error
+
+    Returns:
+        List of (name, bytes or None, error or None) tuples in archive order
+
+    Raises:
+        ValueError: The upload is not a readable zip or tar archive
+    """
+    # A file object (e.g. the spooled upload) is read in place instead of copied
+    buffer = data if hasattr(data, "read") else io.BytesIO(data)
+    try:
+        if zipfile.is_zipfile(buffer):
+            buffer.seek(0)
+            return _zip_members(buffer, max_files, max_member_bytes)
+        buffer.seek(0)
+        return _tar_members(buffer, max_files, max_member_bytes)
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, zlib.error) as e:
+        # Corruption can surface anywhere, not only when the archive is opened
+        raise ValueError(f"Unsupported or corrupt archive (expected zip or tar): {e}") from e
+
+
+def _zip_members(buffer, max_files, max_member_bytes):
+    members = []
+    with zipfile.ZipFile(buffer) as zf:
+        for info in zf.infolist():
+            if info.is_dir() or not _is_image_name(info.filename):
+                continue
+            if len(members) >= max_files:
+                break
+            if info.file_size > max_member_bytes:
+                members.append((info.filename, None, "File too large"))
+                continue
+            members.append((info.filename, zf.read(info), None))
+    return members
+
+
+def _tar_members(buffer, max_files, max_member_bytes):
+    members = []
+    with tarfile.open(fileobj=buffer, mode="r:*") as tar:
+        for info in tar:
+            if not info.isfile() or not _is_image_name(info.name):
+                continue
+            if len(members) >= max_files:
+                break
+            if info.size > max_member_bytes:
+                members.append((info.name, None, "File too large"))
+                continue
+            members.append((info.name, tar.extractfile(info).read(), None))
+    return members
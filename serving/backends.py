@@ -0,0 +1,315 @@
+# serving/backends.py
+"""
+Pluggable inference backends for the API.
+
+Every backend exposes the same small surface:
+    predict(batch)  -> float32 array of shape (N, 1)
+    warm_up()       -> run the model once so the first request pays no setup cost
+    input_size      -> (width, height) expected by the model
+    name            -> backend kind, for /health
+
+Keras (.h5) is the default. TFLite and ONNX Runtime serve artifacts written by
+src/export_models.py (int8 TFLite by src/quantize_models.py) and avoid most of
+Keras' per-call Python overhead on CPU. TensorFlow and ONNX Runtime are
+imported lazily so a TFLite-only deployment can run on the much smaller
+`tflite-runtime` wheel.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+# Artifact suffix for each backend, relative to the .h5 it was exported from
+BACKEND_SUFFIXES = {
+    "keras": ".h5",
+    "tflite": ".tflite",
+    "tflite_int8": ".int8.tflite",
+    "onnx": ".onnx",
+    "savedmodel": "_savedmodel",
+}
+
+
+# Batch sizes TFLiteBackend allocates interpreters for (serving.compiled's defaults,
+# which can't be imported here without TensorFlow)
+TFLITE_BUCKETS = (1, 4, 16, 64)
+
+
+def artifact_path(h5_path, backend):
+    """Path of the exported artifact for h5_path, e.g. models/cnn.h5 -> models/cnn.tflite."""
+    return os.path.splitext(h5_path)[0] + BACKEND_SUFFIXES[backend]
+
+
+def _warm_up(backend):
+    if backend.input_size is None:
+        return
+    width, height = backend.input_size
+    backend.predict(np.zeros((1, height, width, 3), dtype=np.float32))
+
+
+class KerasBackend:
+    name = "keras"
+
+    def __init__(self, path, num_threads=None, compiled=True, buckets=None, jit_compile=False):
+        """
+        Args:
+            path: .h5 model path
+            num_threads: Intra-op threads
+            compiled: Serve through a bucketed tf.function (serving.compiled) instead of model.predict
+            buckets: Batch-size buckets for the compiled path
+            jit_compile: XLA-compile the buckets
+        """
+        import tensorflow as tf
+        if num_threads:
+            try:
+                tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+            except RuntimeError:
+                # Already initialised by an earlier model load; keep the existing setting
+                pass
+        self.model = tf.keras.models.load_model(path)
+        shape = self.model.input_shape
+        self.input_size = (shape[2], shape[1]) if shape[1] and shape[2] else None
+
+        self.compiled = None
+        if compiled:
+            from serving.compiled import CompiledPredictor, DEFAULT_BUCKETS
+            self.compiled = CompiledPredictor(self.model, buckets=buckets or DEFAULT_BUCKETS,
+                                              jit_compile=jit_compile, warm=False)
+
+    def predict(self, batch):
+        if self.compiled is not None:
+            return self.compiled.predict(batch)
+        return self.model.predict(batch, verbose=0)
+
+    def warm_up(self):
+        if self.compiled is not None:
+            self.compiled.warm_up()
+        else:
+            _warm_up(self)
+
+    def stats(self):
+        return self.compiled.stats() if self.compiled is not None else None
+
+
+class TFLiteBackend:
+    name = "tflite"
+
+    def __init__(self, path, num_threads=None, buckets=TFLITE_BUCKETS):
+        """
+        Args:
+            path: .tflite model path
+            num_threads: Interpreter threads
+            buckets: Batch sizes served; each gets its own interpreter allocated
+                once at that size, and batches are padded up to the next bucket
+        """
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.path = path
+        self.num_threads = num_threads
+        self.buckets = tuple(sorted(set(int(b) for b in buckets)))
+        self._interpreter_class = Interpreter
+        self._interpreters = {}
+        # Each interpreter holds mutable tensor buffers
+        self._locks = {bucket: threading.Lock() for bucket in self.buckets}
+        self._stats_lock = threading.Lock()
+        self.calls = {bucket: 0 for bucket in self.buckets}
+        self.padded_rows = 0
+
+        # Interpreters share the mmap'd model, so the first one only costs its tensor arena
+        interpreter, input_details, output_details = self._interpreter(self.buckets[0])
+        self._input_dtype = input_details["dtype"]
+        self._input_quantization = input_details["quantization"]
+        self._output_dtype = output_details["dtype"]
+        self._output_quantization = output_details["quantization"]
+        shape = input_details["shape"]
+        self._sample_shape = tuple(int(d) for d in shape[1:])
+        self.input_size = (int(shape[2]), int(shape[1]))
+
+    def _interpreter(self, bucket):
+        """The interpreter allocated for `bucket` rows, created on first use."""
+        if bucket not in self._interpreters:
+            interpreter = self._interpreter_class(model_path=self.path, num_threads=self.num_threads)
+            input_details = interpreter.get_input_details()[0]
+            if int(input_details["shape"][0]) != bucket:
+                shape = list(input_details["shape"])
+                shape[0] = bucket
+                interpreter.resize_tensor_input(input_details["index"], shape)
+            interpreter.allocate_tensors()
+            self._interpreters[bucket] = (interpreter, interpreter.get_input_details()[0],
+                                          interpreter.get_output_details()[0])
+        return self._interpreters[bucket]
+
+    def _bucket_for(self, n):
+        for bucket in self.buckets:
+            if bucket >= n:
+                return bucket
+        return self.buckets[-1]
+
+    def _quantize(self, batch):
+        """Map float inputs onto an integer input tensor if the model is fully quantized."""
+        dtype = self._input_dtype
+        if dtype == np.float32:
+            return batch.astype(np.float32, copy=False)
+        scale, zero_point = self._input_quantization
+        return np.clip(np.round(batch / scale + zero_point),
+                       np.iinfo(dtype).min, np.iinfo(dtype).max).astype(dtype)
+
+    def _dequantize(self, output):
+        if self._output_dtype == np.float32:
+            return output
+        scale, zero_point = self._output_quantization
+        return (output.astype(np.float32) - zero_point) * scale
+
+    def _invoke(self, bucket, chunk, rows):
+        with self._locks[bucket]:
+            interpreter, input_details, output_details = self._interpreter(bucket)
+            interpreter.set_tensor(input_details["index"], chunk)
+            interpreter.invoke()
+            output = interpreter.get_tensor(output_details["index"])
+        with self._stats_lock:
+            self.calls[bucket] += 1
+            self.padded_rows += bucket - rows
+        return output[:rows]
+
+    def predict(self, batch):
+        largest = self.buckets[-1]
+        outputs = []
+        for start in range(0, len(batch), largest):
+            chunk = self._quantize(batch[start:start + largest])
+            rows = len(chunk)
+            bucket = self._bucket_for(rows)
+            if rows < bucket:
+                chunk = np.concatenate([chunk, np.zeros((bucket - rows,) + chunk.shape[1:], chunk.dtype)])
+            outputs.append(self._dequantize(self._invoke(bucket, chunk, rows)).reshape(rows, -1))
+        if not outputs:
+            return np.zeros((0, 1), np.float32)
+        return np.concatenate(outputs)
+
+    def warm_up(self):
+        """Allocate and run every bucket's interpreter so serving never allocates."""
+        for bucket in self.buckets:
+            self._invoke(bucket, self._quantize(np.zeros((bucket,) + self._sample_shape, np.float32)), bucket)
+
+    def stats(self):
+        return {
+            "buckets": list(self.buckets),
+            "calls_per_bucket": {str(b): c for b, c in self.calls.items()},
+            "padded_rows": self.padded_rows,
+        }
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, path, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._input = self.session.get_inputs()[0]
+
+        shape = self._input.shape
+        self.input_size = (shape[2], shape[1]) if isinstance(shape[1], int) and isinstance(shape[2], int) else None
+
+    def predict(self, batch):
+        output = self.session.run(None, {self._input.name: batch.astype(np.float32, copy=False)})[0]
+        return output.reshape(len(batch), -1)
+
+    def warm_up(self):
+        _warm_up(self)
+
+
+class SavedModelBackend:
+    """
+    Serves a SavedModel's serving signature.
+
+    Loading restores an already-traced graph and its variables directly, with
+    no Keras layer reconstruction or .h5 parsing, so it starts much faster
+    than tf.keras.models.load_model. The signature has a dynamic batch
+    dimension and never retraces.
+    """
+
+    name = "savedmodel"
+
+    def __init__(self, path, num_threads=None):
+        import tensorflow as tf
+        if num_threads:
+            try:
+                tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+            except RuntimeError:
+                pass
+        self._tf = tf
+        self._loaded = tf.saved_model.load(path)
+        self._signature = self._loaded.signatures["serving_default"]
+        spec = list(self._signature.structured_input_signature[1].values())[0]
+        self._input_name = list(self._signature.structured_input_signature[1].keys())[0]
+        shape = spec.shape
+        self.input_size = (int(shape[2]), int(shape[1])) if shape[1] and shape[2] else None
+
+    def predict(self, batch):
+        x = self._tf.convert_to_tensor(batch, dtype=self._tf.float32)
+        output = list(self._signature(**{self._input_name: x}).values())[0]
+        return output.numpy().reshape(len(batch), -1)
+
+    def warm_up(self):
+        _warm_up(self)
+
+
+BACKENDS = {
+    "keras": KerasBackend,
+    "tflite": TFLiteBackend,
+    "tflite_int8": TFLiteBackend,
+    "onnx": OnnxBackend,
+    "savedmodel": SavedModelBackend,
+}
+
+
+def load_backend(kind, path, num_threads=None, **options):
+    """
+    Load a model artifact with the given backend.
+
+    Args:
+        kind: "keras", "tflite", "tflite_int8", "onnx" or "savedmodel"
+        path: Artifact path
+        num_threads: Intra-op threads (None = runtime default)
+        **options: Backend-specific options (e.g. compiled/buckets/jit_compile for keras)
+    """
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {kind!r} (expected one of {sorted(BACKENDS)})")
+    backend = BACKENDS[kind](path, num_threads=num_threads, **options)
+    backend.name = kind
+    return backend
+
+
+def check_parity(reference_predict, backend, inputs, atol=1e-3):
+    """
+    Compare a backend's outputs against a reference predict function.
+
+    Args:
+        reference_predict: Callable returning (N, 1) scores, e.g. keras_model.predict
+        backend: Loaded backend
+        inputs: float32 batch of shape (N, H, W, 3)
+        atol: Largest acceptable absolute score difference
+
+    Returns:
+        Dict with max/mean absolute difference, label agreement and pass/fail
+    """
+    expected = np.asarray(reference_predict(inputs), dtype=np.float32).reshape(len(inputs), -1)
+    # Run one sample at a time as well as the full batch to exercise batch-size handling
+    actual = backend.predict(inputs)
+    single = np.concatenate([backend.predict(inputs[i:i + 1]) for i in range(len(inputs))])
+
+    diff = np.abs(expected - actual)
+    return {
+        "max_abs_diff": float(diff.max()),
+        "mean_abs_diff": float(diff.mean()),
+        "batch_vs_single_max_diff": float(np.abs(actual - single).max()),
+        "label_agreement": float(np.mean((expected > 0.5) == (actual > 0.5))),
+        "passed": bool(diff.max() <= atol),
+    }
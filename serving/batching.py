@@ -0,0 +1,192 @@
+# serving/batching.py
+"""
+Dynamic micro-batching for the inference API.
+
+Concurrent /predict calls are queued and coalesced into a single batch that is
+run through the model in one forward pass on a dedicated inference thread.
+A batch is dispatched as soon as it reaches `max_batch_size` items or the
+oldest queued item has waited `max_wait_ms` milliseconds, whichever comes first.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class QueueFullError(Exception):
+    """Raised when the inference queue is at capacity (maps to HTTP 503)."""
+
+
+class MicroBatcher:
+    """
+    Request-coalescing scheduler in front of a batch predict function.
+
+    `predict_fn` receives a stacked numpy batch of shape (N, ...) and must
+    return an array-like with N rows, one result per input.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5.0, max_queue_size=256):
+        """
+        Args:
+            predict_fn: Callable taking a (N, ...) batch and returning N results
+            max_batch_size: Largest batch handed to predict_fn
+            max_wait_ms: Longest time the first item of a batch waits for company
+            max_queue_size: Pending items allowed before submit() rejects (backpressure)
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_size = max_queue_size
+
+        self._queue = None
+        self._worker_task = None
+        # One thread so only a single forward pass runs at a time
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+
+        # Metrics
+        self._submitted = 0
+        self._rejected = 0
+        self._batches = 0
+        self._batched_items = 0
+        self._max_depth_seen = 0
+        self._inference_seconds = 0.0
+
+    async def start(self):
+        """Start the background batching loop on the running event loop."""
+        if self._worker_task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._worker_task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the batching loop and fail any requests still waiting."""
+        if self._worker_task is None:
+            return
+        self._worker_task.cancel()
+        try:
+            await self._worker_task
+        except asyncio.CancelledError:
+            pass
+        self._worker_task = None
+
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Inference queue shut down"))
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, x):
+        """
+        Queue a single input and wait for its result.
+
+        Args:
+            x: One input with a leading batch dimension of 1, e.g. (1, 224, 224, 3)
+
+        Returns:
+            The row of predict_fn's output belonging to this input
+
+        Raises:
+            QueueFullError: If the queue already holds max_queue_size items
+        """
+        if self._queue is None:
+            raise RuntimeError("MicroBatcher has not been started")
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((x, future))
+        except asyncio.QueueFull:
+            self._rejected += 1
+            raise QueueFullError("Inference queue is full")
+
+        self._submitted += 1
+        self._max_depth_seen = max(self._max_depth_seen, self._queue.qsize())
+        return await future
+
+    async def run_batch(self, batch):
+        """
+        Run an already-formed batch on the inference thread, bypassing the queue.
+
+        Used by endpoints that receive many inputs in one request. The batch
+        still shares the single inference thread with coalesced requests.
+
+        Args:
+            batch: Stacked inputs of shape (N, ...)
+
+        Returns:
+            predict_fn's output for the batch
+        """
+        loop = asyncio.get_running_loop()
+        outputs, elapsed = await loop.run_in_executor(self._executor, self._run_batch, [batch])
+        self._batches += 1
+        self._batched_items += len(batch)
+        self._inference_seconds += elapsed
+        return outputs
+
+    async def _collect(self):
+        """Block for the first item, then gather more until size or time limit."""
+        items = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+        # Anything already queued rides along for free
+        while len(items) < self.max_batch_size and not self._queue.empty():
+            items.append(self._queue.get_nowait())
+
+        return items
+
+    def _run_batch(self, inputs):
+        start = time.perf_counter()
+        batch = np.concatenate(inputs, axis=0)
+        outputs = self.predict_fn(batch)
+        return outputs, time.perf_counter() - start
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = await self._collect()
+            # Drop requests whose clients already went away
+            items = [(x, f) for x, f in items if not f.cancelled()]
+            if not items:
+                continue
+
+            inputs = [x for x, _ in items]
+            try:
+                outputs, elapsed = await loop.run_in_executor(self._executor, self._run_batch, inputs)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self._batches += 1
+            self._batched_items += len(items)
+            self._inference_seconds += elapsed
+
+            for i, (_, future) in enumerate(items):
+                if not future.done():
+                    future.set_result(outputs[i])
+
+    def metrics(self):
+        """Return queue depth and batching statistics."""
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth_seen": self._max_depth_seen,
+            "max_queue_size": self.max_queue_size,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "submitted": self._submitted,
+            "rejected": self._rejected,
+            "batches": self._batches,
+            "avg_batch_size": round(self._batched_items / self._batches, 2) if self._batches else 0.0,
+            "avg_batch_inference_ms": round(1000.0 * self._inference_seconds / self._batches, 2) if self._batches else 0.0,
+        }
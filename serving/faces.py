@@ -0,0 +1,226 @@
+# serving/faces.py
+"""
+Optional face detection and crop stage for the inference API.
+
+Instead of shrinking a whole photo to the model's input size, faces are
+detected with a lightweight CPU detector, each face is cropped (with some
+margin) and resized, and the crops are classified as one batch. The
+per-face scores are combined into an image-level verdict.
+
+Detectors (OpenCV; pip install "opencv-python-headless<5"):
+    "haar"   Viola-Jones cascade bundled with OpenCV 4; no extra files
+    "yunet"  OpenCV's YuNet CNN detector; more accurate, needs its .onnx file
+
+Detection runs on a downscaled grayscale copy, so its cost is bounded by
+detect_max_side rather than the upload's resolution.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from serving.uploads import BufferReader
+
+AGGREGATIONS = ("min", "mean", "max")
+
+
+class DetectionCache:
+    """LRU cache of face boxes keyed by upload content and detector settings."""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            faces = self._entries.get(key)
+            if faces is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return faces
+
+    def put(self, key, faces):
+        with self._lock:
+            self._entries[key] = faces
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class FaceDetector:
+    """Thin wrapper giving the OpenCV detectors one interface."""
+
+    def __init__(self, kind="haar", model_path=None, score_threshold=0.6, min_face_fraction=0.05):
+        """
+        Args:
+            kind: "haar" or "yunet"
+            model_path: YuNet .onnx file (required for "yunet")
+            score_threshold: Minimum YuNet confidence
+            min_face_fraction: Ignore faces smaller than this fraction of the
+                shorter image side (in the detection copy)
+        """
+        import cv2
+
+        self._cv2 = cv2
+        self.kind = kind
+        self.min_face_fraction = min_face_fraction
+        if kind == "haar":
+            if not hasattr(cv2, "CascadeClassifier"):
+                raise ValueError("Haar cascades were removed in OpenCV 5; install opencv-python-headless<5 "
+                                 "or use FACE_DETECTOR=yunet")
+            self._detector = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+        elif kind == "yunet":
+            if not model_path:
+                raise ValueError("The yunet detector needs FACE_DETECTOR_MODEL (face_detection_yunet_*.onnx)")
+            self._detector = cv2.FaceDetectorYN.create(model_path, "", (320, 320), score_threshold)
+        else:
+            raise ValueError(f"Unknown face detector: {kind!r} (expected 'haar' or 'yunet')")
+
+    def detect(self, rgb):
+        """
+        Detect faces in an RGB uint8 image.
+
+        Returns:
+            List of (x, y, w, h, score) in the image's pixel coordinates
+        """
+        cv2 = self._cv2
+        height, width = rgb.shape[:2]
+        min_side = max(16, int(min(height, width) * self.min_face_fraction))
+
+        if self.kind == "haar":
+            gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+            gray = cv2.equalizeHist(gray)
+            boxes, _, weights = self._detector.detectMultiScale3(
+                gray, scaleFactor=1.1, minNeighbors=5, minSize=(min_side, min_side), outputRejectLevels=True
+            )
+            return [
+                (int(x), int(y), int(w), int(h), float(score))
+                for (x, y, w, h), score in zip(boxes, np.ravel(weights))
+            ]
+
+        self._detector.setInputSize((width, height))
+        _, faces = self._detector.detect(cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+        if faces is None:
+            return []
+        return [
+            (int(f[0]), int(f[1]), int(f[2]), int(f[3]), float(f[14]))
+            for f in faces if min(f[2], f[3]) >= min_side
+        ]
+
+
+# One detector per worker (thread or process); OpenCV detectors don't pickle
+_detectors = {}
+_detectors_lock = threading.Lock()
+
+
+def _get_detector(kind, model_path):
+    key = (kind, model_path, threading.get_ident())
+    detector = _detectors.get(key)
+    if detector is None:
+        with _detectors_lock:
+            detector = _detectors.setdefault(key, FaceDetector(kind, model_path))
+    return detector
+
+
+def _expand_box(box, margin, width, height):
+    """Square box around a face with `margin` extra on every side, clipped to the image."""
+    x, y, w, h = box[:4]
+    side = max(w, h) * (1.0 + 2.0 * margin)
+    cx, cy = x + w / 2.0, y + h / 2.0
+    left = int(max(0, cx - side / 2.0))
+    top = int(max(0, cy - side / 2.0))
+    right = int(min(width, cx + side / 2.0))
+    bottom = int(min(height, cy + side / 2.0))
+    return left, top, right, bottom
+
+
+def detect_and_crop(contents, target_size, detector_kind="haar", detector_model=None, boxes=None,
+                    detect_max_side=640, decode_max_side=1280, margin=0.25, max_faces=8):
+    """
+    Decode an upload, detect faces (unless boxes are given) and crop them.
+
+    Runs in the decode pool. JPEGs are draft-decoded to about decode_max_side,
+    enough for crops to keep detail without decoding a full 12 MP raster.
+
+    Args:
+        contents: Raw image bytes
+        target_size: (width, height) of each crop
+        detector_kind, detector_model: FaceDetector settings
+        boxes: Previously detected boxes (original image coordinates) to reuse
+        detect_max_side: Longest side of the image the detector sees
+        decode_max_side: Longest side decoded for cropping
+        margin: Context around each face, as a fraction of the face size
+        max_faces: Keep at most this many faces (largest first)
+
+    Returns:
+        (uint8 crops of shape (n, H, W, 3), boxes as [x, y, w, h, score] in
+         original image coordinates, timings dict)
+    """
+    start = time.perf_counter()
+    image = Image.open(BufferReader(contents))
+    original_width = image.width
+    if image.format == 'JPEG':
+        image.draft('RGB', (decode_max_side, decode_max_side))
+    image = image.convert('RGB')
+    scale = image.width / original_width
+    decoded = time.perf_counter()
+    timings = {"decode_ms": (decoded - start) * 1000.0}
+
+    if boxes is None:
+        rgb = np.asarray(image)
+        detect_scale = min(1.0, detect_max_side / max(image.size))
+        if detect_scale < 1.0:
+            small = image.resize((max(1, int(image.width * detect_scale)), max(1, int(image.height * detect_scale))))
+            rgb = np.asarray(small)
+        found = _get_detector(detector_kind, detector_model).detect(rgb)
+        found.sort(key=lambda b: b[2] * b[3], reverse=True)
+        to_original = 1.0 / (scale * detect_scale)
+        boxes = [
+            [int(round(x * to_original)), int(round(y * to_original)),
+             int(round(w * to_original)), int(round(h * to_original)), round(score, 4)]
+            for x, y, w, h, score in found[:max_faces]
+        ]
+        timings["detect_ms"] = (time.perf_counter() - decoded) * 1000.0
+
+    crop_start = time.perf_counter()
+    width, height = target_size
+    crops = np.empty((len(boxes), height, width, 3), dtype=np.uint8)
+    for i, box in enumerate(boxes):
+        scaled = [v * scale for v in box[:4]]
+        region = _expand_box(scaled, margin, image.width, image.height)
+        crops[i] = np.asarray(image.crop(region).resize(target_size), dtype=np.uint8)
+    timings["crop_ms"] = (time.perf_counter() - crop_start) * 1000.0
+    return crops, boxes, timings
+
+
+def aggregate_faces(scores, policy="min"):
+    """
+    Combine per-face sigmoid scores (1 = Real) into an image score.
+
+    "min" calls the image fake if any face looks fake, the usual choice when
+    a single swapped face is enough to make the image a deepfake.
+    """
+    if policy == "min":
+        return float(np.min(scores))
+    if policy == "mean":
+        return float(np.mean(scores))
+    if policy == "max":
+        return float(np.max(scores))
+    raise ValueError(f"Unknown face aggregation: {policy!r} (expected one of {AGGREGATIONS})")
@@ -0,0 +1,125 @@
+# serving/metrics.py
+"""
+Lightweight in-process metrics for the inference API.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class StageTimings:
+    """Running count / mean / max of per-stage latencies in milliseconds."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def record(self, stage, ms):
+        with self._lock:
+            count, total, peak = self._stages.get(stage, (0, 0.0, 0.0))
+            self._stages[stage] = (count + 1, total + ms, max(peak, ms))
+
+    def record_all(self, timings):
+        for stage, ms in timings.items():
+            self.record(stage, ms)
+
+    def summary(self):
+        with self._lock:
+            return {
+                stage: {
+                    "count": count,
+                    "avg_ms": round(total / count, 3),
+                    "max_ms": round(peak, 3),
+                }
+                for stage, (count, total, peak) in self._stages.items()
+            }
+
+
+class RequestMemory:
+    """
+    Per-request peak memory, as the bytes of request buffers alive at once
+    (upload, decoded raster, model input), plus the process high-water mark.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_bytes = 0
+        self.peak_bytes = 0
+
+    def record(self, peak_bytes):
+        with self._lock:
+            self.count += 1
+            self.total_bytes += peak_bytes
+            self.peak_bytes = max(self.peak_bytes, peak_bytes)
+
+    def summary(self):
+        with self._lock:
+            summary = {
+                "requests": self.count,
+                "avg_peak_mb": round(self.total_bytes / self.count / 1e6, 3) if self.count else 0.0,
+                "max_peak_mb": round(self.peak_bytes / 1e6, 3),
+            }
+        if resource is not None:
+            # ru_maxrss is KiB on Linux
+            summary["process_max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+        return summary
+
+
+class StartupProgress:
+    """
+    Tracks model loading so readiness probes can report what the server is doing.
+
+    States: "starting" -> "loading" -> "ready" (or "failed").
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = "starting"
+        self.current_stage = None
+        self.stages = {}
+        self.error = None
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """Time a named startup stage (e.g. import_tensorflow, load_model, warm_up)."""
+        with self._lock:
+            self.state = "loading"
+            self.current_stage = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+                self.current_stage = None
+
+    def mark_ready(self):
+        with self._lock:
+            self.state = "ready"
+
+    def mark_failed(self, error):
+        with self._lock:
+            self.state = "failed"
+            self.error = str(error)
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def summary(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "current_stage": self.current_stage,
+                "stage_seconds": {name: round(seconds, 3) for name, seconds in self.stages.items()},
+                "elapsed_seconds": round(time.perf_counter() - self._started, 3),
+                "error": self.error,
+            }
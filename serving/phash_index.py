@@ -0,0 +1,331 @@
+# serving/phash_index.py
+"""
+Perceptual hashing and a NumPy-backed Hamming-distance index.
+
+Re-encoded, resized or re-compressed copies of an image decode to nearly the
+same pixels, so their 64-bit perceptual hashes differ in only a few bits.
+The index stores one uint64 hash and one float32 score per scored image
+(12 bytes per entry) and answers nearest-neighbour queries with multi-index
+hashing: the 64 bits are split into four 16-bit bands, each with an
+exact-match bucket table. Two hashes within d bits of each other agree to
+within d // 4 bits on at least one band, so probing every bucket that close
+to the query's bands finds every match, and only those candidates are
+compared in full.
+"""
+
+import itertools
+import threading
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+HASH_BITS = 64
+BAND_BITS = 16
+BANDS = HASH_BITS // BAND_BITS
+# Past this distance each band would be probed at radius 4+ (thousands of buckets): scan instead
+MAX_INDEXED_DISTANCE = 4 * BANDS - 1
+
+# Popcount of every 16-bit value, used when np.bitwise_count is unavailable
+_POPCOUNT16 = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.uint8)
+
+
+def _dct_matrix(n):
+    """Orthonormal DCT-II basis as an (n, n) matrix."""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m
+
+
+_DCT32 = _dct_matrix(32)
+
+
+def _bits_to_uint64(bits):
+    packed = np.packbits(bits.astype(np.uint8).ravel())
+    return int.from_bytes(packed.tobytes(), "big")
+
+
+def _grayscale(pixels, size):
+    image = Image.fromarray(pixels).convert("L").resize(size, Image.BILINEAR)
+    return np.asarray(image, dtype=np.float32)
+
+
+def phash(pixels):
+    """
+    64-bit DCT perceptual hash of an RGB uint8 array.
+
+    The image is reduced to 32x32 grayscale, transformed with a 2D DCT and the
+    8x8 lowest frequencies (excluding DC) are thresholded at their median.
+    """
+    gray = _grayscale(pixels, (32, 32))
+    dct = _DCT32 @ gray @ _DCT32.T
+    low = dct[:8, :8].ravel()
+    bits = low > np.median(low[1:])
+    return _bits_to_uint64(bits)
+
+
+def dhash(pixels):
+    """64-bit difference hash of an RGB uint8 array (horizontal gradients on 9x8)."""
+    gray = _grayscale(pixels, (9, 8))
+    bits = gray[:, 1:] > gray[:, :-1]
+    return _bits_to_uint64(bits)
+
+
+HASH_FUNCTIONS = {"phash": phash, "dhash": dhash}
+
+
+def _popcount(values):
+    """Per-element popcount of a uint64 array."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return _POPCOUNT16[values.view(np.uint16).reshape(-1, 4)].sum(axis=1, dtype=np.uint8)
+
+
+@lru_cache(maxsize=None)
+def _probe_masks(radius):
+    """Every BAND_BITS-bit XOR mask with at most `radius` bits set."""
+    masks = [0]
+    for r in range(1, radius + 1):
+        masks.extend(sum(1 << b for b in bits) for bits in itertools.combinations(range(BAND_BITS), r))
+    return np.array(masks, dtype=np.int64)
+
+
+def _band_keys(hashes, band):
+    # uint16 keys: a stable argsort on them is a radix sort
+    return ((hashes >> np.uint64(band * BAND_BITS)) & np.uint64((1 << BAND_BITS) - 1)).astype(np.uint16)
+
+
+def _build_bands(hashes):
+    """Per band: (bucket offsets, slots sorted by bucket), a CSR table over the band's values."""
+    tables = []
+    for band in range(BANDS):
+        keys = _band_keys(hashes, band)
+        order = np.argsort(keys, kind="stable").astype(np.int32)
+        offsets = np.zeros((1 << BAND_BITS) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=1 << BAND_BITS), out=offsets[1:])
+        tables.append((offsets, order))
+    return tables
+
+
+def _bucket_slots(table, probes):
+    """Concatenated slots of the buckets at `probes`, without a Python loop per bucket."""
+    offsets, order = table
+    starts, ends = offsets[probes], offsets[probes + 1]
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return order[:0]
+    # Position of each output element in `order`: its bucket's start plus its rank inside the bucket
+    bucket_begin = np.cumsum(lengths) - lengths
+    return order[np.repeat(starts - bucket_begin, lengths) + np.arange(total)]
+
+
+class PerceptualHashIndex:
+    """
+    Append-only store of (hash, score) pairs with Hamming-distance lookup.
+
+    Storage grows by doubling up to max_entries; past that the oldest entries
+    are overwritten ring-buffer style. The band tables cover the entries that
+    existed at their last rebuild; slots written since then sit in a short
+    tail that lookups compare directly. Once the tail reaches tail_size the
+    tables are rebuilt on a background thread, and lookups only hold the lock
+    to copy candidates, so concurrent lookups and adds never wait on a scan.
+    """
+
+    def __init__(self, max_entries=5_000_000, initial_capacity=1024, block_size=1 << 20, tail_size=1 << 16):
+        """
+        Args:
+            max_entries: Capacity at which the index starts overwriting its oldest entries
+            initial_capacity: Starting array size
+            block_size: Entries compared per vectorised block by full scans
+                (distances over MAX_INDEXED_DISTANCE)
+            tail_size: Entries added since the last rebuild that trigger the next one
+        """
+        self.max_entries = max_entries
+        self.block_size = block_size
+        self.tail_size = tail_size
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._hashes = np.zeros(min(initial_capacity, max_entries), dtype=np.uint64)
+        self._scores = np.zeros(len(self._hashes), dtype=np.float32)
+        self._size = 0
+        self._next = 0
+
+        # Band tables and the slots written since they were built
+        self._bands = None
+        self._tail = np.zeros(tail_size, dtype=np.int64)
+        self._tail_len = 0
+        self._rebuilding = False
+
+        # Metrics
+        self.lookups = 0
+        self.hits = 0
+        self.rebuilds = 0
+
+    def __len__(self):
+        return self._size
+
+    def _grow(self):
+        capacity = min(len(self._hashes) * 2, self.max_entries)
+        hashes = np.zeros(capacity, dtype=np.uint64)
+        scores = np.zeros(capacity, dtype=np.float32)
+        hashes[:self._size] = self._hashes[:self._size]
+        scores[:self._size] = self._scores[:self._size]
+        self._hashes, self._scores = hashes, scores
+
+    def add(self, hash_value, score):
+        """Insert one scored hash."""
+        with self._lock:
+            if self._next >= len(self._hashes) and len(self._hashes) < self.max_entries:
+                self._grow()
+            slot = self._next % len(self._hashes)
+            self._hashes[slot] = np.uint64(hash_value)
+            self._scores[slot] = score
+            self._next = slot + 1
+            self._size = max(self._size, self._next)
+
+            if self._tail_len == len(self._tail):
+                # A rebuild is still running: keep every slot until it lands
+                self._tail = np.concatenate([self._tail, np.zeros(len(self._tail), dtype=np.int64)])
+            self._tail[self._tail_len] = slot
+            self._tail_len += 1
+            start_rebuild = self._tail_len >= self.tail_size and not self._rebuilding
+            if start_rebuild:
+                self._rebuilding = True
+        if start_rebuild:
+            threading.Thread(target=self.rebuild, name="phash-index-rebuild", daemon=True).start()
+
+    def rebuild(self):
+        """Rebuild the band tables over every entry and empty the tail."""
+        with self._rebuild_lock:
+            with self._lock:
+                self._rebuilding = True
+                hashes = self._hashes[:self._size].copy()
+                covered = self._tail_len
+            try:
+                bands = _build_bands(hashes)
+            except BaseException:
+                with self._lock:
+                    self._rebuilding = False
+                raise
+            with self._lock:
+                self._bands = bands
+                # Slots written while the tables were built stay in the tail
+                remaining = self._tail_len - covered
+                self._tail[:remaining] = self._tail[covered:self._tail_len]
+                self._tail_len = remaining
+                self._rebuilding = False
+                self.rebuilds += 1
+
+    def _candidates(self, query, max_distance):
+        """Slots that may lie within max_distance of query (a superset; duplicates allowed)."""
+        with self._lock:
+            bands = self._bands
+            tail = self._tail[:self._tail_len].copy()
+        if bands is None:
+            return tail
+        masks = _probe_masks(max_distance // BANDS)
+        query = np.array([query], dtype=np.uint64)
+        slots = [tail]
+        for band, table in enumerate(bands):
+            slots.append(_bucket_slots(table, int(_band_keys(query, band)[0]) ^ masks))
+        return np.concatenate(slots)
+
+    def _scan(self, query, max_distance):
+        """Nearest slot within max_distance by comparing every entry, in blocks."""
+        best_index, best_distance = -1, max_distance + 1
+        for start in range(0, self._size, self.block_size):
+            with self._lock:
+                block = self._hashes[start:min(start + self.block_size, self._size)].copy()
+            distances = _popcount(np.bitwise_xor(block, query))
+            i = int(np.argmin(distances))
+            if distances[i] < best_distance:
+                best_index, best_distance = start + i, int(distances[i])
+                if best_distance == 0:
+                    break
+        return best_index, best_distance
+
+    def query(self, hash_value, max_distance):
+        """
+        Find the closest stored hash within max_distance bits.
+
+        Returns:
+            (score, distance) of the nearest match, or None
+        """
+        query = np.uint64(hash_value)
+        if max_distance > MAX_INDEXED_DISTANCE:
+            best_index, best_distance = self._scan(query, max_distance)
+            with self._lock:
+                self.lookups += 1
+                if best_index < 0:
+                    return None
+                # The slot may have been overwritten since the scan read it
+                if int(_popcount(self._hashes[best_index:best_index + 1] ^ query)[0]) != best_distance:
+                    return None
+                self.hits += 1
+                return float(self._scores[best_index]), best_distance
+
+        slots = self._candidates(query, max_distance)
+        with self._lock:
+            self.lookups += 1
+            hashes = self._hashes[slots]
+            scores = self._scores[slots]
+        if len(slots) == 0:
+            return None
+        distances = _popcount(np.bitwise_xor(hashes, query))
+        i = int(np.argmin(distances))
+        if distances[i] > max_distance:
+            return None
+        with self._lock:
+            self.hits += 1
+        return float(scores[i]), int(distances[i])
+
+    def save(self, path, model_id=None):
+        """Write the index to an .npz file tagged with the scoring model's identity."""
+        with self._lock:
+            np.savez(
+                path,
+                hashes=self._hashes[:self._size],
+                scores=self._scores[:self._size],
+                next=np.int64(self._next),
+                model_id=np.str_(model_id or "")
+            )
+
+    @classmethod
+    def load(cls, path, model_id=None, **kwargs):
+        """
+        Load an index saved with save().
+
+        Returns an empty index if the file was written for a different model.
+        """
+        index = cls(**kwargs)
+        with np.load(path) as data:
+            if model_id is not None and str(data["model_id"]) != model_id:
+                print(f"Ignoring perceptual hash index {path}: built for a different model")
+                return index
+            hashes, scores = data["hashes"], data["scores"]
+            n = min(len(hashes), index.max_entries)
+            index._hashes = np.zeros(max(n, len(index._hashes)), dtype=np.uint64)
+            index._scores = np.zeros(len(index._hashes), dtype=np.float32)
+            index._hashes[:n] = hashes[:n]
+            index._scores[:n] = scores[:n]
+            index._size = n
+            index._next = int(data["next"]) % len(index._hashes) if n == index.max_entries else n
+        if n:
+            index.rebuild()
+        return index
+
+    def stats(self):
+        bands = self._bands or []
+        return {
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "memory_bytes": int(self._hashes.nbytes + self._scores.nbytes + self._tail.nbytes
+                                + sum(offsets.nbytes + order.nbytes for offsets, order in bands)),
+            "unindexed_entries": self._tail_len,
+            "rebuilds": self.rebuilds,
+            "lookups": self.lookups,
+            "near_duplicate_hits": self.hits,
+        }
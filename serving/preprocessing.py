@@ -0,0 +1,168 @@
+# serving/preprocessing.py
+"""
+Image decoding and preprocessing for the inference API.
+
+Decoding runs in a thread or process pool so large uploads never stall the
+event loop. Functions here only depend on PIL and numpy, so process-pool
+workers start without importing TensorFlow.
+"""
+
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+from PIL import Image
+
+from serving.faces import detect_and_crop
+from serving.phash_index import HASH_FUNCTIONS
+from serving.uploads import BufferReader
+
+# Model input size used by the API
+IMAGE_SIZE = (224, 224)
+
+
+def to_uint8(image: Image.Image, target_size=IMAGE_SIZE) -> np.ndarray:
+    """Convert a PIL image to a resized RGB uint8 array of shape (H, W, 3)."""
+    # Convert to RGB if needed
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    # Resize to model input size
+    image = image.resize(target_size)
+
+    return np.asarray(image, dtype=np.uint8)
+
+
+def normalize(pixels: np.ndarray) -> np.ndarray:
+    """Scale a uint8 (H, W, 3) array to float32 [0, 1] with a batch dimension."""
+    img_array = pixels.astype(np.float32) / 255.0
+    return np.expand_dims(img_array, axis=0)
+
+
+def decode_image_bytes(contents, target_size=IMAGE_SIZE, use_draft=True, hash_name=None):
+    """
+    Decode upload bytes into a resized uint8 array.
+
+    For JPEGs, PIL's draft mode lets libjpeg downscale by 1/2, 1/4 or 1/8
+    while decoding, so a 4000px photo is never fully materialised just to be
+    resized to 224px.
+
+    The upload is read through a BufferReader, so a memoryview over the
+    request buffer is decoded in place rather than copied into a BytesIO.
+
+    Args:
+        contents: Raw image bytes (bytes, bytearray or memoryview)
+        target_size: (width, height) to resize to
+        use_draft: Enable JPEG draft-mode decoding
+        hash_name: Optional perceptual hash ("phash" or "dhash") to compute
+            from the resized pixels
+
+    Returns:
+        (uint8 array of shape (H, W, 3), {"decode_ms": ..., "preprocess_ms": ...},
+         hash as int or None, bytes of the decoded full-size raster)
+    """
+    start = time.perf_counter()
+    image = Image.open(BufferReader(contents))
+    if use_draft and image.format == 'JPEG':
+        # Never drafts below target_size, so the final resize is still a downscale
+        image.draft('RGB', target_size)
+    image.load()
+    decoded = time.perf_counter()
+    decoded_bytes = image.width * image.height * len(image.getbands())
+
+    pixels = to_uint8(image, target_size)
+    done = time.perf_counter()
+
+    timings = {
+        "decode_ms": (decoded - start) * 1000.0,
+        "preprocess_ms": (done - decoded) * 1000.0,
+    }
+
+    hash_value = None
+    if hash_name is not None:
+        hash_value = HASH_FUNCTIONS[hash_name](pixels)
+        timings["hash_ms"] = (time.perf_counter() - done) * 1000.0
+
+    return pixels, timings, hash_value, decoded_bytes
+
+
+class DecodePool:
+    """
+    Runs decode_image_bytes in a thread or process pool.
+
+    Threads are cheap and PIL releases the GIL during decode, so they suit
+    most deployments. Processes isolate decoding completely at the cost of
+    pickling the decoded array back to the server process.
+    """
+
+    def __init__(self, kind="thread", workers=4, target_size=IMAGE_SIZE, use_draft=True, hash_name=None):
+        """
+        Args:
+            kind: "thread" or "process"
+            workers: Number of pool workers
+            target_size: (width, height) images are resized to
+            use_draft: Enable JPEG draft-mode decoding
+            hash_name: Perceptual hash computed alongside decoding, or None
+        """
+        if kind == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decode")
+        elif kind == "process":
+            # spawn, not fork: the server process has TensorFlow loaded
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            raise ValueError(f"Unknown decode pool kind: {kind!r} (expected 'thread' or 'process')")
+
+        self.kind = kind
+        self.workers = workers
+        self.target_size = tuple(target_size)
+        self.use_draft = use_draft
+        self.hash_name = hash_name
+
+    async def decode(self, contents):
+        """
+        Decode and preprocess upload bytes off the event loop.
+
+        Returns:
+            (float32 array of shape (1, H, W, 3), stage timings dict,
+             perceptual hash or None, peak bytes held while decoding)
+        """
+        if self.kind == "process" and not isinstance(contents, bytes):
+            # memoryviews don't pickle; the copy is made once, for the worker
+            contents = bytes(contents)
+        loop = asyncio.get_running_loop()
+        pixels, timings, hash_value, decoded_bytes = await loop.run_in_executor(
+            self._executor, decode_image_bytes, contents, self.target_size, self.use_draft, self.hash_name
+        )
+        array = normalize(pixels)
+        # Upload buffer, full-size raster, resized uint8 and float32 input are alive together at worst
+        peak_bytes = len(contents) + decoded_bytes + pixels.nbytes + array.nbytes
+        return array, timings, hash_value, peak_bytes
+
+    async def crop_faces(self, contents, boxes=None, **options):
+        """
+        Detect faces (or reuse `boxes`) and crop them off the event loop.
+
+        Args:
+            contents: Raw image bytes
+            boxes: Cached boxes from an earlier detection, or None to detect
+            **options: Passed to serving.faces.detect_and_crop
+
+        Returns:
+            (float32 crops of shape (n, H, W, 3), boxes, stage timings dict)
+        """
+        if self.kind == "process" and not isinstance(contents, bytes):
+            contents = bytes(contents)
+        loop = asyncio.get_running_loop()
+        crops, boxes, timings = await loop.run_in_executor(
+            self._executor, partial(detect_and_crop, contents, self.target_size, boxes=boxes, **options)
+        )
+        return crops.astype(np.float32) / 255.0, boxes, timings
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,228 @@
+# serving/result_cache.py
+"""
+Content-hash result cache for the inference API.
+
+Results are keyed by a hash of the uploaded bytes plus the identity of the
+model that produced them, so a retrained model never serves stale scores.
+An in-memory LRU sits in front of an optional SQLite tier that survives
+restarts.
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def content_key(contents, model_id):
+    """Cache key for raw upload bytes scored by the model identified by model_id."""
+    digest = hashlib.blake2b(contents, digest_size=20).hexdigest()
+    return f"{model_id}:{digest}"
+
+
+def model_identity(path):
+    """Identify a model file by name, size and modification time."""
+    stat = os.stat(path)
+    return f"{os.path.basename(path)}-{stat.st_size}-{int(stat.st_mtime)}"
+
+
+class ResultCache:
+    """
+    LRU + TTL cache of raw model scores.
+
+    The memory tier evicts least-recently-used entries beyond max_entries.
+    The disk tier, when enabled, keeps everything younger than ttl_seconds
+    and is consulted on memory misses. Disk writes are batched by a
+    background thread (one transaction every flush_interval seconds), which
+    also purges expired rows at startup and every purge_interval seconds, so
+    put() never waits on SQLite. Coroutines look entries up with aget(),
+    which reads the disk tier on a worker thread.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=86400, disk_path=None,
+                 flush_interval=1.0, purge_interval=3600.0):
+        """
+        Args:
+            max_entries: Maximum entries held in memory
+            ttl_seconds: Entries older than this are treated as misses (0 = never expire)
+            disk_path: Optional SQLite file for the persistent tier
+            flush_interval: Seconds between batched disk writes
+            purge_interval: Seconds between purges of expired entries
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        self.flush_interval = flush_interval
+        self.purge_interval = purge_interval
+
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()  # the read connection; never held with _lock
+        self._memory = OrderedDict()  # key -> (score, created)
+        self._pending = {}  # key -> (score, created), not yet on disk
+        self._db = None
+        self._writer = None
+        self._stop = threading.Event()
+
+        # Metrics (set before the writer thread starts updating them)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_writes = 0
+        self.purged = 0
+
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            # WAL lets get() read while the writer thread commits
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, score REAL NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+            self._writer = threading.Thread(target=self._write_loop, name="result-cache-writer", daemon=True)
+            self._writer.start()
+
+    def _expired(self, created, now):
+        return self.ttl_seconds > 0 and now - created > self.ttl_seconds
+
+    def _memory_get(self, key, now):
+        """Score from the memory tier or the pending writes, or None."""
+        with self._lock:
+            entry = self._memory.get(key) or self._pending.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[1], now):
+                self._memory.pop(key, None)
+                return None
+            if key in self._memory:
+                self._memory.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _disk_get(self, key, now):
+        """Score from the disk tier (counted as a miss if absent), or None."""
+        row = None
+        with self._db_lock:
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT score, created FROM results WHERE key = ?", (key,)
+                ).fetchone()
+        with self._lock:
+            if row is not None and not self._expired(row[1], now):
+                self._insert_memory(key, row[0], row[1])
+                self.hits += 1
+                self.disk_hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def get(self, key):
+        """Return the cached score for key, or None (may read SQLite; use aget in coroutines)."""
+        now = time.time()
+        score = self._memory_get(key, now)
+        if score is not None:
+            return score
+        return self._disk_get(key, now)
+
+    async def aget(self, key):
+        """get() for the event loop: memory hits return at once, disk reads run on a worker thread."""
+        now = time.time()
+        score = self._memory_get(key, now)
+        if score is not None:
+            return score
+        if self._db is None:
+            return self._disk_get(key, now)
+        return await asyncio.to_thread(self._disk_get, key, now)
+
+    def put(self, key, score):
+        """Store a score in memory and queue it for the disk tier, if enabled."""
+        now = time.time()
+        score = float(score)
+        with self._lock:
+            self._insert_memory(key, score, now)
+            if self._db is not None:
+                self._pending[key] = (score, now)
+
+    def _insert_memory(self, key, score, created):
+        self._memory[key] = (score, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    # ---------- Disk writer thread ----------
+    def _write_loop(self):
+        db = sqlite3.connect(self.disk_path)
+        try:
+            self._purge_expired(db)
+            next_purge = time.monotonic() + self.purge_interval
+            while not self._stop.wait(self.flush_interval):
+                self._flush(db)
+                if time.monotonic() >= next_purge:
+                    self._purge_expired(db)
+                    next_purge = time.monotonic() + self.purge_interval
+            self._flush(db)
+        finally:
+            db.close()
+
+    def _flush(self, db):
+        """Write every pending entry in one transaction."""
+        with self._lock:
+            pending = dict(self._pending)
+        if not pending:
+            return
+        db.executemany(
+            "INSERT OR REPLACE INTO results (key, score, created) VALUES (?, ?, ?)",
+            [(key, score, created) for key, (score, created) in pending.items()]
+        )
+        db.commit()
+        # Only now are they readable from disk; keep any entry put() replaced meanwhile
+        with self._lock:
+            for key, entry in pending.items():
+                if self._pending.get(key) == entry:
+                    del self._pending[key]
+        self.disk_writes += len(pending)
+
+    def _purge_expired(self, db):
+        """Drop expired entries from both tiers."""
+        if self.ttl_seconds <= 0:
+            return
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            for key in [k for k, (_, created) in self._memory.items() if created < cutoff]:
+                del self._memory[key]
+        deleted = db.execute("DELETE FROM results WHERE created < ?", (cutoff,)).rowcount
+        db.commit()
+        self.purged += max(deleted, 0)
+
+    def close(self):
+        """Flush pending writes and close the disk tier."""
+        if self._writer is not None:
+            self._stop.set()
+            self._writer.join()
+            self._writer = None
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "disk_tier": self.disk_path,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "pending_writes": len(self._pending),
+            "disk_writes": self.disk_writes,
+            "purged": self.purged,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
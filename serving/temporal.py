@@ -0,0 +1,122 @@
+# serving/temporal.py
+"""
+Sliding-window scoring for the temporal LSTM (src/model_lstm.build_temporal_lstm).
+
+Each frame is encoded by the CNN exactly once; its embedding goes into a
+fixed-size ring buffer, and the LSTM head scores the buffered window every
+`hop` frames. Overlapping windows therefore share encoder work instead of
+re-encoding every frame they contain.
+"""
+
+import numpy as np
+
+
+def sliding_windows(features, window, hop):
+    """
+    Cut a (T, D) sequence of frame embeddings into overlapping windows.
+
+    Sequences shorter than one window are edge-padded to a single window,
+    matching SlidingWindowScorer.flush().
+
+    Returns:
+        Array of shape (n_windows, window, D)
+    """
+    features = np.asarray(features, dtype=np.float32)
+    if len(features) == 0:
+        return np.empty((0, window, features.shape[-1]), dtype=np.float32)
+    if len(features) < window:
+        padded = np.pad(features, ((0, window - len(features)), (0, 0)), mode="edge")
+        return padded[None]
+    views = np.lib.stride_tricks.sliding_window_view(features, window, axis=0)
+    # sliding_window_view puts the window axis last: (n, D, window) -> (n, window, D)
+    return np.ascontiguousarray(views[::hop].transpose(0, 2, 1))
+
+
+class SlidingWindowScorer:
+    """
+    Incremental temporal scoring over a stream of frames.
+
+    Usage:
+        scorer = SlidingWindowScorer(encoder.predict, head.predict, window=16, hop=4)
+        for frames, timestamps in batches:
+            for end_time, score in scorer.push(frames, timestamps): ...
+        for end_time, score in scorer.flush(): ...   # short clips
+    """
+
+    def __init__(self, encode_fn, head_fn, window=16, hop=4):
+        """
+        Args:
+            encode_fn: Maps a float32 frame batch (N, H, W, 3) to embeddings (N, D)
+            head_fn: Maps a window batch (M, window, D) to scores (M, 1)
+            window: Frames per LSTM window
+            hop: New frames between consecutive scored windows
+        """
+        self.encode_fn = encode_fn
+        self.head_fn = head_fn
+        self.window = window
+        self.hop = max(1, hop)
+
+        self._buffer = None
+        self._timestamps = np.zeros(window, dtype=np.float64)
+        self._next = 0
+        self.frames_encoded = 0
+        self.windows_scored = 0
+
+    def _ordered(self):
+        """Buffered embeddings, oldest first."""
+        start = self._next % self.window
+        return np.concatenate([self._buffer[start:], self._buffer[:start]])
+
+    def push(self, frames, timestamps):
+        """
+        Encode new frames and score every window completed by them.
+
+        Returns:
+            List of (timestamp of the window's last frame, score)
+        """
+        if len(frames) == 0:
+            return []
+        embeddings = np.asarray(self.encode_fn(frames), dtype=np.float32)
+        if self._buffer is None:
+            self._buffer = np.zeros((self.window, embeddings.shape[-1]), dtype=np.float32)
+
+        windows, ends = [], []
+        for embedding, timestamp in zip(embeddings, timestamps):
+            slot = self._next % self.window
+            self._buffer[slot] = embedding
+            self._timestamps[slot] = timestamp
+            self._next += 1
+            if self._next >= self.window and (self._next - self.window) % self.hop == 0:
+                windows.append(self._ordered())
+                ends.append(float(timestamp))
+        self.frames_encoded += len(embeddings)
+
+        if not windows:
+            return []
+        scores = np.asarray(self.head_fn(np.stack(windows)), dtype=np.float32).reshape(len(windows), -1)[:, 0]
+        self.windows_scored += len(windows)
+        return list(zip(ends, scores.tolist()))
+
+    def flush(self):
+        """
+        Score a clip that ended before filling one window (edge-padded).
+
+        Returns:
+            [(timestamp of the last frame, score)] or [] if a window was
+            already scored or no frames were pushed
+        """
+        if self.windows_scored or self._next == 0:
+            return []
+        features = self._buffer[:self._next]
+        window = sliding_windows(features, self.window, self.hop)
+        score = float(np.asarray(self.head_fn(window), dtype=np.float32).reshape(-1)[0])
+        self.windows_scored += 1
+        return [(float(self._timestamps[self._next - 1]), score)]
+
+    def stats(self):
+        return {
+            "window": self.window,
+            "hop": self.hop,
+            "frames_encoded": self.frames_encoded,
+            "windows_scored": self.windows_scored,
+        }
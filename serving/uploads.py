@@ -0,0 +1,345 @@
+# serving/uploads.py
+"""
+Bounded, low-copy ingestion of uploaded files.
+
+Three layers keep a large or hostile upload from costing unbounded memory:
+
+  1. UploadLimitMiddleware rejects a request with 413 as soon as its
+     Content-Length, or the running byte count of a chunked body, passes the
+     limit, before the multipart parser has buffered the rest.
+  2. On image-only endpoints the middleware also sniffs the first file part
+     of a multipart body as it streams in and answers 400 if it does not
+     start with an image signature, so a non-image is never spooled.
+     read_upload sniffs again, for files the middleware did not see (other
+     endpoints, or bodies it could not parse).
+  3. The body is read once into a single preallocated buffer and handed on
+     as a memoryview; BufferReader lets PIL decode straight from it without
+     the extra copy io.BytesIO would make.
+"""
+
+import asyncio
+import io
+import json
+
+# Bytes needed to recognise every signature in sniff_image_type
+SNIFF_BYTES = 16
+
+# Body bytes UploadLimitMiddleware holds back looking for the first file part
+SNIFF_PREFIX_BYTES = 64 * 1024
+
+UNSUPPORTED_IMAGE_MESSAGE = "File is not a supported image (JPEG, PNG, GIF, BMP, WebP or TIFF)"
+
+READ_CHUNK_BYTES = 256 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds its size limit."""
+
+
+class UnsupportedImageError(ValueError):
+    """Raised when an upload does not start with a known image signature."""
+
+
+def sniff_image_type(header):
+    """
+    Identify an image format from its leading magic bytes.
+
+    Args:
+        header: At least the first SNIFF_BYTES bytes of the file
+
+    Returns:
+        PIL format name ("JPEG", "PNG", ...) or None if unrecognised
+    """
+    header = bytes(header[:SNIFF_BYTES])
+    if header.startswith(b"\xff\xd8\xff"):
+        return "JPEG"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "PNG"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "GIF"
+    if header.startswith(b"BM"):
+        return "BMP"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "WEBP"
+    if header[:4] in (b"II*\x00", b"MM\x00*"):
+        return "TIFF"
+    return None
+
+
+def multipart_boundary(headers):
+    """The boundary of a multipart/form-data request, from its ASGI headers (None otherwise)."""
+    for name, value in headers:
+        if name == b"content-type":
+            media_type, _, params = value.partition(b";")
+            if media_type.strip().lower() != b"multipart/form-data":
+                return None
+            for param in params.split(b";"):
+                key, _, boundary = param.strip().partition(b"=")
+                if key.lower() == b"boundary" and boundary:
+                    return boundary.strip(b'"')
+    return None
+
+
+def first_part_allowed(prefix, boundary, complete=False):
+    """
+    Whether the first part of a multipart body may go on to the application.
+
+    A file part is allowed only if it starts with an image signature; any
+    other first part (a plain form field) is allowed and left to the endpoint.
+
+    Args:
+        prefix: The body received so far
+        boundary: The multipart boundary
+        complete: prefix is the whole body
+
+    Returns:
+        True or False, or None while prefix is too short to tell
+    """
+    delimiter = b"--" + boundary
+    start = prefix.find(delimiter)
+    headers_end = prefix.find(b"\r\n\r\n", start) if start >= 0 else -1
+    if headers_end < 0:
+        return True if complete else None
+    if b"filename=" not in prefix[start:headers_end].lower():
+        return True
+    content = prefix[headers_end + 4:]
+    part_end = content.find(b"\r\n" + delimiter)
+    if part_end >= 0:
+        content = content[:part_end]
+    elif len(content) < SNIFF_BYTES and not complete:
+        return None
+    return sniff_image_type(content) is not None
+
+
+def _readinto_all(fileobj, view):
+    """Fill `view` from `fileobj`; returns the number of bytes read."""
+    # SpooledTemporaryFile only has readinto from Python 3.11
+    readinto = getattr(fileobj, "readinto", None)
+    filled = 0
+    while filled < len(view):
+        if readinto is not None:
+            n = readinto(view[filled:filled + READ_CHUNK_BYTES])
+        else:
+            data = fileobj.read(min(READ_CHUNK_BYTES, len(view) - filled))
+            n = len(data)
+            view[filled:filled + n] = data
+        if not n:
+            break
+        filled += n
+    return filled
+
+
+async def read_upload(upload, max_bytes, sniff=True):
+    """
+    Read an uploaded file into one buffer, enforcing a size limit.
+
+    When the multipart parser knows the part size the buffer is allocated once
+    at that size; otherwise the file is read in chunks and the limit is checked
+    after each one.
+
+    Args:
+        upload: FastAPI/Starlette UploadFile
+        max_bytes: Largest accepted file size
+        sniff: Reject files that do not start with an image signature
+
+    Returns:
+        (memoryview over the file contents, sniffed format or None)
+
+    Raises:
+        UploadTooLargeError: The file is larger than max_bytes
+        UnsupportedImageError: sniff is set and the header is not an image
+    """
+    fileobj = upload.file
+    size = getattr(upload, "size", None)
+    if size is not None and size > max_bytes:
+        raise UploadTooLargeError(f"File too large (max {max_bytes / 1e6:.1f} MB)")
+
+    fileobj.seek(0)
+    header = fileobj.read(SNIFF_BYTES)
+    image_type = sniff_image_type(header)
+    if sniff and image_type is None:
+        raise UnsupportedImageError(UNSUPPORTED_IMAGE_MESSAGE)
+
+    if size is not None:
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        view[:len(header)] = header
+        filled = len(header) + await asyncio.to_thread(_readinto_all, fileobj, view[len(header):])
+        return view[:filled], image_type
+
+    buffer = bytearray(header)
+    while True:
+        chunk = await asyncio.to_thread(fileobj.read, READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        if len(buffer) + len(chunk) > max_bytes:
+            raise UploadTooLargeError(f"File too large (max {max_bytes / 1e6:.1f} MB)")
+        buffer += chunk
+    return memoryview(buffer), image_type
+
+
+class BufferReader(io.RawIOBase):
+    """Read-only, seekable file object over a bytes-like object, without copying it."""
+
+    def __init__(self, data):
+        super().__init__()
+        self._view = memoryview(data).cast("B")
+        self._pos = 0
+
+    def __repr__(self):
+        # PIL puts the file object's repr in "cannot identify image file" errors
+        return f"<upload of {len(self._view)} bytes>"
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), len(self._view) - self._pos)
+        if n <= 0:
+            return 0
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = len(self._view) + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        self._pos = max(0, self._pos)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware that caps request body size.
+
+    Requests declaring a larger Content-Length are answered with 413 without
+    reading the body. Otherwise body chunks are counted as they arrive; once
+    the limit is passed the client gets 413 and the application sees a
+    disconnect, so the rest of the body is never buffered.
+
+    On image_paths, multipart bodies are held back until the first file
+    part's leading bytes have arrived (at most SNIFF_PREFIX_BYTES); a file
+    that is not an image is answered with 400 before the application runs.
+    """
+
+    def __init__(self, app, max_bytes, image_paths=()):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.image_paths = frozenset(image_paths)
+        self.rejected = 0
+        self.rejected_non_images = 0
+
+    async def _reject(self, send, status=413, detail=None):
+        if status == 413:
+            self.rejected += 1
+            detail = f"Request body too large (max {self.max_bytes / 1e6:.1f} MB)"
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                        (b"connection", b"close")],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def _sniff_first_file(self, receive, boundary):
+        """
+        Receive body messages until the first file part can be judged.
+
+        Returns:
+            (messages received, first_part_allowed's verdict or None if undecided)
+        """
+        messages, prefix = [], b""
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                return messages, None
+            prefix += message.get("body", b"")
+            more_body = message.get("more_body", False)
+            allowed = first_part_allowed(prefix, boundary, complete=not more_body)
+            if allowed is not None or not more_body or len(prefix) >= SNIFF_PREFIX_BYTES:
+                return messages, allowed
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        sniff = scope.get("path") in self.image_paths
+        if not self.max_bytes and not sniff:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get("headers", ()):
+            if name == b"content-length" and self.max_bytes:
+                try:
+                    declared = int(value)
+                except ValueError:
+                    declared = 0
+                if declared > self.max_bytes:
+                    await self._reject(send)
+                    return
+
+        received = 0
+        response_started = False
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request" and self.max_bytes:
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    rejected = True
+                    if not response_started:
+                        await self._reject(send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            # Drop whatever the app tries to send after the 413
+            if rejected:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        app_receive = limited_receive
+        boundary = multipart_boundary(scope.get("headers", ())) if sniff else None
+        if boundary:
+            held, allowed = await self._sniff_first_file(limited_receive, boundary)
+            if rejected:
+                return
+            if allowed is False:
+                self.rejected_non_images += 1
+                await self._reject(send, status=400, detail=UNSUPPORTED_IMAGE_MESSAGE)
+                return
+
+            async def app_receive():
+                # Replay what the sniff held back, then continue with the live body
+                if held:
+                    return held.pop(0)
+                return await limited_receive()
+
+        try:
+            await self.app(scope, app_receive, guarded_send)
+        except Exception:
+            # The app may fail on the simulated disconnect; the client already has its 413
+            if not rejected:
+                raise
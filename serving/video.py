@@ -0,0 +1,260 @@
+# serving/video.py
+"""
+Frame sampling and score aggregation for video uploads.
+
+Frames are decoded one at a time with OpenCV and only the sampled ones are
+converted and resized, so memory stays at one batch of model-sized frames
+however long the video is. Sampling is either by fixed stride (one frame
+every N seconds) or by scene change (a frame whose thumbnail differs enough
+from the last sampled one).
+
+OpenCV is an optional dependency: pip install opencv-python-headless
+"""
+
+import math
+import os
+import tempfile
+
+import numpy as np
+
+from serving.uploads import UploadTooLargeError
+
+# Size of the grayscale thumbnail compared for scene-change detection
+SCENE_THUMBNAIL = (32, 32)
+
+
+def sniff_video_type(header):
+    """
+    Identify a video container from its leading bytes.
+
+    Returns:
+        "mp4" (MP4/MOV/3GP), "matroska" (MKV/WebM), "avi" or None
+    """
+    header = bytes(header[:16])
+    if header[4:8] == b"ftyp":
+        return "mp4"
+    if header.startswith(b"\x1a\x45\xdf\xa3"):
+        return "matroska"
+    if header[:4] == b"RIFF" and header[8:12] == b"AVI ":
+        return "avi"
+    return None
+
+
+def spool_to_file(fileobj, max_bytes, suffix=""):
+    """
+    Copy an upload to a named temporary file in chunks (OpenCV needs a path).
+
+    Returns:
+        Path of the temporary file; the caller deletes it
+
+    Raises:
+        UploadTooLargeError: The upload is larger than max_bytes
+    """
+    fileobj.seek(0)
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix="video-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            written = 0
+            while True:
+                chunk = fileobj.read(1024 * 1024)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLargeError(f"Video too large (max {max_bytes / 1e6:.1f} MB)")
+                out.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+class FrameSampler:
+    """
+    Pulls sampled frames from a video file in batches.
+
+    Frames that are not sampled are only grabbed (demuxed and decoded by
+    OpenCV, never converted to RGB or resized), which is the cheap path.
+    """
+
+    def __init__(self, path, target_size, mode="stride", stride_seconds=0.5,
+                 scene_threshold=0.25, scene_check_every=3, scene_max_gap_seconds=2.0, max_frames=300):
+        """
+        Args:
+            path: Video file path
+            target_size: (width, height) frames are resized to
+            mode: "stride" or "scene"
+            stride_seconds: Seconds between sampled frames in stride mode
+            scene_threshold: Mean absolute thumbnail difference (0-1) that
+                counts as a new scene
+            scene_check_every: In scene mode, compare every Nth frame
+            scene_max_gap_seconds: In scene mode, also sample a frame after
+                this long without a scene change, so static shots are covered
+            max_frames: Stop after this many sampled frames
+        """
+        import cv2
+
+        if mode not in ("stride", "scene"):
+            raise ValueError(f"Unknown sampling mode: {mode!r} (expected 'stride' or 'scene')")
+
+        self._cv2 = cv2
+        self._capture = cv2.VideoCapture(path)
+        if not self._capture.isOpened():
+            raise ValueError("Could not open video (unsupported or corrupt container)")
+
+        self.mode = mode
+        self.target_size = tuple(target_size)
+        self.fps = self._capture.get(cv2.CAP_PROP_FPS) or 25.0
+        self.frame_count = int(self._capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        self.stride = max(1, int(round(stride_seconds * self.fps)))
+        self.scene_threshold = scene_threshold
+        self.scene_check_every = max(1, scene_check_every)
+        self.scene_max_gap = max(1, int(round(scene_max_gap_seconds * self.fps)))
+        self.max_frames = max_frames
+
+        self.position = 0
+        self.sampled = 0
+        self.exhausted = False
+        self._last_thumbnail = None
+        self._last_sampled = None
+
+    @property
+    def duration(self):
+        return self.frame_count / self.fps if self.frame_count else None
+
+    def _thumbnail(self, frame):
+        gray = self._cv2.cvtColor(frame, self._cv2.COLOR_BGR2GRAY)
+        small = self._cv2.resize(gray, SCENE_THUMBNAIL, interpolation=self._cv2.INTER_AREA)
+        return small.astype(np.float32) / 255.0
+
+    def _to_pixels(self, frame):
+        rgb = self._cv2.cvtColor(frame, self._cv2.COLOR_BGR2RGB)
+        return self._cv2.resize(rgb, self.target_size, interpolation=self._cv2.INTER_AREA)
+
+    def _next_frame(self):
+        """Advance to the next sampled frame; returns (index, BGR frame) or None."""
+        while True:
+            index = self.position
+            if self.mode == "stride":
+                # Grab without retrieving until the next stride point
+                if index % self.stride != 0:
+                    if not self._capture.grab():
+                        return None
+                    self.position += 1
+                    continue
+                ok, frame = self._capture.read()
+                self.position += 1
+                return (index, frame) if ok else None
+
+            # Scene mode: keep the first frame, then frames that differ from the
+            # last sampled one or come after a long gap
+            if index % self.scene_check_every != 0:
+                if not self._capture.grab():
+                    return None
+                self.position += 1
+                continue
+            ok, frame = self._capture.read()
+            self.position += 1
+            if not ok:
+                return None
+            thumbnail = self._thumbnail(frame)
+            if (self._last_thumbnail is None
+                    or index - self._last_sampled >= self.scene_max_gap
+                    or float(np.mean(np.abs(thumbnail - self._last_thumbnail))) >= self.scene_threshold):
+                self._last_thumbnail = thumbnail
+                self._last_sampled = index
+                return index, frame
+
+    def next_batch(self, batch_size):
+        """
+        Decode up to batch_size more sampled frames.
+
+        Returns:
+            (uint8 array of shape (n, H, W, 3), timestamps in seconds); n is 0
+            once the video or the max_frames budget is exhausted
+        """
+        width, height = self.target_size
+        pixels = np.empty((batch_size, height, width, 3), dtype=np.uint8)
+        timestamps = []
+        while len(timestamps) < batch_size and not self.exhausted:
+            if self.sampled >= self.max_frames:
+                self.exhausted = True
+                break
+            item = self._next_frame()
+            if item is None:
+                self.exhausted = True
+                break
+            index, frame = item
+            pixels[len(timestamps)] = self._to_pixels(frame)
+            timestamps.append(index / self.fps)
+            self.sampled += 1
+        return pixels[:len(timestamps)], timestamps
+
+    def close(self):
+        self._capture.release()
+
+
+class VideoAggregator:
+    """
+    Streaming combination of per-frame scores into a video verdict.
+
+    Keeps a running mean and variance (Welford) of the sigmoid scores plus
+    per-segment aggregates for the timeline; nothing per frame is retained.
+    """
+
+    def __init__(self, segment_seconds=2.0, min_frames=16, z=2.58):
+        """
+        Args:
+            segment_seconds: Width of each timeline segment
+            min_frames: Frames to score before early stopping is considered
+            z: Standard errors between the mean score and 0.5 needed to stop
+                early (2.58 ~ 99% two-sided)
+        """
+        self.segment_seconds = segment_seconds
+        self.min_frames = min_frames
+        self.z = z
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._segments = {}
+
+    def update(self, timestamps, scores):
+        for timestamp, score in zip(timestamps, scores):
+            score = float(score)
+            self.count += 1
+            delta = score - self.mean
+            self.mean += delta / self.count
+            self._m2 += delta * (score - self.mean)
+
+            segment = int(timestamp // self.segment_seconds)
+            count, total, low, high = self._segments.get(segment, (0, 0.0, 1.0, 0.0))
+            self._segments[segment] = (count + 1, total + score, min(low, score), max(high, score))
+
+    @property
+    def standard_error(self):
+        if self.count < 2:
+            return math.inf
+        return math.sqrt(self._m2 / (self.count - 1) / self.count)
+
+    @property
+    def converged(self):
+        """True once the mean score is confidently on one side of 0.5."""
+        if self.count < self.min_frames:
+            return False
+        return abs(self.mean - 0.5) > self.z * self.standard_error
+
+    def timeline(self):
+        rows = []
+        for segment in sorted(self._segments):
+            count, total, low, high = self._segments[segment]
+            score = total / count
+            rows.append({
+                "start_s": round(segment * self.segment_seconds, 3),
+                "end_s": round((segment + 1) * self.segment_seconds, 3),
+                "frames": count,
+                "raw_score": round(score, 4),
+                "min_score": round(low, 4),
+                "max_score": round(high, 4),
+                "prediction": "Real" if score > 0.5 else "Fake"
+            })
+        return rows
@@ -0,0 +1,65 @@
+# src/convert_resnext.py
+"""
+Convert a checkpoint of the original ResNeXt block (eight full-input branch
+convs per block) to one of the newer block variants in model_resnext.py.
+
+    --block dense    exact: each block's branches become one 3x3 conv. Same
+                     outputs, checked against the original on random inputs.
+    --block grouped  (or separable) only the stem and the head carry over.
+                     The grouped blocks start fresh; fine-tune the result
+                     with train_resnext.py before serving it.
+
+Run from the project root:
+    python -m src.convert_resnext
+    python -m src.convert_resnext --block grouped --out src/models/resnext_grouped_init.h5
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+
+from src.model_resnext import BLOCKS, convert_legacy_resnext
+
+# ---------- Config ----------
+SOURCE = Path("src/models/resnext_best.h5")
+PARITY_SAMPLES = 8
+PARITY_ATOL = 1e-4
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a legacy ResNeXt checkpoint to another block variant")
+    parser.add_argument("--source", default=str(SOURCE), help="Checkpoint built with the original block")
+    parser.add_argument("--block", default="dense", choices=[b for b in BLOCKS if b != "legacy"])
+    parser.add_argument("--cardinality", type=int, default=8)
+    parser.add_argument("--group-width", type=int, default=None)
+    parser.add_argument("--out", default=None, help="Output path (default: <source>_<block>.h5)")
+    args = parser.parse_args()
+
+    source = Path(args.source)
+    out = Path(args.out) if args.out else source.with_name(f"{source.stem}_{args.block}.h5")
+
+    old_model = tf.keras.models.load_model(str(source), compile=False)
+    new_model, mapped = convert_legacy_resnext(old_model, block=args.block, cardinality=args.cardinality,
+                                               group_width=args.group_width)
+    print(f"{source} -> {out} ({args.block})")
+    print(f"  parameters: {old_model.count_params():,} -> {new_model.count_params():,}")
+    print(f"  carried over: {', '.join(mapped)}")
+
+    if args.block == "dense":
+        rng = np.random.default_rng(0)
+        x = rng.random((PARITY_SAMPLES,) + tuple(old_model.input_shape[1:]), dtype=np.float32)
+        diff = float(np.max(np.abs(old_model(x, training=False).numpy() - new_model(x, training=False).numpy())))
+        print(f"  parity: max |diff| = {diff:.2e}")
+        if diff > PARITY_ATOL:
+            print(f"Parity check failed (atol {PARITY_ATOL}); not saving.")
+            sys.exit(1)
+    else:
+        print("  the grouped blocks are freshly initialized: fine-tune before serving")
+
+    new_model.save(str(out))
+    print("Saved:", out)
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,201 @@
 # src/data_utils.py
-import tensorflow as tf
+"""
+The tf.data input pipeline shared by every trainer.
+
+Images are decoded and resized once into uint8 and normalized to float32
+only after batching, so whatever is cached costs a quarter of the float32
+equivalent. Where the uint8 images live is decided up front against an
+explicit RAM budget (RAM_BUDGET_MB in the training scripts):
+
+    "shards"  Materialized by dataset_cache.py for this size; read as is
+    "ram"     The whole dataset fits in memory next to the shuffle buffer
+    "disk"    It doesn't, and a disk cache path was given (tf.data cache files)
+    None      Neither; images are decoded from the JPEGs every epoch
+
+Decode parallelism and prefetch depth are left to tf.data's autotuner,
+capped by whatever budget remains after the cache and the shuffle buffer
+(tf.data.Options.autotune.ram_budget). Pass parallel_calls / prefetch to
+pin them instead, e.g. when benchmarking.
+"""
+
+import hashlib
+import os
 from pathlib import Path
 
+import numpy as np
+import tensorflow as tf
+
+try:
+    from src.dataset_cache import SPLITS, list_split, load_cached_split, load_resized, read_meta
+except ImportError:  # run from inside src/
+    from dataset_cache import SPLITS, list_split, load_cached_split, load_resized, read_meta
+
 AUTOTUNE = tf.data.AUTOTUNE
 
-def make_image_datasets(base_dir="../data/Dataset", img_size=(224,224), batch=32):
-    base = Path(base_dir)
-    train_ds = tf.keras.preprocessing.image_dataset_from_directory(
-        base/"Train", image_size=img_size, batch_size=batch, shuffle=True
-    )
-    val_ds = tf.keras.preprocessing.image_dataset_from_directory(
-        base/"Validation", image_size=img_size, batch_size=batch, shuffle=False
-    )
-    test_ds = tf.keras.preprocessing.image_dataset_from_directory(
-        base/"Test", image_size=img_size, batch_size=batch, shuffle=False
+MB = 1024 * 1024
+# Share of the budget the uint8 cache plus shuffle buffer may take; the rest
+# is for in-flight decodes and prefetched float32 batches
+CACHE_SHARE = 0.7
+MAX_SHUFFLE_BUFFER = 16384
+
+def default_ram_budget_mb():
+    """Half of physical memory, when no budget is given."""
+    try:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return 4096
+    return int(total / MB / 2)
+
+def plan_pipeline(counts, img_size, batch, ram_budget_mb=None, disk_cache=None,
+                  parallel_calls=None, prefetch=None, materialized=False):
+    """
+    Decide caching, shuffle buffer and the autotuner's RAM cap for a budget.
+
+    Args:
+        counts: Images per split, e.g. {"Train": 140000, "Validation": 39000, ...}
+        img_size: (height, width)
+        batch: Batch size
+        ram_budget_mb: Memory the input pipeline may use (default: half of RAM)
+        disk_cache: Directory for tf.data cache files when RAM is too small
+        parallel_calls, prefetch: Fixed values instead of AUTOTUNE
+        materialized: Reading dataset_cache.py shards, which need no cache
+
+    Returns:
+        Plan dict consumed by make_split_dataset
+    """
+    budget = (ram_budget_mb or default_ram_budget_mb()) * MB
+    image_bytes = img_size[0] * img_size[1] * 3
+    cache_bytes = sum(counts.values()) * image_bytes
+
+    train_count = counts.get("Train", 0)
+    shuffle_buffer = min(train_count, MAX_SHUFFLE_BUFFER, max(batch * 8, int(budget * 0.1 / image_bytes)))
+    shuffle_bytes = shuffle_buffer * image_bytes
+
+    if materialized:
+        cache = "shards"
+    elif cache_bytes + shuffle_bytes <= budget * CACHE_SHARE:
+        cache = "ram"
+    elif disk_cache:
+        cache = "disk"
+    else:
+        cache = None
+        # Without a cache the file list is shuffled before decoding instead
+        shuffle_bytes = 0
+
+    used = shuffle_bytes + (cache_bytes if cache == "ram" else 0)
+    batch_bytes = batch * image_bytes * 4
+    return {
+        "cache": cache,
+        "disk_cache": str(disk_cache) if cache == "disk" else None,
+        "shuffle_buffer": shuffle_buffer,
+        "parallel_calls": parallel_calls or AUTOTUNE,
+        "prefetch": prefetch or AUTOTUNE,
+        "ram_budget_mb": budget // MB,
+        "cache_mb": round(cache_bytes / MB, 1),
+        # Never leave the autotuner less than a few batches to work with
+        "autotune_ram_bytes": int(max(budget - used, batch_bytes * 4)),
+    }
+
+def describe_plan(plan):
+    def setting(value):
+        return "auto" if value == AUTOTUNE else value
+    cache = plan["cache"] or "none"
+    if plan["cache"] == "disk":
+        cache = f"disk ({plan['disk_cache']})"
+    return (f"cache={cache} [{plan['cache_mb']} MB uint8], shuffle_buffer={plan['shuffle_buffer']}, "
+            f"parallel_calls={setting(plan['parallel_calls'])}, prefetch={setting(plan['prefetch'])}, "
+            f"ram_budget={plan['ram_budget_mb']} MB")
+
+def _normalize(images, labels):
+    return tf.cast(images, tf.float32) / 255.0, labels
+
+def _with_budget(ds, plan):
+    options = tf.data.Options()
+    options.autotune.ram_budget = plan["autotune_ram_bytes"]
+    return ds.with_options(options)
+
+def make_split_dataset(base_dir, split, img_size, batch, shuffle=False, plan=None, cache_root=None, seed=None,
+                       targets=None, use_shards=True):
+    """
+    Batched (float32 images in [0, 1], int32 labels) dataset for one split.
+
+    Labels follow image_dataset_from_directory (Fake = 0, Real = 1).
+
+    Args:
+        targets: Optional per-image float targets in list_split order, yielded
+            instead of the labels (e.g. distillation soft targets)
+        use_shards: Read dataset_cache.py shards when they exist. Shards are
+            read interleaved, so only the image files (use_shards=False, implied
+            by targets) guarantee list_split order when not shuffling
+    """
+    if use_shards and targets is None and read_meta(base_dir, split, img_size, cache_root) is not None:
+        ds = load_cached_split(base_dir, split, img_size, batch, shuffle=shuffle, cache_root=cache_root,
+                               shuffle_buffer=plan["shuffle_buffer"] if plan else 4096, seed=seed)
+        return _with_budget(ds, plan) if plan else ds
+
+    paths, labels, _ = list_split(base_dir, split)
+    if targets is not None:
+        if len(targets) != len(paths):
+            raise ValueError(f"{split} has {len(paths)} images but {len(targets)} targets")
+        labels = np.asarray(targets, dtype=np.float32)
+    if plan is None:
+        plan = plan_pipeline({split: len(paths)}, img_size, batch)
+
+    ds = tf.data.Dataset.from_tensor_slices((paths, labels))
+    if shuffle and plan["cache"] is None:
+        # Shuffling file names is free; nothing decoded needs to be buffered
+        ds = ds.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.map(
+        lambda path, label: (load_resized(path, img_size), label),
+        num_parallel_calls=plan["parallel_calls"],
+        deterministic=not shuffle
     )
 
-    # simple normalization & performance
-    def norm(x,y):
-        x = tf.cast(x, tf.float32) / 255.0
-        return x,y
+    if plan["cache"] == "ram":
+        ds = ds.cache()
+    elif plan["cache"] == "disk":
+        cache_dir = Path(plan["disk_cache"])
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        # Cached elements include the labels: key target caches by their content
+        suffix = f"_{hashlib.sha1(labels.tobytes()).hexdigest()[:12]}" if targets is not None else ""
+        ds = ds.cache(str(cache_dir / f"{img_size[0]}x{img_size[1]}_{split}{suffix}"))
+    if shuffle and plan["cache"] is not None:
+        ds = ds.shuffle(plan["shuffle_buffer"], seed=seed, reshuffle_each_iteration=True)
 
-    train_ds = train_ds.map(norm, num_parallel_calls=AUTOTUNE).cache().prefetch(AUTOTUNE)
-    val_ds   = val_ds.map(norm,   num_parallel_calls=AUTOTUNE).cache().prefetch(AUTOTUNE)
-    test_ds  = test_ds.map(norm,  num_parallel_calls=AUTOTUNE).cache().prefetch(AUTOTUNE)
+    # Normalize whole batches, after the cache: only uint8 is ever stored
+    ds = ds.batch(batch).map(_normalize, num_parallel_calls=AUTOTUNE).prefetch(plan["prefetch"])
+    return _with_budget(ds, plan)
 
-    return train_ds, val_ds, test_ds
+def make_image_datasets(base_dir="../data/Dataset", img_size=(224,224), batch=32, cache_root=None,
+                        ram_budget_mb=None, disk_cache=None, parallel_calls=None, prefetch=None):
+    """
+    (train, val, test) datasets under one RAM budget; only Train is shuffled.
+
+    Args:
+        base_dir: Directory with Train/Validation/Test class folders
+        img_size: (height, width)
+        batch: Batch size
+        cache_root: dataset_cache.py shard root (default: next to base_dir)
+        ram_budget_mb: Memory the input pipeline may use (default: half of RAM)
+        disk_cache: Directory for tf.data cache files when RAM is too small
+        parallel_calls, prefetch: Fixed values instead of AUTOTUNE
+    """
+    base = Path(base_dir)
+    if not base.exists():
+        raise FileNotFoundError(f"Dataset directory not found: {base.resolve()}")
+
+    metas = {split: read_meta(base_dir, split, img_size, cache_root) for split in SPLITS}
+    counts = {
+        split: meta["count"] if meta else len(list_split(base_dir, split)[0])
+        for split, meta in metas.items()
+    }
+    materialized = all(metas.values())
+    plan = plan_pipeline(counts, img_size, batch, ram_budget_mb, disk_cache, parallel_calls, prefetch,
+                         materialized)
+    print(f"Input pipeline: {describe_plan(plan)}")
+
+    return tuple(
+        make_split_dataset(base_dir, split, img_size, batch, shuffle=(split == "Train"),
+                           plan=plan, cache_root=cache_root)
+        for split in SPLITS
+    )
@@ -0,0 +1,286 @@
+# src/dataset_cache.py
+"""
+One-time materialization of the image dataset into compact, pre-resized shards.
+
+image_dataset_from_directory decodes and resizes every JPEG on every epoch of
+every run. This module does that work once per image size and writes the
+resized images as uint8 into sharded files:
+
+    <cache_root>/<H>x<W>/<split>/shard-00000.tfrecord   (format "tfrecord")
+    <cache_root>/<H>x<W>/<split>/shard-00000.images.npy  (format "npy", mmap-able)
+    <cache_root>/<H>x<W>/<split>/meta.json
+
+Training reads the shards back with a parallel interleave and normalizes to
+float32 per batch on the fly, so nothing float32 is ever cached.
+Labels follow image_dataset_from_directory (class folders in alphabetical
+order: Fake = 0, Real = 1), so cached and uncached runs are interchangeable.
+
+Usage (paths relative to the working directory, like the training scripts):
+    python dataset_cache.py --data-dir ../data/Dataset --img-size 160
+    python -m src.dataset_cache --data-dir data/Dataset --img-size 224 --format npy
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+SPLITS = ("Train", "Validation", "Test")
+FORMATS = ("tfrecord", "npy")
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".gif"}
+DEFAULT_SHARD_SIZE = 1024
+DEFAULT_SHUFFLE_BUFFER = 4096
+
+# ---------- Layout ----------
+def default_cache_root(base_dir):
+    """Cache next to the dataset: ../data/Dataset -> ../data/Dataset_cache"""
+    base = Path(base_dir)
+    return base.parent / f"{base.name}_cache"
+
+def split_cache_dir(base_dir, split, img_size, cache_root=None):
+    root = Path(cache_root) if cache_root else default_cache_root(base_dir)
+    return root / f"{img_size[0]}x{img_size[1]}" / split
+
+def read_meta(base_dir, split, img_size, cache_root=None):
+    """The split's meta.json, or None if it has not been materialized."""
+    meta_path = split_cache_dir(base_dir, split, img_size, cache_root) / "meta.json"
+    if not meta_path.exists():
+        return None
+    return json.loads(meta_path.read_text())
+
+def list_split(base_dir, split):
+    """(paths, labels, class_names) in image_dataset_from_directory order."""
+    split_dir = Path(base_dir) / split
+    if not split_dir.exists():
+        raise FileNotFoundError(f"Dataset split not found: {split_dir.resolve()}")
+    class_names = sorted(d.name for d in split_dir.iterdir() if d.is_dir())
+    paths, labels = [], []
+    for label, name in enumerate(class_names):
+        files = sorted(p for p in (split_dir / name).rglob("*") if p.suffix.lower() in IMAGE_EXTENSIONS)
+        paths.extend(str(p) for p in files)
+        labels.extend([label] * len(files))
+    return paths, labels, class_names
+
+# ---------- Materialization ----------
+def load_resized(path, img_size):
+    """One image as uint8 (H, W, 3), resized with the ops image_dataset_from_directory uses."""
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, img_size, method="bilinear")
+    return tf.cast(tf.clip_by_value(tf.round(image), 0, 255), tf.uint8)
+
+def _decoded_images(paths, img_size):
+    """Decode and resize in parallel."""
+    ds = tf.data.Dataset.from_tensor_slices(paths).map(
+        lambda path: load_resized(path, img_size), num_parallel_calls=AUTOTUNE
+    )
+    return ds.prefetch(AUTOTUNE).as_numpy_iterator()
+
+def _write_tfrecord_shard(path, images, labels):
+    with tf.io.TFRecordWriter(str(path)) as writer:
+        for image, label in zip(images, labels):
+            example = tf.train.Example(features=tf.train.Features(feature={
+                "image": tf.train.Feature(bytes_list=tf.train.BytesList(value=[image.tobytes()])),
+                "label": tf.train.Feature(int64_list=tf.train.Int64List(value=[int(label)])),
+            }))
+            writer.write(example.SerializeToString())
+
+def _write_npy_shard(path_prefix, images, labels):
+    np.save(f"{path_prefix}.images.npy", np.stack(images))
+    np.save(f"{path_prefix}.labels.npy", np.asarray(labels, dtype="<i4"))
+
+def materialize_split(base_dir, split, img_size, cache_root=None, fmt="tfrecord",
+                      shard_size=DEFAULT_SHARD_SIZE, overwrite=False):
+    """
+    Decode, resize and write one split as uint8 shards.
+
+    Skipped when the split is already materialized with the same file count
+    and format (pass overwrite=True to rebuild).
+
+    Returns:
+        The split's meta dict
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown cache format: {fmt!r} (expected one of {FORMATS})")
+    paths, labels, class_names = list_split(base_dir, split)
+    out_dir = split_cache_dir(base_dir, split, img_size, cache_root)
+    meta = read_meta(base_dir, split, img_size, cache_root)
+    if meta and not overwrite and meta["count"] == len(paths) and meta["format"] == fmt:
+        print(f"{split}: already materialized in {out_dir} ({meta['count']} images)")
+        return meta
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    # meta.json is written last and marks the split complete
+    (out_dir / "meta.json").unlink(missing_ok=True)
+    for stale in out_dir.glob("shard-*"):
+        stale.unlink()
+
+    start = time.perf_counter()
+    shards, shard_images, shard_labels = [], [], []
+
+    def flush():
+        name = f"shard-{len(shards):05d}"
+        if fmt == "tfrecord":
+            _write_tfrecord_shard(out_dir / f"{name}.tfrecord", shard_images, shard_labels)
+        else:
+            _write_npy_shard(out_dir / name, shard_images, shard_labels)
+        shards.append({"name": name, "count": len(shard_images)})
+        shard_images.clear()
+        shard_labels.clear()
+
+    for image, label in zip(_decoded_images(paths, img_size), labels):
+        shard_images.append(image)
+        shard_labels.append(label)
+        if len(shard_images) == shard_size:
+            flush()
+    if shard_images:
+        flush()
+
+    meta = {
+        "split": split,
+        "format": fmt,
+        "img_size": list(img_size),
+        "count": len(paths),
+        "class_names": class_names,
+        "shards": shards,
+        "source": str(Path(base_dir).resolve() / split),
+    }
+    (out_dir / "meta.json").write_text(json.dumps(meta, indent=2))
+    elapsed = time.perf_counter() - start
+    print(f"{split}: wrote {len(paths)} images in {len(shards)} {fmt} shards to {out_dir} "
+          f"({elapsed:.1f}s, {len(paths) / max(elapsed, 1e-9):.0f} img/s)")
+    return meta
+
+def materialize(base_dir, img_size, splits=SPLITS, cache_root=None, fmt="tfrecord",
+                shard_size=DEFAULT_SHARD_SIZE, overwrite=False):
+    return {
+        split: materialize_split(base_dir, split, img_size, cache_root, fmt, shard_size, overwrite)
+        for split in splits
+    }
+
+# ---------- Reading ----------
+def _normalize(images, labels):
+    return tf.cast(images, tf.float32) / 255.0, labels
+
+def _tfrecord_dataset(out_dir, meta, shuffle, seed):
+    height, width = meta["img_size"]
+    files = [str(out_dir / f"{shard['name']}.tfrecord") for shard in meta["shards"]]
+    ds = tf.data.Dataset.from_tensor_slices(files)
+    if shuffle:
+        ds = ds.shuffle(len(files), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.interleave(
+        tf.data.TFRecordDataset,
+        cycle_length=min(len(files), 8),
+        num_parallel_calls=AUTOTUNE,
+        deterministic=not shuffle
+    )
+
+    spec = {
+        "image": tf.io.FixedLenFeature([], tf.string),
+        "label": tf.io.FixedLenFeature([], tf.int64),
+    }
+
+    def parse_batch(records):
+        parsed = tf.io.parse_example(records, spec)
+        images = tf.io.decode_raw(parsed["image"], tf.uint8)
+        images = tf.reshape(images, [-1, height, width, 3])
+        return images, tf.cast(parsed["label"], tf.int32)
+
+    return ds, parse_batch
+
+def _npy_data_offset(path, dtype):
+    """Header length of an .npy file (where its raw C-order data starts), checking its dtype."""
+    with open(path, "rb") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            _, fortran_order, stored = np.lib.format.read_array_header_1_0(f)
+        else:
+            _, fortran_order, stored = np.lib.format.read_array_header_2_0(f)
+        if fortran_order or stored != np.dtype(dtype):
+            raise ValueError(f"{path}: expected a C-order {np.dtype(dtype)} array, found {stored}")
+        return f.tell()
+
+def _npy_dataset(out_dir, meta, shuffle, seed):
+    height, width = meta["img_size"]
+    prefixes = [str(out_dir / shard["name"]) for shard in meta["shards"]]
+    image_files = [f"{prefix}.images.npy" for prefix in prefixes]
+    label_files = [f"{prefix}.labels.npy" for prefix in prefixes]
+    # Each shard is read as fixed-length records past its .npy header, entirely
+    # inside tf.data (no Python generator holding the GIL), so the interleave
+    # really reads shards in parallel
+    ds = tf.data.Dataset.from_tensor_slices((
+        image_files,
+        np.array([_npy_data_offset(f, "<u1") for f in image_files], dtype=np.int64),
+        label_files,
+        np.array([_npy_data_offset(f, "<i4") for f in label_files], dtype=np.int64),
+    ))
+    if shuffle:
+        ds = ds.shuffle(len(prefixes), seed=seed, reshuffle_each_iteration=True)
+
+    def read_shard(image_file, image_offset, label_file, label_offset):
+        images = tf.data.FixedLengthRecordDataset(image_file, height * width * 3, header_bytes=image_offset)
+        labels = tf.data.FixedLengthRecordDataset(label_file, 4, header_bytes=label_offset)
+        return tf.data.Dataset.zip((images, labels))
+
+    ds = ds.interleave(
+        read_shard,
+        cycle_length=min(len(prefixes), 8),
+        num_parallel_calls=AUTOTUNE,
+        deterministic=not shuffle
+    )
+
+    def parse_batch(images, labels):
+        images = tf.reshape(tf.io.decode_raw(images, tf.uint8), [-1, height, width, 3])
+        return images, tf.reshape(tf.io.decode_raw(labels, tf.int32, little_endian=True), [-1])
+
+    return ds, parse_batch
+
+def load_cached_split(base_dir, split, img_size, batch, shuffle=False, cache_root=None,
+                      shuffle_buffer=DEFAULT_SHUFFLE_BUFFER, seed=None):
+    """
+    Batched (float32 images in [0, 1], int32 labels) dataset read from the shards.
+
+    Raises:
+        FileNotFoundError: The split has not been materialized for img_size
+    """
+    meta = read_meta(base_dir, split, img_size, cache_root)
+    if meta is None:
+        raise FileNotFoundError(
+            f"{split} is not materialized for {img_size[0]}x{img_size[1]}; run dataset_cache.py first"
+        )
+    out_dir = split_cache_dir(base_dir, split, img_size, cache_root)
+    if meta["format"] == "tfrecord":
+        ds, parse_batch = _tfrecord_dataset(out_dir, meta, shuffle, seed)
+    else:
+        ds, parse_batch = _npy_dataset(out_dir, meta, shuffle, seed)
+
+    if shuffle:
+        ds = ds.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch)
+    if parse_batch is not None:
+        ds = ds.map(parse_batch, num_parallel_calls=AUTOTUNE)
+    return ds.map(_normalize, num_parallel_calls=AUTOTUNE).prefetch(AUTOTUNE)
+
+# ---------- CLI ----------
+def main():
+    parser = argparse.ArgumentParser(description="Materialize resized uint8 dataset shards")
+    parser.add_argument("--data-dir", default="../data/Dataset", help="Directory with Train/Validation/Test")
+    parser.add_argument("--img-size", type=int, nargs="+", default=[160],
+                        help="Image size(s) to materialize, e.g. 160 224")
+    parser.add_argument("--cache-root", default=None, help="Default: <data-dir>_cache next to the dataset")
+    parser.add_argument("--format", default="tfrecord", choices=FORMATS)
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument("--splits", nargs="+", default=list(SPLITS))
+    parser.add_argument("--overwrite", action="store_true")
+    args = parser.parse_args()
+
+    for size in args.img_size:
+        materialize(args.data_dir, (size, size), args.splits, args.cache_root,
+                    args.format, args.shard_size, args.overwrite)
+
+if __name__ == "__main__":
+    main()
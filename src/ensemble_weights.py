@@ -0,0 +1,316 @@
+# src/ensemble_weights.py
+"""
+Fit ensemble weights on cached member predictions.
+
+Every member runs once over each split and its scores are stored on disk:
+
+    <cache-dir>/<split>/scores.npy   float32 (N, members), one column per member
+    <cache-dir>/<split>/labels.npy   uint8 (N,)
+    <cache-dir>/<split>/meta.json    members, model files (name, size, mtime), count
+
+The cache is reused for as long as the model files are unchanged. After that,
+fitting and evaluating any combination works on the arrays alone and takes
+milliseconds:
+
+    average   Weights on the simplex (non-negative, summing to 1) minimizing
+              log loss, by exponentiated gradient descent
+    stacking  Logistic regression on the members' logits (L2-regularized,
+              Newton's method)
+
+Weights are fitted on the first split (Validation) and every combination is
+also scored on the others (Test). The chosen combination is written to
+models/ensemble_weights.json, which EnsembleModel.load_combination, train_ensemble.py
+and the API (ENSEMBLE_WEIGHTS_PATH) load.
+
+Usage (from src/, like the training scripts):
+    python ensemble_weights.py
+    python ensemble_weights.py --method stacking --splits Validation Test --refresh
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+try:
+    from src.data_utils import make_split_dataset
+    from src.dataset_cache import list_split, read_meta
+    from src.eval_metrics import StreamingBinaryMetrics
+    from src.model_ensemble import EnsembleModel, stacking_scores
+except ImportError:  # run from inside src/
+    from data_utils import make_split_dataset
+    from dataset_cache import list_split, read_meta
+    from eval_metrics import StreamingBinaryMetrics
+    from model_ensemble import EnsembleModel, stacking_scores
+
+DEFAULT_MODEL_PATHS = {
+    'cnn': 'models/basic_cnn_best.h5',
+    'resnext': 'models/resnext_best.h5',
+    'lstm': 'models/lstm_best.h5'
+}
+METHODS = ("average", "stacking", "best")
+
+# ---------- Prediction cache ----------
+def file_identity(path):
+    stat = os.stat(path)
+    return {"name": os.path.basename(path), "size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+def file_list_digest(paths):
+    """Hash of an ordered list of sample paths."""
+    return hashlib.blake2b("\n".join(map(str, paths)).encode(), digest_size=16).hexdigest()
+
+def load_prediction_cache(cache_dir, model_paths=None, files=None):
+    """
+    (scores memmap (N, M), labels (N,), meta) or None if missing or stale.
+
+    With model_paths, a cache written by different model files counts as stale;
+    with files, so does one written for a different (or differently ordered)
+    list of samples.
+    """
+    cache_dir = Path(cache_dir)
+    meta_path = cache_dir / "meta.json"
+    if not meta_path.exists():
+        return None
+    meta = json.loads(meta_path.read_text())
+    if model_paths is not None:
+        current = {name: file_identity(path) for name, path in model_paths.items()}
+        if meta["members"] != list(model_paths) or meta["models"] != current:
+            return None
+    if files is not None and (meta["count"] != len(files) or meta.get("files") != file_list_digest(files)):
+        return None
+    scores = np.load(cache_dir / "scores.npy", mmap_mode="r")
+    labels = np.load(cache_dir / "labels.npy")
+    return scores, labels, meta
+
+def cache_member_predictions(ensemble, dataset, count, cache_dir, files=None):
+    """
+    Run every member once over `dataset` and store the per-sample scores.
+
+    Scores go straight into a preallocated on-disk array, so nothing grows
+    with the dataset in memory; meta.json is written last. Pass the dataset's
+    sample paths as files to have load_prediction_cache check them.
+    """
+    from numpy.lib.format import open_memmap
+
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    (cache_dir / "meta.json").unlink(missing_ok=True)
+    members = list(ensemble.models.keys())
+    scores = open_memmap(cache_dir / "scores.npy", mode="w+", dtype=np.float32, shape=(count, len(members)))
+    labels = np.zeros(count, dtype=np.uint8)
+
+    infer = ensemble._evaluation_predictor()
+    start = time.perf_counter()
+    filled = 0
+    for x_batch, y_batch in dataset:
+        _, predictions = infer(x_batch)
+        n = len(y_batch)
+        if filled + n > count:
+            raise ValueError(f"Dataset yielded more than the expected {count} samples")
+        for j, name in enumerate(members):
+            scores[filled:filled + n, j] = np.asarray(predictions[name]).ravel()
+        labels[filled:filled + n] = np.asarray(y_batch).ravel()
+        filled += n
+    if filled != count:
+        raise ValueError(f"Dataset yielded {filled} samples, expected {count}")
+    scores.flush()
+    del scores
+    np.save(cache_dir / "labels.npy", labels)
+
+    meta = {
+        "members": members,
+        "models": {name: file_identity(path) for name, path in ensemble.model_paths.items()},
+        "count": count,
+        "inference_seconds": round(time.perf_counter() - start, 2),
+    }
+    if files is not None:
+        meta["files"] = file_list_digest(files)
+    (cache_dir / "meta.json").write_text(json.dumps(meta, indent=2))
+    return load_prediction_cache(cache_dir)
+
+# ---------- Fitting ----------
+def fit_weighted_average(scores, labels, iterations=500, learning_rate=0.5):
+    """
+    Simplex-constrained weights minimizing log loss.
+
+    Exponentiated gradient keeps the weights non-negative and summing to 1
+    without any projection step.
+
+    Returns:
+        Weights, shape (M,)
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    labels = np.asarray(labels, dtype=np.float64)
+    weights = np.full(scores.shape[1], 1.0 / scores.shape[1])
+    for _ in range(iterations):
+        p = np.clip(scores @ weights, 1e-7, 1 - 1e-7)
+        # d(log loss)/d(weights)
+        gradient = ((p - labels) / (p * (1 - p))) @ scores / len(labels)
+        # Scale-free step: the largest coordinate moves by at most learning_rate
+        step = learning_rate / max(np.max(np.abs(gradient)), 1e-12)
+        updated = weights * np.exp(-step * (gradient - gradient.min()))
+        updated /= updated.sum()
+        if np.max(np.abs(updated - weights)) < 1e-9:
+            weights = updated
+            break
+        weights = updated
+        learning_rate *= 0.995
+    return weights
+
+def fit_logistic_stacking(scores, labels, l2=1e-3, iterations=50):
+    """
+    Logistic regression on member logits, by Newton's method.
+
+    Returns:
+        (coefficients (M,), intercept)
+    """
+    clipped = np.clip(np.asarray(scores, dtype=np.float64), 1e-7, 1 - 1e-7)
+    x = np.column_stack([np.ones(len(clipped)), np.log(clipped / (1 - clipped))])
+    y = np.asarray(labels, dtype=np.float64)
+    w = np.zeros(x.shape[1])
+    penalty = np.full(x.shape[1], l2)
+    penalty[0] = 0.0  # the intercept is not regularized
+    for _ in range(iterations):
+        p = 1.0 / (1.0 + np.exp(-(x @ w)))
+        gradient = x.T @ (p - y) / len(y) + penalty * w
+        hessian = (x.T * (p * (1 - p))) @ x / len(y) + np.diag(penalty)
+        step = np.linalg.solve(hessian, gradient)
+        w -= step
+        if np.max(np.abs(step)) < 1e-10:
+            break
+    return w[1:], float(w[0])
+
+# ---------- Evaluating combinations ----------
+def score(labels, combined):
+    metrics = StreamingBinaryMetrics()
+    metrics.update(labels, combined)
+    result = metrics.result()
+    return {key: result[key] for key in ("accuracy", "loss", "roc_auc", "pr_auc")}
+
+def fit_combinations(scores, labels, members):
+    """
+    Fit and describe every combination worth comparing.
+
+    Returns:
+        List of dicts with 'name', 'method', 'members', 'weights' (and
+        'stacking' for stacked ones) and 'fit_ms'
+    """
+    combinations = []
+    for j, name in enumerate(members):
+        combinations.append({"name": f"{name} only", "method": "average", "members": [name],
+                             "weights": {name: 1.0}, "fit_ms": 0.0})
+    combinations.append({"name": "equal average", "method": "average", "members": members,
+                         "weights": {name: 1.0 / len(members) for name in members}, "fit_ms": 0.0})
+
+    for size in range(2, len(members) + 1):
+        for subset in itertools.combinations(range(len(members)), size):
+            names = [members[j] for j in subset]
+            start = time.perf_counter()
+            weights = fit_weighted_average(scores[:, subset], labels)
+            combinations.append({
+                "name": "fitted average" + ("" if size == len(members) else f" ({'+'.join(names)})"),
+                "method": "average", "members": names,
+                "weights": {name: round(float(w), 6) for name, w in zip(names, weights)},
+                "fit_ms": (time.perf_counter() - start) * 1000.0,
+            })
+
+    start = time.perf_counter()
+    coef, intercept = fit_logistic_stacking(scores, labels)
+    fit_ms = (time.perf_counter() - start) * 1000.0
+    # Averaging weights proportional to the (positive) stacking coefficients, for fallback use
+    positive = np.maximum(coef, 0.0)
+    fallback = positive / positive.sum() if positive.sum() > 0 else np.full(len(members), 1.0 / len(members))
+    combinations.append({
+        "name": "logistic stacking", "method": "stacking", "members": members,
+        "weights": {name: round(float(w), 6) for name, w in zip(members, fallback)},
+        "stacking": {"coef": {name: round(float(c), 6) for name, c in zip(members, coef)},
+                     "intercept": round(intercept, 6)},
+        "fit_ms": fit_ms,
+    })
+    return combinations
+
+def combine(scores, members, combination):
+    """Combined scores for one combination, from cached member scores only."""
+    columns = [members.index(name) for name in combination["members"]]
+    subset = np.asarray(scores[:, columns], dtype=np.float64)
+    if combination["method"] == "stacking":
+        coef = [combination["stacking"]["coef"][name] for name in combination["members"]]
+        return stacking_scores(subset, coef, combination["stacking"]["intercept"])
+    weights = np.array([combination["weights"][name] for name in combination["members"]])
+    return subset @ (weights / weights.sum())
+
+# ---------- CLI ----------
+def main():
+    parser = argparse.ArgumentParser(description="Fit ensemble weights on cached member predictions")
+    parser.add_argument("--data-dir", default="../data/Dataset")
+    parser.add_argument("--img-size", type=int, default=160)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--splits", nargs="+", default=["Validation", "Test"],
+                        help="Fit on the first split, report on all of them")
+    parser.add_argument("--cache-dir", default="cache/ensemble_predictions")
+    parser.add_argument("--refresh", action="store_true", help="Rerun inference even if the cache is current")
+    parser.add_argument("--method", default="best", choices=METHODS,
+                        help="Combination to save; 'best' picks the lower log loss on the fitting split")
+    parser.add_argument("--out", default="models/ensemble_weights.json")
+    args = parser.parse_args()
+
+    caches = {}
+    ensemble = None
+    for split in args.splits:
+        cache_dir = Path(args.cache_dir) / f"{args.img_size}x{args.img_size}" / split
+        cached = None if args.refresh else load_prediction_cache(cache_dir, DEFAULT_MODEL_PATHS)
+        if cached is None:
+            # Models are only loaded when some split has to be (re)computed
+            if ensemble is None:
+                ensemble = EnsembleModel(model_paths=DEFAULT_MODEL_PATHS)
+            img_size = (args.img_size, args.img_size)
+            meta = read_meta(args.data_dir, split, img_size)
+            count = meta["count"] if meta else len(list_split(args.data_dir, split)[0])
+            print(f"{split}: running {len(ensemble.models)} members over {count} images...")
+            dataset = make_split_dataset(args.data_dir, split, img_size, args.batch)
+            cached = cache_member_predictions(ensemble, dataset, count, cache_dir)
+            print(f"{split}: cached in {cache_dir} ({cached[2]['inference_seconds']}s of inference)")
+        else:
+            print(f"{split}: reusing {cache_dir} ({cached[2]['count']} samples)")
+        caches[split] = cached
+
+    fit_split = args.splits[0]
+    scores, labels, meta = caches[fit_split]
+    members = meta["members"]
+    combinations = fit_combinations(scores, labels, members)
+
+    header = f"{'combination':34s} {'fit ms':>7s}"
+    for split in args.splits:
+        header += f" | {split[:10]:>10s} acc   loss    AUC"
+    print(header)
+    for combination in combinations:
+        combination["metrics"] = {}
+        line = f"{combination['name']:34s} {combination['fit_ms']:7.1f}"
+        for split in args.splits:
+            split_scores, split_labels, _ = caches[split]
+            metrics = score(split_labels, combine(split_scores, members, combination))
+            combination["metrics"][split] = metrics
+            line += f" | {metrics['accuracy']:15.4f} {metrics['loss']:.4f} {metrics['roc_auc']:.4f}"
+        print(line)
+
+    full = [c for c in combinations if c["members"] == members and c["name"] != "equal average"]
+    if args.method == "best":
+        chosen = min(full, key=lambda c: c["metrics"][fit_split]["loss"])
+    else:
+        chosen = next(c for c in full if c["method"] == args.method)
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    saved = {key: chosen[key] for key in ("method", "weights", "stacking") if key in chosen}
+    saved["fitted_on"] = fit_split
+    saved["metrics"] = chosen["metrics"]
+    out.write_text(json.dumps(saved, indent=2))
+    print(f"Saved {chosen['name']} to {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# src/eval_metrics.py
+"""
+Streaming binary-classification metrics with memory independent of dataset size.
+
+Scores are accumulated batch by batch into per-class histograms (the
+sufficient statistics for every threshold metric), plus exact running sums
+for the default 0.5 threshold and the log loss. ROC-AUC, PR-AUC, confusion
+matrices and threshold sweeps are then read off the cumulative histograms in
+a few vectorized operations.
+
+With the default 10,000 bins the AUCs match the exact per-sample values to
+about 1e-4; scores falling in the same bin count as ties.
+"""
+
+import numpy as np
+
+DEFAULT_BINS = 10000
+DEFAULT_SWEEP = np.round(np.arange(0.05, 0.951, 0.05), 2)
+
+class StreamingBinaryMetrics:
+    """Accumulates sigmoid scores (1 = Real) against 0/1 labels."""
+
+    def __init__(self, bins=DEFAULT_BINS):
+        self.bins = bins
+        self.positive_hist = np.zeros(bins, dtype=np.int64)
+        self.negative_hist = np.zeros(bins, dtype=np.int64)
+        self.loss_sum = 0.0
+        # Exact counts at the 0.5 threshold, with the same "> 0.5" rule as binary_metrics
+        self.tp = self.fp = self.tn = self.fn = 0
+
+    @property
+    def count(self):
+        return self.tp + self.fp + self.tn + self.fn
+
+    def update(self, labels, scores):
+        """Add one batch; labels and scores may have any shape with N elements."""
+        labels = np.asarray(labels).ravel().astype(bool)
+        scores = np.asarray(scores, dtype=np.float64).ravel()
+
+        predicted = scores > 0.5
+        self.tp += int(np.count_nonzero(predicted & labels))
+        self.fp += int(np.count_nonzero(predicted & ~labels))
+        self.fn += int(np.count_nonzero(~predicted & labels))
+        self.tn += int(np.count_nonzero(~predicted & ~labels))
+
+        epsilon = 1e-7  # To avoid log(0), as in binary_metrics
+        clipped = np.clip(scores, epsilon, 1 - epsilon)
+        self.loss_sum -= float(np.sum(np.where(labels, np.log(clipped), np.log(1 - clipped))))
+
+        index = np.minimum((np.clip(scores, 0.0, 1.0) * self.bins).astype(np.int64), self.bins - 1)
+        self.positive_hist += np.bincount(index[labels], minlength=self.bins)
+        self.negative_hist += np.bincount(index[~labels], minlength=self.bins)
+
+    def merge(self, other):
+        """Fold in another accumulator with the same bins (e.g. from another shard)."""
+        if other.bins != self.bins:
+            raise ValueError(f"Cannot merge metrics with {other.bins} bins into {self.bins}")
+        self.positive_hist += other.positive_hist
+        self.negative_hist += other.negative_hist
+        self.loss_sum += other.loss_sum
+        self.tp += other.tp
+        self.fp += other.fp
+        self.tn += other.tn
+        self.fn += other.fn
+        return self
+
+    def _cumulative(self):
+        """
+        True and false positives when predicting Real for scores >= k / bins,
+        for k = 0..bins (so index 0 predicts everything positive).
+        """
+        tp = np.zeros(self.bins + 1, dtype=np.int64)
+        fp = np.zeros(self.bins + 1, dtype=np.int64)
+        tp[:-1] = np.cumsum(self.positive_hist[::-1])[::-1]
+        fp[:-1] = np.cumsum(self.negative_hist[::-1])[::-1]
+        return tp, fp
+
+    def roc_auc(self):
+        positives, negatives = int(self.positive_hist.sum()), int(self.negative_hist.sum())
+        if not positives or not negatives:
+            return float('nan')
+        tp, fp = self._cumulative()
+        tpr, fpr = tp / positives, fp / negatives
+        # Trapezoids between consecutive thresholds (fpr falls as k grows)
+        return float(np.sum((fpr[:-1] - fpr[1:]) * (tpr[:-1] + tpr[1:]) / 2.0))
+
+    def pr_auc(self):
+        """Average precision: precision summed over each step in recall."""
+        positives = int(self.positive_hist.sum())
+        if not positives:
+            return float('nan')
+        tp, fp = self._cumulative()
+        recall = tp / positives
+        predicted = tp + fp
+        precision = np.divide(tp, predicted, out=np.ones(len(tp)), where=predicted > 0)
+        return float(np.sum((recall[:-1] - recall[1:]) * precision[:-1]))
+
+    def threshold_sweep(self, thresholds=DEFAULT_SWEEP):
+        """
+        Metrics when predicting Real for scores >= each threshold (rounded to the bin grid).
+
+        Returns:
+            Dict of equal-length lists: threshold, accuracy, precision, recall, f1, fpr
+        """
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        k = np.clip(np.round(thresholds * self.bins).astype(np.int64), 0, self.bins)
+        tp, fp = self._cumulative()
+        tp, fp = tp[k], fp[k]
+        positives, negatives = int(self.positive_hist.sum()), int(self.negative_hist.sum())
+        fn, tn = positives - tp, negatives - fp
+
+        def ratio(num, den):
+            return np.divide(num, den, out=np.zeros(len(num)), where=den > 0)
+
+        precision = ratio(tp, tp + fp)
+        recall = ratio(tp, tp + fn)
+        return {
+            'threshold': (k / self.bins).tolist(),
+            'accuracy': ratio(tp + tn, tp + tn + fp + fn).tolist(),
+            'precision': precision.tolist(),
+            'recall': recall.tolist(),
+            'f1': ratio(2 * precision * recall, precision + recall).tolist(),
+            'fpr': ratio(fp, fp + tn).tolist()
+        }
+
+    def result(self, thresholds=DEFAULT_SWEEP):
+        """
+        All metrics so far.
+
+        Returns:
+            Dict with 'accuracy' and 'loss' (as binary_metrics), 'roc_auc',
+            'pr_auc', 'confusion_matrix' at 0.5, 'threshold_sweep' and the
+            sweep's 'best_threshold' by accuracy
+        """
+        n = self.count
+        sweep = self.threshold_sweep(thresholds)
+        best = int(np.argmax(sweep['accuracy'])) if n else 0
+        return {
+            'accuracy': (self.tp + self.tn) / n if n else float('nan'),
+            'loss': self.loss_sum / n if n else float('nan'),
+            'roc_auc': self.roc_auc(),
+            'pr_auc': self.pr_auc(),
+            'confusion_matrix': {'tn': self.tn, 'fp': self.fp, 'fn': self.fn, 'tp': self.tp},
+            'threshold_sweep': sweep,
+            'best_threshold': sweep['threshold'][best],
+            'samples': n
+        }
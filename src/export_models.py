@@ -0,0 +1,162 @@
+# src/export_models.py
+"""
+Export trained Keras models to TFLite, ONNX or SavedModel for CPU serving.
+
+For each trained model (basic_cnn, ResNeXt_Custom, LSTM_DeepFake) this writes
+<name>.tflite (and optionally <name>.onnx and a <name>_savedmodel/ directory)
+next to the .h5 file, then runs a parity check comparing the exported
+artifact's outputs against the Keras model.
+
+Run from the project root:
+    python -m src.export_models
+    python -m src.export_models --onnx --savedmodel --threads 4
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+
+from serving.backends import artifact_path, check_parity, load_backend
+
+# ---------- Config ----------
+MODEL_DIR = Path("src/models")
+MODEL_FILES = {
+    'cnn': 'basic_cnn_best.h5',
+    'resnext': 'resnext_best.h5',
+    'lstm': 'lstm_best.h5',
+    'multihead': 'multihead_serving.h5',
+    'student': 'student_cnn_best.h5'
+}
+PARITY_SAMPLES = 8
+PARITY_ATOL = 1e-3
+
+# ---------- Converters ----------
+def export_tflite(model, out_path, optimizations=None, representative_dataset=None, int8_io=False):
+    """
+    Convert a Keras model to a TFLite flatbuffer.
+
+    Args:
+        model: Loaded tf.keras.Model
+        out_path: Destination .tflite path
+        optimizations: Optional list of tf.lite.Optimize flags
+        representative_dataset: Optional generator for full-integer quantization
+        int8_io: If True, restrict to int8 kernels with int8 input/output tensors
+
+    Returns:
+        Size of the written file in bytes
+    """
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if optimizations:
+        converter.optimizations = optimizations
+    if representative_dataset is not None:
+        converter.representative_dataset = representative_dataset
+    if int8_io:
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+
+    try:
+        flatbuffer = converter.convert()
+    except Exception as e:
+        if int8_io:
+            raise
+        # LSTM variants occasionally need TF kernels the builtin op set lacks
+        print(f"  Builtin-only conversion failed ({e}); retrying with SELECT_TF_OPS")
+        converter.target_spec.supported_ops = [
+            tf.lite.OpsSet.TFLITE_BUILTINS,
+            tf.lite.OpsSet.SELECT_TF_OPS
+        ]
+        flatbuffer = converter.convert()
+
+    Path(out_path).write_bytes(flatbuffer)
+    return len(flatbuffer)
+
+def export_onnx(model, out_path, opset=13):
+    """Convert a Keras model to ONNX with a dynamic batch dimension (requires tf2onnx)."""
+    import tf2onnx
+
+    spec = (tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=str(out_path))
+    return Path(out_path).stat().st_size
+
+def export_savedmodel(model, out_dir):
+    """
+    Write a SavedModel with a single serving signature (dynamic batch dimension).
+
+    Loading it with tf.saved_model.load skips Keras model reconstruction,
+    which is most of the cold-start cost of an .h5 file.
+    """
+    spec = tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name="input")
+
+    @tf.function(input_signature=[spec])
+    def serve(x):
+        return {"score": model(x, training=False)}
+
+    tf.saved_model.save(model, str(out_dir), signatures={"serving_default": serve})
+    return sum(f.stat().st_size for f in Path(out_dir).rglob("*") if f.is_file())
+
+def parity_inputs(model, n=PARITY_SAMPLES, seed=0):
+    """Deterministic [0, 1] float images matching the model's input shape."""
+    rng = np.random.default_rng(seed)
+    return rng.random((n,) + tuple(model.input_shape[1:]), dtype=np.float32)
+
+# ---------- Main ----------
+def main():
+    parser = argparse.ArgumentParser(description="Export trained models to TFLite / ONNX")
+    parser.add_argument("--model-dir", default=str(MODEL_DIR), help="Directory holding the trained .h5 files")
+    parser.add_argument("--models", nargs="+", default=list(MODEL_FILES), choices=list(MODEL_FILES),
+                        help="Which models to export")
+    parser.add_argument("--onnx", action="store_true", help="Also export ONNX (requires tf2onnx)")
+    parser.add_argument("--savedmodel", action="store_true", help="Also export a SavedModel for fast cold starts")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads for the parity check")
+    parser.add_argument("--atol", type=float, default=PARITY_ATOL, help="Parity tolerance on sigmoid scores")
+    args = parser.parse_args()
+
+    model_dir = Path(args.model_dir)
+    failures = []
+
+    for name in args.models:
+        h5_path = model_dir / MODEL_FILES[name]
+        if not h5_path.exists():
+            print(f"Skipping {name}: {h5_path} not found")
+            continue
+
+        print("=" * 60)
+        print(f"Exporting {name} from {h5_path}")
+        model = tf.keras.models.load_model(str(h5_path))
+        inputs = parity_inputs(model)
+
+        targets = {"tflite": export_tflite}
+        if args.onnx:
+            targets["onnx"] = export_onnx
+        if args.savedmodel:
+            targets["savedmodel"] = export_savedmodel
+
+        for backend_name, export_fn in targets.items():
+            out_path = artifact_path(str(h5_path), backend_name)
+            try:
+                size = export_fn(model, out_path)
+            except ImportError as e:
+                print(f"  {backend_name}: skipped ({e})")
+                continue
+            print(f"  {backend_name}: wrote {out_path} ({size / 1e6:.2f} MB)")
+
+            backend = load_backend(backend_name, out_path, num_threads=args.threads)
+            parity = check_parity(lambda x: model.predict(x, verbose=0), backend, inputs, atol=args.atol)
+            status = "OK" if parity["passed"] else "MISMATCH"
+            print(f"  {backend_name} parity: {status} "
+                  f"(max |diff| {parity['max_abs_diff']:.2e}, mean {parity['mean_abs_diff']:.2e}, "
+                  f"label agreement {parity['label_agreement']*100:.1f}%)")
+            if not parity["passed"]:
+                failures.append(f"{name}/{backend_name}")
+
+    if failures:
+        print("\nParity check failed for:", ", ".join(failures))
+        sys.exit(1)
+    print("\nExport complete.")
+
+if __name__ == "__main__":
+    main()
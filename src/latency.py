@@ -0,0 +1,25 @@
+# src/latency.py
+"""Wall-clock latency of repeated calls, for the distillation report and the benchmarks."""
+
+import time
+
+import numpy as np
+
+def time_calls(fn, x, runs=30, warmup=3):
+    """
+    p50/p90 latency of fn(x) in milliseconds.
+
+    Args:
+        fn: Callable taking one batch
+        x: The batch, reused for every call
+        runs: Timed calls
+        warmup: Untimed calls first (tracing, allocation)
+    """
+    for _ in range(warmup):
+        fn(x)
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(x)
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return {"p50_ms": round(float(np.median(samples)), 2), "p90_ms": round(float(np.percentile(samples, 90)), 2)}
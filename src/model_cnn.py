@@ -2,28 +2,35 @@
 import tensorflow as tf
 from tensorflow.keras import layers, models
 
-def build_basic_cnn(input_shape=(224,224,3)):
+def build_basic_cnn(input_shape=(224,224,3), width=1.0):
     """
     Simple CNN from scratch. Small so you can learn internals and run fast.
+
+    Args:
+        width: Multiplier on every layer's channels; below 1 gives the slim
+            students trained by train_distill.py
     """
+    def channels(n):
+        return max(8, int(round(n * width)))
+
     inputs = layers.Input(shape=input_shape)
 
-    x = layers.Conv2D(32, 3, padding='same', activation='relu')(inputs)
+    x = layers.Conv2D(channels(32), 3, padding='same', activation='relu')(inputs)
     x = layers.BatchNormalization()(x)
     x = layers.MaxPooling2D(2)(x)
 
-    x = layers.Conv2D(64, 3, padding='same', activation='relu')(x)
+    x = layers.Conv2D(channels(64), 3, padding='same', activation='relu')(x)
     x = layers.BatchNormalization()(x)
     x = layers.MaxPooling2D(2)(x)
 
-    x = layers.Conv2D(128, 3, padding='same', activation='relu')(x)
+    x = layers.Conv2D(channels(128), 3, padding='same', activation='relu')(x)
     x = layers.BatchNormalization()(x)
     x = layers.MaxPooling2D(2)(x)
 
     x = layers.GlobalAveragePooling2D()(x)
-    x = layers.Dense(128, activation='relu')(x)
+    x = layers.Dense(channels(128), activation='relu')(x)
     x = layers.Dropout(0.5)(x)
-    outputs = layers.Dense(1, activation='sigmoid')(x)
+    outputs = layers.Dense(1, activation='sigmoid', dtype='float32')(x)  # float32 under mixed precision too
 
-    model = models.Model(inputs=inputs, outputs=outputs, name="basic_cnn")
+    model = models.Model(inputs=inputs, outputs=outputs, name="basic_cnn" if width == 1.0 else "basic_cnn_slim")
     return model
@@ -1,15 +1,126 @@
 # src/model_ensemble.py
 import tensorflow as tf
 import numpy as np
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 
+try:
+    from src.eval_metrics import DEFAULT_BINS, DEFAULT_SWEEP, StreamingBinaryMetrics
+except ImportError:  # run from inside src/
+    from eval_metrics import DEFAULT_BINS, DEFAULT_SWEEP, StreamingBinaryMetrics
+
+# predict_parallel runs a member skipped for its latency again after this many calls
+LATENCY_REPROBE_CALLS = 20
+
+def calibrate_cascade_band(cnn_scores, ensemble_scores, labels, target_accuracy, step=0.01):
+    """
+    Pick the narrowest uncertainty band that still reaches a target accuracy.
+    
+    A sample is escalated to the full ensemble when its CNN score falls inside
+    [low, high]; otherwise the CNN score is final. Every band on a grid with
+    low <= 0.5 <= high is scored in one vectorized pass.
+    
+    Args:
+        cnn_scores: CNN scores on a validation set, shape (N,)
+        ensemble_scores: Full-ensemble scores on the same samples, shape (N,)
+        labels: Ground-truth labels (0 = Fake, 1 = Real), shape (N,)
+        target_accuracy: Cascade accuracy the band must hold
+        step: Grid resolution for the band edges
+    
+    Returns:
+        Dict with 'band' (low, high), 'accuracy' and 'escalation_rate'.
+        If no band reaches the target, the band with the best accuracy is returned.
+    """
+    cnn_scores = np.asarray(cnn_scores, dtype=np.float32).ravel()
+    ensemble_scores = np.asarray(ensemble_scores, dtype=np.float32).ravel()
+    labels = np.asarray(labels).ravel().astype(bool)
+    
+    lows = np.arange(0.0, 0.5 + step / 2, step, dtype=np.float32)
+    highs = np.arange(0.5, 1.0 + step / 2, step, dtype=np.float32)
+    
+    cnn_correct = (cnn_scores > 0.5) == labels
+    ens_correct = (ensemble_scores > 0.5) == labels
+    
+    # One (highs, N) slab per low edge keeps memory at O(len(highs) * N)
+    accuracy = np.empty((len(lows), len(highs)), dtype=np.float64)
+    escalation = np.empty_like(accuracy)
+    below_high = cnn_scores[None, :] <= highs[:, None]
+    for i, low in enumerate(lows):
+        escalated = below_high & (cnn_scores >= low)[None, :]
+        accuracy[i] = np.where(escalated, ens_correct, cnn_correct).mean(axis=1)
+        escalation[i] = escalated.mean(axis=1)
+    
+    feasible = accuracy >= target_accuracy
+    if feasible.any():
+        # Cheapest feasible band, ties broken by accuracy
+        cost = np.where(feasible, escalation - 1e-6 * accuracy, np.inf)
+        i, j = np.unravel_index(np.argmin(cost), cost.shape)
+    else:
+        i, j = np.unravel_index(np.argmax(accuracy), accuracy.shape)
+    
+    return {
+        'band': (round(float(lows[i]), 4), round(float(highs[j]), 4)),
+        'accuracy': float(accuracy[i, j]),
+        'escalation_rate': float(escalation[i, j])
+    }
+
+def stacking_scores(member_scores, coef, intercept):
+    """
+    Logistic stacking: sigmoid(intercept + sum_i coef[i] * logit(score_i)).
+    
+    Args:
+        member_scores: Member sigmoid scores, shape (N, M)
+        coef: Per-member coefficients, shape (M,)
+        intercept: Scalar bias
+    
+    Returns:
+        Combined scores, shape (N,)
+    """
+    clipped = np.clip(np.asarray(member_scores, dtype=np.float64), 1e-7, 1 - 1e-7)
+    z = intercept + np.log(clipped / (1 - clipped)) @ np.asarray(coef, dtype=np.float64)
+    return 1.0 / (1.0 + np.exp(-z))
+
+def binary_metrics(labels, preds):
+    """
+    Accuracy and binary cross-entropy for sigmoid scores.
+    
+    Args:
+        labels: Ground-truth labels (0 = Fake, 1 = Real)
+        preds: Predicted scores in [0, 1]
+    
+    Returns:
+        Dict with 'accuracy' and 'loss'
+    """
+    labels = np.asarray(labels).ravel()
+    preds = np.asarray(preds).ravel()
+    
+    # Binary predictions (threshold at 0.5)
+    binary_preds = (preds > 0.5).astype(int)
+    
+    # Calculate accuracy
+    accuracy = np.mean(binary_preds == labels)
+    
+    # Calculate binary cross-entropy loss
+    epsilon = 1e-7  # To avoid log(0)
+    preds_clipped = np.clip(preds, epsilon, 1 - epsilon)
+    loss = -np.mean(labels * np.log(preds_clipped) + 
+                   (1 - labels) * np.log(1 - preds_clipped))
+    
+    return {
+        'accuracy': accuracy,
+        'loss': loss
+    }
+
 class EnsembleModel:
     """
     Ensemble model that combines predictions from CNN, ResNeXt, and LSTM models.
     Supports simple averaging and weighted averaging strategies.
     """
     
-    def __init__(self, model_paths=None, weights=None):
+    def __init__(self, model_paths=None, weights=None, cascade_band=(0.3, 0.7), member_wrapper=None,
+                 wrap_members=True):
         """
         Initialize ensemble model.
         
@@ -17,6 +128,14 @@ class EnsembleModel:
             model_paths: Dict with keys 'cnn', 'resnext', 'lstm' and values as paths to .h5 files
             weights: Optional dict with same keys, values are weights for weighted averaging
                     If None, uses simple averaging (equal weights)
+            cascade_band: (low, high) CNN scores escalated to the full ensemble
+                    in predict_cascade
+            member_wrapper: Optional callable taking a loaded Keras model and returning
+                    a callable predictor (e.g. serving.compiled.CompiledPredictor) used
+                    instead of model.predict
+            wrap_members: Apply member_wrapper to each member as well as to the
+                    fused graph. Serving with predict_fused only ever calls the
+                    fused graph, so it can skip wrapping (and warming) the members
         """
         if model_paths is None:
             # Default paths
@@ -29,6 +148,26 @@ class EnsembleModel:
         self.model_paths = model_paths
         self.models = {}
         self.weights = weights
+        self.stacking = None
+        self.member_wrapper = member_wrapper
+        self.wrap_members = wrap_members
+        self.predictors = {}
+        
+        # Serving state: member thread pool, fused graph, smoothed member latencies
+        self._executor = None
+        self._fused_model = None
+        self._fused_predictor = None
+        self.member_latency_ms = {}
+        self._member_in_flight = {}
+        self._member_skips = {}
+        
+        # Cascade state: uncertainty band and running compute accounting
+        self.cascade_band = tuple(cascade_band)
+        self._member_cost = {}
+        self._cascade_samples = 0
+        self._cascade_escalated = 0
+        self._cascade_cost_spent = 0.0
+        self._cascade_cost_full = 0.0
         
         # Load models
         self._load_models()
@@ -49,8 +188,16 @@ class EnsembleModel:
                 raise FileNotFoundError(f"Model file not found: {path}")
             print(f"  Loading {name} from {path}")
             self.models[name] = tf.keras.models.load_model(path)
+            if self.member_wrapper is not None and self.wrap_members:
+                self.predictors[name] = self.member_wrapper(self.models[name])
         print("All models loaded successfully!")
     
+    def _member_predict(self, name, x):
+        """Predict with one member through its wrapper if set, else model.predict."""
+        if name in self.predictors:
+            return self.predictors[name](x)
+        return self.models[name].predict(x, verbose=0)
+    
     def predict(self, x, use_weights=True):
         """
         Make ensemble predictions.
@@ -65,75 +212,346 @@ class EnsembleModel:
         predictions = {}
         
         # Get predictions from each model
-        for name, model in self.models.items():
-            predictions[name] = model.predict(x, verbose=0)
+        for name in self.models:
+            predictions[name] = self._member_predict(name, x)
         
-        # Combine predictions
+        return self._combine(predictions, use_weights), predictions
+    
+    def _combine(self, predictions, use_weights=True):
+        """
+        Weighted (or simple) average over whichever members produced predictions.
+        
+        With a stacking model set (load_combination) and every member present,
+        the stacker combines them instead; it was fitted on all members, so a
+        partial set falls back to the weighted average.
+        """
+        if use_weights and self.stacking is not None and set(predictions) == set(self.stacking['coef']):
+            names = list(self.stacking['coef'])
+            member_scores = np.column_stack([np.asarray(predictions[name]).ravel() for name in names])
+            coef = [self.stacking['coef'][name] for name in names]
+            combined = stacking_scores(member_scores, coef, self.stacking['intercept'])
+            return combined.reshape(-1, 1).astype(np.float32)
         if use_weights:
-            ensemble_pred = sum(predictions[name] * self.weights[name] 
-                              for name in self.models.keys())
+            total = sum(self.weights[name] for name in predictions)
+            return sum(pred * (self.weights[name] / total) for name, pred in predictions.items())
+        return sum(predictions.values()) / len(predictions)
+    
+    def _timed_predict(self, name, x):
+        start = time.perf_counter()
+        pred = self._member_predict(name, x)
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        # Exponential moving average so one slow call doesn't dominate
+        previous = self.member_latency_ms.get(name)
+        self.member_latency_ms[name] = elapsed_ms if previous is None else 0.8 * previous + 0.2 * elapsed_ms
+        return pred
+    
+    def _is_running(self, name):
+        future = self._member_in_flight.get(name)
+        return future is not None and not future.done()
+    
+    def predict_parallel(self, x, use_weights=True, latency_budget_ms=None):
+        """
+        Make ensemble predictions with all members running concurrently.
+        
+        Each member runs on its own thread (TensorFlow releases the GIL inside
+        ops), so wall time is roughly that of the slowest member rather than
+        the sum of all three.
+        
+        Args:
+            x: Input data (images)
+            use_weights: If True, uses weighted averaging. If False, simple averaging.
+            latency_budget_ms: Optional wall-clock budget. Members whose smoothed
+                latency already exceeds it are skipped, and members still running
+                when it expires are dropped. The fastest member is always kept.
+                A skipped member is run again every LATENCY_REPROBE_CALLS calls
+                to refresh its latency, so one slow call doesn't drop it for good.
+        
+        A member whose previous call is still running gets no new work: its
+        Keras model is never entered twice at once, and a straggler holds at
+        most its own executor slot.
+        
+        Returns:
+            (ensemble predictions, dict of member predictions, list of dropped members)
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=len(self.models), thread_name_prefix="ensemble")
+        
+        names = list(self.models.keys())
+        dropped = []
+        if latency_budget_ms is not None and self.member_latency_ms:
+            fastest = min(names, key=lambda n: self.member_latency_ms.get(n, 0.0))
+            for name in names:
+                if name == fastest or self.member_latency_ms.get(name, 0.0) <= latency_budget_ms:
+                    self._member_skips[name] = 0
+                    continue
+                self._member_skips[name] = self._member_skips.get(name, 0) + 1
+                if self._member_skips[name] >= LATENCY_REPROBE_CALLS:
+                    # Probe: this call re-measures the member (and keeps it if it's fast again)
+                    self._member_skips[name] = 0
+                    continue
+                dropped.append(name)
+            names = [n for n in names if n not in dropped]
+        
+        busy = [n for n in names if self._is_running(n)]
+        if len(busy) == len(names):
+            # Every remaining member is still finishing an earlier call: wait for the first one
+            wait([self._member_in_flight[n] for n in busy], return_when=FIRST_COMPLETED)
+            busy = [n for n in busy if self._is_running(n)]
+        dropped.extend(busy)
+        names = [n for n in names if n not in busy]
+        
+        futures = {}
+        for name in names:
+            future = self._executor.submit(self._timed_predict, name, x)
+            self._member_in_flight[name] = future
+            futures[future] = name
+        timeout = latency_budget_ms / 1000.0 if latency_budget_ms is not None else None
+        done, not_done = wait(futures, timeout=timeout)
+        
+        if not done:
+            # Nothing finished inside the budget: wait for the first member anyway
+            done, not_done = wait(futures, return_when=FIRST_COMPLETED)
+        
+        # Stragglers finish in the background (updating their latency); their results are discarded
+        dropped.extend(futures[f] for f in not_done)
+        predictions = {futures[f]: f.result() for f in done}
+        
+        return self._combine(predictions, use_weights), predictions, dropped
+    
+    def fuse(self):
+        """
+        Build a single Keras graph that evaluates every member in one call.
+        
+        All members must share the same input shape. The fused model returns
+        one output per member, in self.models order.
+        """
+        if self._fused_model is None:
+            shapes = {tuple(m.input_shape[1:]) for m in self.models.values()}
+            if len(shapes) != 1:
+                raise ValueError(f"Cannot fuse members with different input shapes: {shapes}")
+            inputs = tf.keras.Input(shape=shapes.pop())
+            outputs = [model(inputs, training=False) for model in self.models.values()]
+            self._fused_model = tf.keras.Model(inputs, outputs, name="ensemble_fused")
+            if self.member_wrapper is not None:
+                self._fused_predictor = self.member_wrapper(self._fused_model)
+        return self._fused_model
+    
+    @property
+    def fused_predictor(self):
+        """The member_wrapper around the fused graph, once fuse() has built it (else None)."""
+        return self._fused_predictor
+    
+    def predict_fused(self, x, use_weights=True):
+        """
+        Make ensemble predictions with one call into the fused graph.
+        
+        Returns:
+            (ensemble predictions, dict of member predictions)
+        """
+        fused = self.fuse()
+        if self._fused_predictor is not None:
+            outputs = self._fused_predictor(x)
         else:
-            ensemble_pred = sum(predictions.values()) / len(predictions)
+            outputs = fused.predict(x, verbose=0)
+        predictions = dict(zip(self.models.keys(), outputs))
+        return self._combine(predictions, use_weights), predictions
+    
+    def _per_sample_cost(self, name, x):
+        """Predict with one member and update its smoothed per-sample cost (ms)."""
+        start = time.perf_counter()
+        pred = self._member_predict(name, x)
+        cost = (time.perf_counter() - start) * 1000.0 / max(len(pred), 1)
+        previous = self._member_cost.get(name)
+        self._member_cost[name] = cost if previous is None else 0.9 * previous + 0.1 * cost
+        return pred
+    
+    def predict_cascade(self, x, use_weights=True, band=None):
+        """
+        Early-exit cascade: score with the cheap CNN first and escalate only
+        uncertain samples to the remaining members.
+        
+        Args:
+            x: Input data (images)
+            use_weights: If True, uses weighted averaging for escalated samples
+            band: (low, high) CNN scores treated as uncertain; defaults to self.cascade_band
+        
+        Returns:
+            (predictions, stages) where stages[i] is 'cnn' if the CNN decided
+            sample i alone and 'ensemble' if it was escalated
+        """
+        low, high = band if band is not None else self.cascade_band
+        
+        cnn_pred = self._per_sample_cost('cnn', x)
+        scores = cnn_pred[:, 0]
+        uncertain = (scores >= low) & (scores <= high)
+        
+        final = cnn_pred.copy()
+        n_escalated = int(uncertain.sum())
+        if n_escalated:
+            x_uncertain = tf.boolean_mask(x, uncertain)
+            predictions = {'cnn': cnn_pred[uncertain]}
+            for name in self.models:
+                if name != 'cnn':
+                    predictions[name] = self._per_sample_cost(name, x_uncertain)
+            final[uncertain] = self._combine(predictions, use_weights)
         
-        return ensemble_pred, predictions
+        # Compute accounting, measured in per-sample member milliseconds
+        n = len(scores)
+        full_cost = sum(self._member_cost.get(name, 0.0) for name in self.models)
+        escalation_cost = full_cost - self._member_cost['cnn']
+        self._cascade_samples += n
+        self._cascade_escalated += n_escalated
+        self._cascade_cost_full += full_cost * n
+        self._cascade_cost_spent += self._member_cost['cnn'] * n + escalation_cost * n_escalated
+        
+        stages = np.where(uncertain, 'ensemble', 'cnn')
+        return final, stages
+    
+    def cascade_stats(self):
+        """Escalation rate and average compute saved by predict_cascade so far."""
+        if self._cascade_samples == 0:
+            return {'samples': 0, 'escalation_rate': 0.0, 'compute_saved': 0.0, 'band': self.cascade_band}
+        return {
+            'samples': self._cascade_samples,
+            'escalation_rate': self._cascade_escalated / self._cascade_samples,
+            'compute_saved': 1.0 - self._cascade_cost_spent / self._cascade_cost_full if self._cascade_cost_full else 0.0,
+            'band': self.cascade_band
+        }
     
-    def evaluate(self, dataset, use_weights=True):
+    def calibrate_cascade(self, dataset, target_accuracy, use_weights=True):
         """
-        Evaluate ensemble on a dataset.
+        Choose the cascade band on a validation set.
+        
+        Runs the full ensemble once over the dataset, then searches bands with
+        calibrate_cascade_band and stores the result in self.cascade_band.
         
         Args:
-            dataset: tf.data.Dataset
+            dataset: tf.data.Dataset of (images, labels)
+            target_accuracy: Cascade accuracy the band must hold
             use_weights: If True, uses weighted averaging
         
         Returns:
-            Dictionary with metrics for each model and ensemble
+            Result dict from calibrate_cascade_band
         """
-        all_labels = []
-        all_preds = {name: [] for name in self.models.keys()}
-        all_preds['ensemble'] = []
-        
-        print("Evaluating ensemble...")
+        labels, cnn_scores, ensemble_scores = [], [], []
         for x_batch, y_batch in dataset:
-            # Get ensemble predictions
             ensemble_pred, individual_preds = self.predict(x_batch, use_weights=use_weights)
-            
-            # Store predictions
-            all_labels.extend(y_batch.numpy())
-            all_preds['ensemble'].extend(ensemble_pred.flatten())
+            labels.append(np.asarray(y_batch).ravel())
+            cnn_scores.append(individual_preds['cnn'].ravel())
+            ensemble_scores.append(ensemble_pred.ravel())
+        
+        result = calibrate_cascade_band(
+            np.concatenate(cnn_scores), np.concatenate(ensemble_scores),
+            np.concatenate(labels), target_accuracy
+        )
+        self.cascade_band = result['band']
+        return result
+    
+    def evaluate_cascade(self, dataset, use_weights=True):
+        """
+        Evaluate the early-exit cascade on a dataset.
+        
+        Returns:
+            Dict with accuracy, loss, escalation_rate and compute_saved for this dataset
+        """
+        spent, full = self._cascade_cost_spent, self._cascade_cost_full
+        metrics, escalated = StreamingBinaryMetrics(), 0
+        for x_batch, y_batch in dataset:
+            pred, stages = self.predict_cascade(x_batch, use_weights=use_weights)
+            metrics.update(y_batch, pred)
+            escalated += int(np.sum(stages == 'ensemble'))
+        
+        full = self._cascade_cost_full - full
+        result = metrics.result()
+        return {
+            'accuracy': result['accuracy'],
+            'loss': result['loss'],
+            'roc_auc': result['roc_auc'],
+            'escalation_rate': escalated / max(metrics.count, 1),
+            'compute_saved': 1.0 - (self._cascade_cost_spent - spent) / full if full else 0.0
+        }
+    
+    def _evaluation_predictor(self, use_weights=True):
+        """
+        Batch predictor for evaluation: one call into the fused graph when the
+        members share an input shape, otherwise members in parallel.
+        """
+        try:
+            fused = self.fuse()
+        except ValueError:
+            return lambda x: self.predict_parallel(x, use_weights=use_weights)[:2]
+        if self._fused_predictor is not None:
+            return lambda x: self.predict_fused(x, use_weights)
+        
+        # A direct graph call avoids model.predict's per-batch setup
+        call = tf.function(lambda x: fused(x, training=False), reduce_retracing=True)
+        names = list(self.models.keys())
+        
+        def infer(x):
+            predictions = {name: np.asarray(out) for name, out in zip(names, call(x))}
+            return self._combine(predictions, use_weights), predictions
+        return infer
+    
+    def evaluate(self, dataset, use_weights=True, bins=DEFAULT_BINS, thresholds=DEFAULT_SWEEP):
+        """
+        Evaluate ensemble on a dataset.
+        
+        Metrics are accumulated per batch (see eval_metrics), so memory does not
+        grow with the dataset. Inference on one batch runs on a worker thread
+        while the next batch is loaded and the previous one is scored.
+        
+        Args:
+            dataset: tf.data.Dataset of (images, labels)
+            use_weights: If True, uses weighted averaging
+            bins: Score histogram resolution for AUCs and the threshold sweep
+            thresholds: Thresholds to sweep
+        
+        Returns:
+            Dictionary with metrics for each model and ensemble (accuracy, loss,
+            roc_auc, pr_auc, confusion_matrix, threshold_sweep, best_threshold)
+        """
+        metrics = {name: StreamingBinaryMetrics(bins) for name in list(self.models.keys()) + ['ensemble']}
+        infer = self._evaluation_predictor(use_weights)
+        
+        def accumulate(future, labels):
+            ensemble_pred, individual_preds = future.result()
+            metrics['ensemble'].update(labels, ensemble_pred)
             for name, pred in individual_preds.items():
-                all_preds[name].extend(pred.flatten())
-        
-        # Convert to numpy arrays
-        all_labels = np.array(all_labels)
-        for name in all_preds.keys():
-            all_preds[name] = np.array(all_preds[name])
-        
-        # Calculate metrics
-        results = {}
-        for name, preds in all_preds.items():
-            # Binary predictions (threshold at 0.5)
-            binary_preds = (preds > 0.5).astype(int)
-            
-            # Calculate accuracy
-            accuracy = np.mean(binary_preds == all_labels)
-            
-            # Calculate binary cross-entropy loss
-            epsilon = 1e-7  # To avoid log(0)
-            preds_clipped = np.clip(preds, epsilon, 1 - epsilon)
-            loss = -np.mean(all_labels * np.log(preds_clipped) + 
-                           (1 - all_labels) * np.log(1 - preds_clipped))
-            
-            results[name] = {
-                'accuracy': accuracy,
-                'loss': loss
-            }
+                metrics[name].update(labels, pred)
         
-        return results
+        print("Evaluating ensemble...")
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="ensemble-eval") as executor:
+            pending = None
+            for x_batch, y_batch in dataset.prefetch(tf.data.AUTOTUNE):
+                future = executor.submit(infer, x_batch)
+                if pending is not None:
+                    accumulate(*pending)
+                pending = (future, np.asarray(y_batch))
+            if pending is not None:
+                accumulate(*pending)
+        
+        return {name: m.result(thresholds) for name, m in metrics.items()}
     
     def get_model_weights(self):
         """Return current ensemble weights."""
         return self.weights.copy()
     
+    def load_combination(self, path):
+        """
+        Apply weights fitted by ensemble_weights.py.
+        
+        The file holds averaging weights and, for method "stacking", the
+        logistic stacker's coefficients and intercept.
+        """
+        with open(path) as f:
+            combination = json.load(f)
+        unknown = set(combination['weights']) - set(self.models)
+        if unknown:
+            raise ValueError(f"{path} has weights for unknown members: {sorted(unknown)}")
+        self.set_model_weights(combination['weights'])
+        self.stacking = combination.get('stacking') if combination.get('method') == 'stacking' else None
+        return combination
+    
     def set_model_weights(self, weights):
         """
         Set new weights for ensemble.
@@ -43,3 +43,47 @@ def build_lstm(input_shape=(160,160,3)):
     
     model = models.Model(inputs=inputs, outputs=outputs, name="LSTM_DeepFake")
     return model
+
+# ---------- Temporal model (video) ----------
+# The CNN encodes each frame once into a pooled embedding; the LSTM then runs over a
+# window of consecutive frame embeddings. Keeping the two separate lets embeddings be
+# cached, so sliding the window forward by one frame costs one CNN pass.
+
+FRAME_FEATURE_DIM = 128
+
+def frame_encoder_from_cnn(cnn_model):
+    """
+    Reuse a trained basic CNN's conv blocks as a frozen frame encoder.
+
+    Returns a model mapping the CNN's input to the output of its
+    GlobalAveragePooling2D layer (the embedding its classifier head sees).
+    """
+    pooled = next(
+        (layer for layer in cnn_model.layers if isinstance(layer, layers.GlobalAveragePooling2D)),
+        None
+    )
+    if pooled is None:
+        raise ValueError(f"{cnn_model.name} has no GlobalAveragePooling2D layer to take embeddings from")
+    encoder = models.Model(inputs=cnn_model.input, outputs=pooled.output, name="frame_encoder")
+    encoder.trainable = False
+    return encoder
+
+def build_temporal_lstm(window=16, feature_dim=FRAME_FEATURE_DIM):
+    """
+    LSTM over a window of per-frame CNN embeddings, shape (window, feature_dim).
+    """
+    inputs = layers.Input(shape=(window, feature_dim))
+
+    # ---- LSTM Layers ----
+    x = layers.LSTM(128, return_sequences=True)(inputs)
+    x = layers.Dropout(0.3)(x)
+    x = layers.LSTM(64)(x)
+    x = layers.Dropout(0.3)(x)
+
+    # ---- Classification Head ----
+    x = layers.Dense(64, activation='relu')(x)
+    x = layers.Dropout(0.5)(x)
+    outputs = layers.Dense(1, activation='sigmoid', dtype='float32')(x)
+
+    model = models.Model(inputs=inputs, outputs=outputs, name="Temporal_LSTM")
+    return model
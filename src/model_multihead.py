@@ -0,0 +1,81 @@
+# src/model_multihead.py
+import tensorflow as tf
+from tensorflow.keras import layers, models
+
+try:
+    from src.model_resnext import grouped_block
+except ImportError:  # run from inside src/
+    from model_resnext import grouped_block
+
+HEADS = ("cnn", "resnext", "lstm")
+
+def shared_trunk(inputs):
+    """
+    The Conv32/64/128 + BatchNorm + MaxPool stack that build_basic_cnn and
+    build_lstm each compute on their own.
+    """
+    x = inputs
+    for filters in (32, 64, 128):
+        x = layers.Conv2D(filters, 3, padding='same', activation='relu', name=f"trunk_conv{filters}")(x)
+        x = layers.BatchNormalization(name=f"trunk_bn{filters}")(x)
+        x = layers.MaxPooling2D(2, name=f"trunk_pool{filters}")(x)
+    return x
+
+def build_multihead(input_shape=(160,160,3)):
+    """
+    One shared convolutional trunk feeding the three ensemble heads:
+
+      cnn      GlobalAveragePooling + dense classifier (as build_basic_cnn)
+      resnext  a grouped-conv block at the trunk's resolution (as build_resnext's blocks)
+      lstm     the trunk's rows as a sequence through two LSTMs (as build_lstm)
+
+    Outputs are named after the heads, in HEADS order; each is a float32 sigmoid score.
+    """
+    inputs = layers.Input(shape=input_shape)
+    trunk = shared_trunk(inputs)
+
+    # ---- CNN head ----
+    x = layers.GlobalAveragePooling2D()(trunk)
+    x = layers.Dense(128, activation='relu')(x)
+    x = layers.Dropout(0.5)(x)
+    cnn = layers.Dense(1, activation='sigmoid', dtype='float32', name="cnn")(x)
+
+    # ---- ResNeXt head ----
+    x = grouped_block(trunk, 256)
+    x = layers.MaxPooling2D(2)(x)
+    x = layers.GlobalAveragePooling2D()(x)
+    x = layers.Dense(128, activation='relu')(x)
+    x = layers.Dropout(0.5)(x)
+    resnext = layers.Dense(1, activation='sigmoid', dtype='float32', name="resnext")(x)
+
+    # ---- LSTM head (each trunk row is a time step) ----
+    shape = tf.keras.backend.int_shape(trunk)
+    x = layers.Reshape((shape[1], shape[2] * shape[3]))(trunk)
+    x = layers.LSTM(128, return_sequences=True)(x)
+    x = layers.Dropout(0.3)(x)
+    x = layers.LSTM(64)(x)
+    x = layers.Dropout(0.3)(x)
+    x = layers.Dense(128, activation='relu')(x)
+    x = layers.Dropout(0.5)(x)
+    lstm = layers.Dense(1, activation='sigmoid', dtype='float32', name="lstm")(x)
+
+    model = models.Model(inputs=inputs, outputs=[cnn, resnext, lstm], name="MultiHead_DeepFake")
+    return model
+
+def serving_model(multihead, weights=None):
+    """
+    Single-output model averaging the heads, servable anywhere a one-score
+    model is (SERVING_MODE=multihead, TFLite/ONNX export).
+
+    Args:
+        multihead: Model from build_multihead
+        weights: Optional dict of head weights (default: equal)
+    """
+    weights = weights or {name: 1.0 for name in HEADS}
+    total = sum(weights[name] for name in HEADS)
+    scaled = [
+        layers.Rescaling(weights[name] / total, dtype='float32', name=f"{name}_weight")(output)
+        for name, output in zip(HEADS, multihead.outputs)
+    ]
+    outputs = layers.Add(dtype='float32', name="ensemble")(scaled)
+    return models.Model(inputs=multihead.input, outputs=outputs, name="MultiHead_Ensemble")
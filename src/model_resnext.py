@@ -2,45 +2,198 @@
 import tensorflow as tf
 from tensorflow.keras import layers, models
 
-def build_resnext(input_shape=(160,160,3), classes=1):
+# Block variants for build_resnext:
+#   legacy     the original block (default, what existing resnext_best.h5 files contain):
+#              `cardinality` separate full-input convs, concatenated
+#   grouped    ResNeXt bottleneck with a true grouped 3x3 conv (groups=cardinality) and a residual
+#   separable  the same bottleneck with a depthwise 3x3 conv (one group per channel)
+#   dense      the original block's exact equivalent as a single 3x3 conv (convert_legacy_resnext)
+BLOCKS = ("legacy", "grouped", "separable", "dense")
+STAGE_FILTERS = (64, 128, 256)
+
+def resnext_block(x, filters, strides=1, cardinality=8, name=None):
+    """
+    Original ResNeXt-like block: `cardinality` parallel 3x3 convs over the full
+    input, concatenated and mixed by a 1x1 conv. Kept so old checkpoints can
+    be rebuilt and converted; every branch sees every input channel, so this
+    is one wide conv computed in `cardinality` kernel launches.
+    """
+    # Split input into groups
+    groups = []
+    for j in range(cardinality):
+        g = layers.Conv2D(filters//cardinality, 3, padding='same', strides=strides, activation='relu',
+                          name=name and f"{name}_branch{j}")(x)
+        groups.append(g)
+    x = layers.Concatenate(name=name and f"{name}_concat")(groups)
+    x = layers.Conv2D(filters, 1, activation='relu', name=name and f"{name}_mix")(x)
+    return x
+
+def dense_block(x, filters, strides=1, name=None):
+    """The legacy block computed as one 3x3 conv: identical outputs, one kernel instead of `cardinality`."""
+    x = layers.Conv2D(filters, 3, padding='same', strides=strides, activation='relu',
+                      name=name and f"{name}_conv3")(x)
+    x = layers.Conv2D(filters, 1, activation='relu', name=name and f"{name}_mix")(x)
+    return x
+
+def grouped_block(x, filters, strides=1, cardinality=8, group_width=None, separable=False, name=None):
+    """
+    ResNeXt bottleneck: 1x1 reduce to cardinality * group_width channels,
+    3x3 grouped conv (groups=cardinality, or depthwise when separable),
+    1x1 expand to `filters`, plus a residual shortcut (projected by a 1x1
+    conv when the shape changes).
+
+    Args:
+        group_width: Channels per group (default: filters // (2 * cardinality),
+            a bottleneck half as wide as the block output)
+    """
+    group_width = group_width or max(1, filters // (2 * cardinality))
+    width = cardinality * group_width
+    prefix = name or "block"
+
+    y = layers.Conv2D(width, 1, use_bias=False, name=name and f"{prefix}_reduce")(x)
+    y = layers.BatchNormalization(name=name and f"{prefix}_reduce_bn")(y)
+    y = layers.ReLU()(y)
+    if separable:
+        y = layers.DepthwiseConv2D(3, strides=strides, padding='same', use_bias=False,
+                                   name=name and f"{prefix}_depthwise")(y)
+    else:
+        y = layers.Conv2D(width, 3, strides=strides, padding='same', groups=cardinality, use_bias=False,
+                          name=name and f"{prefix}_grouped")(y)
+    y = layers.BatchNormalization(name=name and f"{prefix}_grouped_bn")(y)
+    y = layers.ReLU()(y)
+    y = layers.Conv2D(filters, 1, use_bias=False, name=name and f"{prefix}_expand")(y)
+    y = layers.BatchNormalization(name=name and f"{prefix}_expand_bn")(y)
+
+    shortcut = x
+    if strides != 1 or tf.keras.backend.int_shape(x)[-1] != filters:
+        shortcut = layers.Conv2D(filters, 1, strides=strides, use_bias=False, name=name and f"{prefix}_proj")(x)
+        shortcut = layers.BatchNormalization(name=name and f"{prefix}_proj_bn")(shortcut)
+
+    return layers.ReLU()(layers.Add()([y, shortcut]))
+
+def build_resnext(input_shape=(160,160,3), classes=1, block="legacy", cardinality=8, group_width=None):
     """
     Build a lightweight ResNeXt-like architecture.
     This is NOT the massive 50-layer ImageNet version.
     It is custom-made to run on Low end GPUs
+
+    Args:
+        block: One of BLOCKS ("legacy" rebuilds the original architecture)
+        cardinality: Number of groups in each block's 3x3 conv
+        group_width: Channels per group for "grouped"/"separable" (see grouped_block)
     """
+    if block not in BLOCKS:
+        raise ValueError(f"Unknown ResNeXt block: {block!r} (expected one of {BLOCKS})")
 
     inputs = layers.Input(shape=input_shape)
 
     # ---- Stem ----
-    x = layers.Conv2D(32, 3, padding='same', activation='relu')(inputs)
-    x = layers.BatchNormalization()(x)
-
-    # ---- ResNeXt block (grouped conv) ----
-    def resnext_block(x, filters, strides=1, cardinality=8):
-        # Split input into groups
-        groups = []
-        for _ in range(cardinality):
-            g = layers.Conv2D(filters//cardinality, 3, padding='same', strides=strides, activation='relu')(x)
-            groups.append(g)
-        x = layers.Concatenate()(groups)
-        x = layers.Conv2D(filters, 1, activation='relu')(x)
-        return x
+    x = layers.Conv2D(32, 3, padding='same', activation='relu', name="stem_conv")(inputs)
+    x = layers.BatchNormalization(name="stem_bn")(x)
 
     # ---- Stack of ResNeXt blocks ----
-    x = resnext_block(x, 64)
-    x = layers.MaxPooling2D(2)(x)
-
-    x = resnext_block(x, 128)
-    x = layers.MaxPooling2D(2)(x)
-
-    x = resnext_block(x, 256)
-    x = layers.MaxPooling2D(2)(x)
+    for i, filters in enumerate(STAGE_FILTERS, start=1):
+        name = f"block{i}"
+        if block == "legacy":
+            x = resnext_block(x, filters, cardinality=cardinality, name=name)
+        elif block == "dense":
+            x = dense_block(x, filters, name=name)
+        else:
+            x = grouped_block(x, filters, cardinality=cardinality, group_width=group_width,
+                              separable=(block == "separable"), name=name)
+        x = layers.MaxPooling2D(2)(x)
 
     # ---- Classification head ----
     x = layers.GlobalAveragePooling2D()(x)
-    x = layers.Dense(128, activation='relu')(x)
+    x = layers.Dense(128, activation='relu', name="head_dense")(x)
     x = layers.Dropout(0.5)(x)
-    outputs = layers.Dense(1, activation='sigmoid', dtype='float32')(x)
+    outputs = layers.Dense(1, activation='sigmoid', dtype='float32', name="head_out")(x)
 
-    model = models.Model(inputs, outputs, name="ResNeXt_Custom")
+    model = models.Model(inputs, outputs, name="ResNeXt_Custom" if block == "legacy" else f"ResNeXt_{block}")
     return model
+
+# ---------- Converting legacy checkpoints ----------
+def _creation_index(layer):
+    """Position in Keras' auto-naming sequence: conv2d -> 0, conv2d_7 -> 7."""
+    _, _, suffix = layer.name.rpartition("_")
+    return int(suffix) if suffix.isdigit() else 0
+
+def _layers_of(model, layer_type):
+    """Layers of one type in creation order (auto names count up as layers are created)."""
+    return sorted((layer for layer in model.layers if type(layer) is layer_type), key=_creation_index)
+
+def _legacy_layout(model, cardinality=8):
+    """
+    Locate stem, per-block branch / mix convs and head layers in a legacy model.
+
+    Models from build_resnext(block="legacy") are looked up by their layer
+    names; checkpoints saved before the layers were named fall back to
+    Keras' auto names, whose numeric suffixes follow creation order.
+    """
+    names = {layer.name for layer in model.layers}
+    if "stem_conv" in names:
+        return {
+            "stem_conv": model.get_layer("stem_conv"),
+            "stem_bn": model.get_layer("stem_bn"),
+            "blocks": [
+                ([model.get_layer(f"block{i}_branch{j}") for j in range(cardinality)],
+                 model.get_layer(f"block{i}_mix"))
+                for i in range(1, len(STAGE_FILTERS) + 1)
+            ],
+            "head_dense": model.get_layer("head_dense"),
+            "head_out": model.get_layer("head_out"),
+        }
+
+    convs = _layers_of(model, layers.Conv2D)
+    dense = _layers_of(model, layers.Dense)
+    bns = _layers_of(model, layers.BatchNormalization)
+    per_block = cardinality + 1
+    if len(convs) != 1 + per_block * len(STAGE_FILTERS) or len(dense) != 2 or not bns:
+        raise ValueError(f"{model.name} does not have the legacy ResNeXt layout (cardinality {cardinality})")
+    blocks = []
+    for i in range(len(STAGE_FILTERS)):
+        block = convs[1 + i * per_block:1 + (i + 1) * per_block]
+        branches, mix = block[:-1], block[-1]
+        if tuple(mix.kernel_size) != (1, 1) or any(tuple(b.kernel_size) != (3, 3) for b in branches):
+            raise ValueError(f"{model.name} does not have the legacy ResNeXt layout (cardinality {cardinality})")
+        blocks.append((branches, mix))
+    return {
+        "stem_conv": convs[0],
+        "stem_bn": bns[0],
+        "blocks": blocks,
+        "head_dense": dense[0],
+        "head_out": dense[1],
+    }
+
+def convert_legacy_resnext(old_model, block="dense", cardinality=8, group_width=None):
+    """
+    Map a legacy ResNeXt checkpoint onto another block variant.
+
+    "dense" is exact: concatenating the branch kernels along the output axis
+    gives the single 3x3 conv the branches always computed. For "grouped" and
+    "separable" the blocks' shapes differ, so only the stem and the head
+    (whose shapes match) are carried over; the blocks start from fresh
+    initialization and the model needs fine-tuning.
+
+    Returns:
+        (new model, list of layer names whose weights were carried over)
+    """
+    layout = _legacy_layout(old_model, cardinality)
+    new_model = build_resnext(tuple(old_model.input_shape[1:]), block=block,
+                              cardinality=cardinality, group_width=group_width)
+    mapped = []
+
+    def copy(name, weights):
+        new_model.get_layer(name).set_weights(weights)
+        mapped.append(name)
+
+    copy("stem_conv", layout["stem_conv"].get_weights())
+    copy("stem_bn", layout["stem_bn"].get_weights())
+    if block == "dense":
+        for i, (branches, mix) in enumerate(layout["blocks"], start=1):
+            kernels, biases = zip(*(branch.get_weights() for branch in branches))
+            copy(f"block{i}_conv3", [tf.concat(kernels, axis=-1).numpy(), tf.concat(biases, axis=0).numpy()])
+            copy(f"block{i}_mix", mix.get_weights())
+    copy("head_dense", layout["head_dense"].get_weights())
+    copy("head_out", layout["head_out"].get_weights())
+    return new_model, mapped
@@ -0,0 +1,156 @@
+# src/quantize_models.py
+"""
+Post-training INT8 quantization for the CNN, ResNeXt and LSTM models.
+
+For each trained model this:
+  1. Calibrates activation ranges on a representative sample drawn from the
+     training split of data_utils.make_image_datasets
+  2. Writes <name>.int8.tflite next to the .h5 (and a float <name>.tflite
+     baseline if it does not exist yet)
+  3. Reports accuracy and loss (as computed by EnsembleModel.evaluate),
+     file size and single-image p50/p99 latency for Keras float, TFLite
+     float and TFLite int8
+
+Run from the project root:
+    python -m src.quantize_models
+    INFERENCE_BACKEND=tflite_int8 uvicorn app:app
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+
+from serving.backends import artifact_path, load_backend
+from src.data_utils import make_image_datasets
+from src.export_models import MODEL_DIR, MODEL_FILES, export_tflite
+from src.model_ensemble import binary_metrics
+
+# ---------- Config ----------
+BASE_DIR = "data/Dataset"
+BATCH = 8
+REPRESENTATIVE_SAMPLES = 200   # calibration images; a few hundred is plenty
+LATENCY_RUNS = 200
+REPORT_PATH = MODEL_DIR / "quantization_report.json"
+
+# ---------- Quantization ----------
+def representative_dataset(train_ds, n_samples):
+    """Generator of single-image float32 batches for TFLite calibration."""
+    def gen():
+        seen = 0
+        for x_batch, _ in train_ds:
+            for image in x_batch:
+                yield [tf.expand_dims(image, 0)]
+                seen += 1
+                if seen >= n_samples:
+                    return
+    return gen
+
+def quantize_int8(model, out_path, rep_data):
+    """
+    Full-integer quantization, relaxing constraints until conversion succeeds.
+
+    Returns:
+        (size in bytes, mode) where mode names the scheme that succeeded
+    """
+    # 1. int8 kernels with int8 input/output tensors (fastest on CPU)
+    try:
+        return export_tflite(model, out_path, [tf.lite.Optimize.DEFAULT], rep_data, int8_io=True), "int8"
+    except Exception as e:
+        print(f"  int8 I/O conversion failed ({e}); keeping float I/O")
+
+    # 2. int8 internals, float input/output, float fallback for unsupported ops (e.g. LSTM)
+    try:
+        return export_tflite(model, out_path, [tf.lite.Optimize.DEFAULT], rep_data), "int8_float_io"
+    except Exception as e:
+        print(f"  Calibrated conversion failed ({e}); using dynamic-range quantization")
+
+    # 3. int8 weights only
+    return export_tflite(model, out_path, [tf.lite.Optimize.DEFAULT]), "dynamic_range"
+
+# ---------- Measurement ----------
+def evaluate_predict_fn(predict_fn, dataset):
+    """Accuracy and loss of predict_fn over a (images, labels) dataset."""
+    labels, preds = [], []
+    for x_batch, y_batch in dataset:
+        preds.append(np.asarray(predict_fn(x_batch.numpy())).ravel())
+        labels.append(y_batch.numpy().ravel())
+    metrics = binary_metrics(np.concatenate(labels), np.concatenate(preds))
+    return {k: float(v) for k, v in metrics.items()}
+
+def latency_percentiles(predict_fn, sample, runs=LATENCY_RUNS):
+    """p50/p99 single-image latency in milliseconds (after a short warm-up)."""
+    for _ in range(5):
+        predict_fn(sample)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        predict_fn(sample)
+        times.append((time.perf_counter() - start) * 1000.0)
+    return {"p50_ms": float(np.percentile(times, 50)), "p99_ms": float(np.percentile(times, 99))}
+
+# ---------- Main ----------
+def main():
+    parser = argparse.ArgumentParser(description="INT8 post-training quantization with accuracy/latency report")
+    parser.add_argument("--model-dir", default=str(MODEL_DIR))
+    parser.add_argument("--data-dir", default=BASE_DIR)
+    parser.add_argument("--models", nargs="+", default=list(MODEL_FILES), choices=list(MODEL_FILES))
+    parser.add_argument("--samples", type=int, default=REPRESENTATIVE_SAMPLES)
+    parser.add_argument("--threads", type=int, default=None, help="TFLite interpreter threads")
+    parser.add_argument("--report", default=str(REPORT_PATH))
+    args = parser.parse_args()
+
+    model_dir = Path(args.model_dir)
+    report = {}
+
+    for name in args.models:
+        h5_path = model_dir / MODEL_FILES[name]
+        if not h5_path.exists():
+            print(f"Skipping {name}: {h5_path} not found")
+            continue
+
+        print("=" * 60)
+        print(f"Quantizing {name} from {h5_path}")
+        model = tf.keras.models.load_model(str(h5_path))
+        img_size = tuple(model.input_shape[1:3])
+        train_ds, _, test_ds = make_image_datasets(args.data_dir, img_size, BATCH)
+
+        float_path = artifact_path(str(h5_path), "tflite")
+        if not Path(float_path).exists():
+            export_tflite(model, float_path)
+        int8_path = artifact_path(str(h5_path), "tflite_int8")
+        _, mode = quantize_int8(model, int8_path, representative_dataset(train_ds, args.samples))
+        print(f"  Wrote {int8_path} ({mode})")
+
+        variants = {
+            "keras_float": (lambda x: model.predict(x, verbose=0), h5_path),
+            "tflite_float": (load_backend("tflite", float_path, args.threads).predict, float_path),
+            "tflite_int8": (load_backend("tflite_int8", int8_path, args.threads).predict, int8_path),
+        }
+        sample = next(iter(test_ds))[0][:1].numpy()
+
+        report[name] = {"quantization_mode": mode}
+        for variant, (predict_fn, path) in variants.items():
+            entry = evaluate_predict_fn(predict_fn, test_ds)
+            entry["size_mb"] = Path(path).stat().st_size / 1e6
+            entry.update(latency_percentiles(predict_fn, sample))
+            report[name][variant] = entry
+
+        # ---- Display ----
+        print(f"\n  {'variant':14s} {'acc':>8s} {'loss':>8s} {'size MB':>8s} {'p50 ms':>8s} {'p99 ms':>8s}")
+        for variant, m in report[name].items():
+            if variant == "quantization_mode":
+                continue
+            print(f"  {variant:14s} {m['accuracy']*100:7.2f}% {m['loss']:8.4f} "
+                  f"{m['size_mb']:8.2f} {m['p50_ms']:8.2f} {m['p99_ms']:8.2f}")
+        drop = report[name]["keras_float"]["accuracy"] - report[name]["tflite_int8"]["accuracy"]
+        print(f"  int8 accuracy change vs Keras float: {-drop*100:+.2f}%")
+
+    Path(args.report).write_text(json.dumps(report, indent=2))
+    print("\nReport saved:", args.report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# src/train_distill.py
+"""
+Distill the CNN + ResNeXt + LSTM ensemble into one slim CNN (a width-scaled
+build_basic_cnn) that serves at the cost of a single forward pass.
+
+The teacher runs once per split. Its per-member scores are cached on disk
+with ensemble_weights.py's prediction cache and are reused for as long as
+the member files and the split's image files are unchanged. They are combined with models/ensemble_weights.json
+when that file exists (equal weights otherwise) and softened by TEMPERATURE.
+Each training image's target is a blend of the hard label and the teacher's
+score:
+
+    target = ALPHA * label + (1 - ALPHA) * sigmoid(logit(teacher) / TEMPERATURE)
+
+Binary cross-entropy is linear in its target, so training on the blend
+equals ALPHA * BCE(label) + (1 - ALPHA) * BCE(teacher), with no custom loss.
+Validation and test use the hard labels.
+
+Saves models/student_cnn_best.h5, a plain single-output model: add it to
+MODEL_PATHS or serve it with SERVING_MODE=student. The teacher and student
+test accuracy and latency are written to models/distill_report.json.
+
+Run from src/ like the other training scripts:
+    python train_distill.py
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+
+# ---------- GPU safety / memory settings ----------
+try:
+    gpus = tf.config.list_physical_devices("GPU")
+    if gpus:
+        for gpu in gpus:
+            tf.config.experimental.set_memory_growth(gpu, True)
+    else:
+        print("No GPU detected by TensorFlow.")
+except Exception as e:
+    print("GPU configuration failed:", e)
+
+# ---------- Data pipeline settings ----------
+RAM_BUDGET_MB = 3000
+DISK_CACHE = None          # e.g. "../cache/tfdata"
+
+# ---------- Config ----------
+BASE_DIR = "../data/Dataset"
+IMG_SIZE = (160, 160)
+BATCH = 16
+EPOCHS = 10
+STUDENT_WIDTH = 0.5        # build_basic_cnn channel multiplier
+ALPHA = 0.3                # weight of the hard label in the target
+TEMPERATURE = 2.0          # >1 softens the teacher's scores
+TEACHER_PATHS = {
+    'cnn': 'models/basic_cnn_best.h5',
+    'resnext': 'models/resnext_best.h5',
+    'lstm': 'models/lstm_best.h5'
+}
+WEIGHTS_PATH = Path("models/ensemble_weights.json")
+# File-order teacher scores (ensemble_weights.py's own cache may be in shard order)
+TEACHER_CACHE = Path("cache/teacher_predictions")
+LATENCY_BATCHES = (1, 32)
+LATENCY_RUNS = 30
+MODEL_DIR = Path("models")
+MODEL_DIR.mkdir(parents=True, exist_ok=True)
+MODEL_OUT = MODEL_DIR / "student_cnn_best.h5"
+REPORT_OUT = MODEL_DIR / "distill_report.json"
+LOG_DIR = Path("logs/distill")
+LOG_DIR.mkdir(parents=True, exist_ok=True)
+
+# ---------- Imports (model, data, teacher, training mode) ----------
+from model_cnn import build_basic_cnn
+from data_utils import describe_plan, make_split_dataset, plan_pipeline
+from dataset_cache import SPLITS, list_split
+from ensemble_weights import cache_member_predictions, combine, load_prediction_cache, score
+from latency import time_calls
+from model_ensemble import EnsembleModel
+from training_modes import (ThroughputCallback, apply_precision, compile_model, describe_mode,
+                            record_run, save_float32, training_mode_from_env)
+
+# ---------- Teacher ----------
+class Teacher:
+    """The ensemble's scores per split, computed once and cached; the members load only on a cache miss."""
+
+    def __init__(self, model_paths, weights_path=None):
+        self.model_paths = model_paths
+        self.weights_path = weights_path
+        self._ensemble = None
+
+    @property
+    def ensemble(self):
+        if self._ensemble is None:
+            self._ensemble = EnsembleModel(model_paths=self.model_paths)
+        return self._ensemble
+
+    def combination(self, members):
+        """Saved ensemble weights in ensemble_weights.combine's form (equal average if none)."""
+        if self.weights_path and Path(self.weights_path).exists():
+            saved = json.loads(Path(self.weights_path).read_text())
+            return {**saved, "members": [m for m in members if m in saved["weights"]]}
+        return {"method": "average", "members": members, "weights": {m: 1.0 for m in members}}
+
+    def scores(self, split):
+        """(teacher scores, labels) in list_split order."""
+        cache_dir = TEACHER_CACHE / f"{IMG_SIZE[0]}x{IMG_SIZE[1]}" / split
+        # Images added, removed or renamed since the cache was written make it stale
+        paths = list_split(BASE_DIR, split)[0]
+        cached = load_prediction_cache(cache_dir, self.model_paths, files=paths)
+        if cached is None:
+            count = len(paths)
+            print(f"Teacher: running {len(self.model_paths)} members over {count} {split} images...")
+            # Image files, not shards: the targets must line up with list_split order
+            dataset = make_split_dataset(BASE_DIR, split, IMG_SIZE, 32, use_shards=False)
+            cached = cache_member_predictions(self.ensemble, dataset, count, cache_dir, files=paths)
+            print(f"Teacher: cached in {cache_dir} ({cached[2]['inference_seconds']}s of inference)")
+        member_scores, labels, meta = cached
+        return combine(member_scores, meta["members"], self.combination(meta["members"])), labels
+
+def soften(scores, temperature):
+    p = np.clip(np.asarray(scores, dtype=np.float64), 1e-7, 1 - 1e-7)
+    return 1.0 / (1.0 + np.exp(-np.log(p / (1 - p)) / temperature))
+
+def distillation_targets(teacher_scores, labels, alpha=ALPHA, temperature=TEMPERATURE):
+    return (alpha * np.asarray(labels, dtype=np.float64)
+            + (1 - alpha) * soften(teacher_scores, temperature)).astype(np.float32)
+
+def hard_accuracy(y_true, y_pred):
+    """Accuracy against the target's side of 0.5; plain accuracy on hard labels."""
+    return tf.reduce_mean(tf.cast(tf.equal(y_true > 0.5, y_pred > 0.5), tf.float32))
+
+# ---------- Report ----------
+def latency(teacher, student):
+    fused = tf.function(teacher.ensemble.fuse(), reduce_retracing=True)
+    single = tf.function(student, reduce_retracing=True)
+    rng = np.random.default_rng(0)
+    results = {}
+    for batch_size in LATENCY_BATCHES:
+        x = tf.constant(rng.random((batch_size,) + tuple(student.input_shape[1:]), dtype=np.float32))
+        results[batch_size] = {
+            "teacher": time_calls(lambda b: fused(b, training=False), x, LATENCY_RUNS),
+            "student": time_calls(lambda b: single(b, training=False), x, LATENCY_RUNS),
+        }
+    return results
+
+def evaluate_student(student, teacher_scores, labels):
+    """Test metrics for the student, plus how often it agrees with the teacher."""
+    dataset = make_split_dataset(BASE_DIR, "Test", IMG_SIZE, 32, use_shards=False)
+    scores = np.concatenate([np.asarray(student(x, training=False)).ravel() for x, _ in dataset])
+    metrics = score(labels, scores)
+    metrics["teacher_agreement"] = float(np.mean((scores > 0.5) == (np.asarray(teacher_scores) > 0.5)))
+    return metrics
+
+# ---------- Train ----------
+def main():
+    print("Starting distillation with settings:")
+    print(f"  BASE_DIR = {BASE_DIR}")
+    print(f"  IMG_SIZE = {IMG_SIZE}, BATCH = {BATCH}, EPOCHS = {EPOCHS}")
+    print(f"  STUDENT_WIDTH = {STUDENT_WIDTH}, ALPHA = {ALPHA}, TEMPERATURE = {TEMPERATURE}")
+    mode = training_mode_from_env()
+    print(f"  MODE = {describe_mode(mode)} (effective batch {BATCH * mode['accumulation_steps']})")
+
+    teacher = Teacher(TEACHER_PATHS, WEIGHTS_PATH)
+    train_teacher, train_labels = teacher.scores("Train")
+    test_teacher, test_labels = teacher.scores("Test")
+    targets = distillation_targets(train_teacher, train_labels)
+
+    counts = {split: len(list_split(BASE_DIR, split)[0]) for split in SPLITS}
+    plan = plan_pipeline(counts, IMG_SIZE, BATCH, ram_budget_mb=RAM_BUDGET_MB, disk_cache=DISK_CACHE)
+    print(f"Input pipeline: {describe_plan(plan)}")
+    train_ds = make_split_dataset(BASE_DIR, "Train", IMG_SIZE, BATCH, shuffle=True, plan=plan, targets=targets)
+    val_ds = make_split_dataset(BASE_DIR, "Validation", IMG_SIZE, BATCH, plan=plan)
+
+    apply_precision(mode)
+    student = build_basic_cnn(input_shape=(IMG_SIZE[0], IMG_SIZE[1], 3), width=STUDENT_WIDTH)
+    compile_model(student, mode, learning_rate=1e-3, metrics=(hard_accuracy,))
+    student.summary()
+
+    throughput = ThroughputCallback(BATCH)
+    callbacks = [
+        throughput,
+        tf.keras.callbacks.ModelCheckpoint(str(MODEL_OUT), monitor="val_loss", save_best_only=True),
+        tf.keras.callbacks.EarlyStopping(monitor="val_loss", patience=3, restore_best_weights=True),
+        tf.keras.callbacks.ReduceLROnPlateau(monitor="val_loss", factor=0.5, patience=2),
+        tf.keras.callbacks.TensorBoard(log_dir=str(LOG_DIR))
+    ]
+    history = student.fit(train_ds, validation_data=val_ds, epochs=EPOCHS, callbacks=callbacks)
+
+    # Re-save the best checkpoint uncompiled and in float32: it loads anywhere
+    # MODEL_PATHS models do, without the custom metric
+    tf.keras.mixed_precision.set_global_policy("float32")
+    best = tf.keras.models.load_model(str(MODEL_OUT), compile=False)
+    save_float32(best, MODEL_OUT, mode)
+    student = tf.keras.models.load_model(str(MODEL_OUT), compile=False)
+
+    report = {
+        "settings": {"student_width": STUDENT_WIDTH, "alpha": ALPHA, "temperature": TEMPERATURE,
+                     "img_size": list(IMG_SIZE)},
+        "parameters": {
+            "teacher": int(sum(m.count_params() for m in teacher.ensemble.models.values())),
+            "student": int(student.count_params()),
+        },
+        "test": {"teacher": score(test_labels, test_teacher),
+                 "student": evaluate_student(student, test_teacher, test_labels)},
+        "latency": latency(teacher, student),
+    }
+    record_run("train_distill", mode, BATCH, throughput, history, report["test"]["student"],
+               val_metric="val_hard_accuracy")
+
+    print(f"{'':8s} {'parameters':>11s} {'accuracy':>9s} {'loss':>7s} {'ROC-AUC':>8s}  latency p50 "
+          + "  ".join(f"b{b}" for b in LATENCY_BATCHES))
+    for role in ("teacher", "student"):
+        metrics = report["test"][role]
+        line = (f"{role:8s} {report['parameters'][role]:>11,} {metrics['accuracy']:9.4f} "
+                f"{metrics['loss']:7.4f} {metrics['roc_auc']:8.4f} ")
+        line += "  ".join(f"{report['latency'][b][role]['p50_ms']:8.2f} ms" for b in LATENCY_BATCHES)
+        print(line)
+    print(f"Student agrees with the teacher on {report['test']['student']['teacher_agreement']:.2%} of Test")
+
+    REPORT_OUT.write_text(json.dumps(report, indent=2))
+    print("Student saved:", MODEL_OUT)
+    print("Report saved:", REPORT_OUT)
+
+if __name__ == "__main__":
+    main()
@@ -23,32 +23,34 @@ except Exception as e:
 BASE_DIR = "../data/Dataset"
 IMG_SIZE = (160, 160)
 BATCH = 8
+RAM_BUDGET_MB = 2000
+WEIGHTS_PATH = "models/ensemble_weights.json"  # written by ensemble_weights.py; equal weights if absent
+CASCADE_TARGET_ACCURACY = 0.95  # accuracy the cascade band must hold on validation
 
 # ---------- Import ensemble model ----------
 from model_ensemble import EnsembleModel
+from data_utils import make_split_dataset, plan_pipeline
+from dataset_cache import list_split, read_meta
 
 # ---------- Data pipeline ----------
-def make_test_dataset(base_dir=BASE_DIR, img_size=IMG_SIZE, batch=BATCH):
-    """Load and prepare test dataset."""
+def make_test_dataset(base_dir=BASE_DIR, img_size=IMG_SIZE, batch=BATCH, split="Test"):
+    """Load and prepare test (or another split's) dataset."""
     base = Path(base_dir)
     if not base.exists():
         raise FileNotFoundError(f"Dataset directory not found: {base.resolve()}")
-    
-    test_ds = tf.keras.preprocessing.image_dataset_from_directory(
-        base / "Test",
-        image_size=img_size,
-        batch_size=batch,
-        shuffle=False
-    )
-    
-    # Normalization
-    def _norm(img, label):
-        img = tf.cast(img, tf.float32) / 255.0
-        return img, label
-    
-    test_ds = test_ds.map(_norm, num_parallel_calls=4).prefetch(1)
-    
-    return test_ds
+
+    # The test split is evaluated twice (ensemble, then cascade): cache it as uint8 if it fits
+    meta = read_meta(base_dir, split, img_size)
+    count = meta["count"] if meta else len(list_split(base_dir, split)[0])
+    plan = plan_pipeline({split: count}, img_size, batch, ram_budget_mb=RAM_BUDGET_MB,
+                         materialized=meta is not None)
+    return make_split_dataset(base_dir, split, img_size, batch, plan=plan)
+
+def print_metrics(label, metrics):
+    acc = metrics['accuracy']
+    print(f"{label:12s} - Accuracy: {acc:.4f} ({acc*100:.2f}%), Loss: {metrics['loss']:.4f}, "
+          f"ROC-AUC: {metrics['roc_auc']:.4f}, PR-AUC: {metrics['pr_auc']:.4f}, "
+          f"best threshold: {metrics['best_threshold']:.2f}")
 
 # ---------- Main evaluation ----------
 def main():
@@ -86,6 +88,10 @@ def main():
     # Create ensemble model
     print("\n" + "="*60)
     ensemble = EnsembleModel(model_paths=model_paths)
+    if Path(WEIGHTS_PATH).exists():
+        combination = ensemble.load_combination(WEIGHTS_PATH)
+        print(f"Using {combination['method']} weights fitted on {combination.get('fitted_on')} "
+              f"({WEIGHTS_PATH})")
     
     # Display ensemble weights
     print("\nEnsemble weights:")
@@ -105,16 +111,19 @@ def main():
     print("-" * 40)
     for name in ['cnn', 'resnext', 'lstm']:
         if name in results:
-            acc = results[name]['accuracy']
-            loss = results[name]['loss']
-            print(f"{name.upper():12s} - Accuracy: {acc:.4f} ({acc*100:.2f}%), Loss: {loss:.4f}")
+            print_metrics(name.upper(), results[name])
     
     print("\nEnsemble Model:")
     print("-" * 40)
     if 'ensemble' in results:
-        acc = results['ensemble']['accuracy']
-        loss = results['ensemble']['loss']
-        print(f"{'ENSEMBLE':12s} - Accuracy: {acc:.4f} ({acc*100:.2f}%), Loss: {loss:.4f}")
+        print_metrics('ENSEMBLE', results['ensemble'])
+        cm = results['ensemble']['confusion_matrix']
+        print(f"{'':12s}   Confusion @0.5 (rows true Fake/Real): "
+              f"[[{cm['tn']} {cm['fp']}] [{cm['fn']} {cm['tp']}]]")
+        sweep = results['ensemble']['threshold_sweep']
+        print(f"{'':12s}   Threshold sweep (accuracy / F1):")
+        for t, acc, f1 in zip(sweep['threshold'], sweep['accuracy'], sweep['f1']):
+            print(f"{'':12s}     {t:.2f}: {acc:.4f} / {f1:.4f}")
     
     # Find best individual model
     best_individual = max(['cnn', 'resnext', 'lstm'], 
@@ -136,6 +145,23 @@ def main():
     else:
         print("➡️  Ensemble matches best individual model")
     
+    # Early-exit cascade: calibrate the band on validation, evaluate on test
+    print("\n" + "="*60)
+    print("CASCADE (CNN first, escalate when uncertain)")
+    print("="*60)
+    val_ds = make_test_dataset(split="Validation")
+    calibration = ensemble.calibrate_cascade(val_ds, target_accuracy=CASCADE_TARGET_ACCURACY)
+    low, high = calibration['band']
+    print(f"Calibrated band: [{low:.2f}, {high:.2f}] "
+          f"(validation accuracy {calibration['accuracy']*100:.2f}%, "
+          f"escalation {calibration['escalation_rate']*100:.1f}%)")
+    
+    cascade = ensemble.evaluate_cascade(test_ds, use_weights=True)
+    print(f"{'CASCADE':12s} - Accuracy: {cascade['accuracy']:.4f} ({cascade['accuracy']*100:.2f}%), "
+          f"Loss: {cascade['loss']:.4f}, ROC-AUC: {cascade['roc_auc']:.4f}")
+    print(f"Escalated to full ensemble: {cascade['escalation_rate']*100:.1f}% of samples")
+    print(f"Average compute saved: {cascade['compute_saved']*100:.1f}%")
+    
     print("\n" + "="*60)
     print("Evaluation complete!")
     print("="*60)
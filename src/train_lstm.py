@@ -4,7 +4,7 @@ Training script for LSTM model on a memory-constrained laptop (GTX 1650).
 - Enables GPU memory growth
 - Sets an optional per-process GPU memory limit (MB)
 - Uses smaller IMG_SIZE and BATCH by default
-- Uses conservative tf.data settings
+- Keeps the shared tf.data pipeline (data_utils.py) within RAM_BUDGET_MB
 """
 
 import os
@@ -31,9 +31,12 @@ try:
 except Exception as e:
     print("GPU configuration failed:", e)
 
-# ---------- Conservative data pipeline settings ----------
-DATA_PARALLEL_CALLS = 4
-PREFETCH = 1
+# ---------- Data pipeline settings ----------
+# Memory the input pipeline may use; decode parallelism and prefetch are
+# autotuned within it. Images are cached (as uint8) only if they fit, else in
+# DISK_CACHE when set. Materialized shards (dataset_cache.py) are used if present.
+RAM_BUDGET_MB = 3000
+DISK_CACHE = None          # e.g. "../cache/tfdata"
 
 # ---------- Config ----------
 BASE_DIR = "../data/Dataset"
@@ -50,68 +53,34 @@ LOG_DIR.mkdir(parents=True, exist_ok=True)
 from model_lstm import build_lstm
 
 # ---------- Data pipeline ----------
-AUTOTUNE = tf.data.AUTOTUNE
-
-def make_image_datasets(base_dir=BASE_DIR, img_size=IMG_SIZE, batch=BATCH):
-    base = Path(base_dir)
-    if not base.exists():
-        raise FileNotFoundError(f"Dataset directory not found: {base.resolve()}")
-
-    train_ds = tf.keras.preprocessing.image_dataset_from_directory(
-        base / "Train",
-        image_size=img_size,
-        batch_size=batch,
-        shuffle=True
-    )
-    val_ds = tf.keras.preprocessing.image_dataset_from_directory(
-        base / "Validation",
-        image_size=img_size,
-        batch_size=batch,
-        shuffle=False
-    )
-    test_ds = tf.keras.preprocessing.image_dataset_from_directory(
-        base / "Test",
-        image_size=img_size,
-        batch_size=batch,
-        shuffle=False
-    )
-
-    # Simple normalization function
-    def _norm(img, label):
-        img = tf.cast(img, tf.float32) / 255.0
-        return img, label
-
-    # Apply mapping with conservative parallelism and prefetch=1
-    train_ds = train_ds.map(_norm, num_parallel_calls=DATA_PARALLEL_CALLS)
-    train_ds = train_ds.prefetch(PREFETCH)
+from data_utils import make_image_datasets
 
-    val_ds = val_ds.map(_norm, num_parallel_calls=DATA_PARALLEL_CALLS)
-    val_ds = val_ds.prefetch(PREFETCH)
-
-    test_ds = test_ds.map(_norm, num_parallel_calls=DATA_PARALLEL_CALLS)
-    test_ds = test_ds.prefetch(PREFETCH)
-
-    return train_ds, val_ds, test_ds
+# ---------- Training mode (TRAIN_PRECISION / TRAIN_JIT / TRAIN_ACCUM_STEPS) ----------
+from training_modes import (ThroughputCallback, apply_precision, compile_model, describe_mode,
+                            finalize_checkpoint, record_run, save_float32, training_mode_from_env)
 
 # ---------- Train ----------
 def main():
     print("Starting LSTM training with settings:")
     print(f"  BASE_DIR = {BASE_DIR}")
     print(f"  IMG_SIZE = {IMG_SIZE}, BATCH = {BATCH}, EPOCHS = {EPOCHS}")
-    print(f"  DATA_PARALLEL_CALLS = {DATA_PARALLEL_CALLS}, PREFETCH = {PREFETCH}")
+    print(f"  RAM_BUDGET_MB = {RAM_BUDGET_MB}, DISK_CACHE = {DISK_CACHE}")
+    mode = training_mode_from_env()
+    print(f"  MODE = {describe_mode(mode)} (effective batch {BATCH * mode['accumulation_steps']})")
+    apply_precision(mode)
 
-    train_ds, val_ds, test_ds = make_image_datasets()
+    train_ds, val_ds, test_ds = make_image_datasets(
+        BASE_DIR, IMG_SIZE, BATCH, ram_budget_mb=RAM_BUDGET_MB, disk_cache=DISK_CACHE
+    )
 
     model = build_lstm(input_shape=(IMG_SIZE[0], IMG_SIZE[1], 3))
-    model.compile(
-        optimizer=tf.keras.optimizers.Adam(learning_rate=1e-4),
-        loss='binary_crossentropy',
-        metrics=['accuracy']
-    )
+    compile_model(model, mode, learning_rate=1e-4)
 
     model.summary()
 
+    throughput = ThroughputCallback(BATCH)
     callbacks = [
+        throughput,
         tf.keras.callbacks.ModelCheckpoint(str(MODEL_OUT), monitor="val_accuracy", save_best_only=True),
         tf.keras.callbacks.EarlyStopping(monitor="val_accuracy", patience=3, restore_best_weights=True),
         tf.keras.callbacks.ReduceLROnPlateau(monitor="val_loss", factor=0.5, patience=2)
@@ -124,8 +93,12 @@ def main():
         callbacks=callbacks
     )
 
+    test_loss, test_accuracy = model.evaluate(test_ds, verbose=0)
+    record_run("train_lstm", mode, BATCH, throughput, history, {"accuracy": test_accuracy, "loss": test_loss})
+
+    finalize_checkpoint(MODEL_OUT, mode)
     final_path = MODEL_DIR / "lstm_final.h5"
-    model.save(str(final_path))
+    save_float32(model, final_path, mode)
     print("Training finished. Best model:", MODEL_OUT)
     print("Final model saved:", final_path)
 
@@ -0,0 +1,122 @@
+# src/train_multihead.py
+"""
+Training script for the shared-trunk multi-head model (model_multihead.py).
+
+The CNN, ResNeXt and LSTM heads train jointly on one trunk, each with its
+own binary cross-entropy loss; the trunk learns from all three. Saves:
+
+    models/multihead_best.h5     three outputs (cnn, resnext, lstm), best val_loss
+    models/multihead_serving.h5  one averaged score, served with SERVING_MODE=multihead
+
+Run from src/ like the other training scripts:
+    python train_multihead.py
+"""
+
+import tensorflow as tf
+from pathlib import Path
+
+# ---------- GPU safety / memory settings ----------
+try:
+    gpus = tf.config.list_physical_devices("GPU")
+    if gpus:
+        for gpu in gpus:
+            tf.config.experimental.set_memory_growth(gpu, True)
+    else:
+        print("No GPU detected by TensorFlow.")
+except Exception as e:
+    print("GPU configuration failed:", e)
+
+# ---------- Data pipeline settings ----------
+RAM_BUDGET_MB = 3000
+DISK_CACHE = None          # e.g. "../cache/tfdata"
+
+# ---------- Config ----------
+BASE_DIR = "../data/Dataset"
+IMG_SIZE = (160, 160)
+BATCH = 8
+EPOCHS = 5
+MODEL_DIR = Path("models")
+MODEL_DIR.mkdir(parents=True, exist_ok=True)
+MODEL_OUT = MODEL_DIR / "multihead_best.h5"
+SERVING_OUT = MODEL_DIR / "multihead_serving.h5"
+LOG_DIR = Path("logs/multihead")
+LOG_DIR.mkdir(parents=True, exist_ok=True)
+
+# ---------- Imports (model, data, training mode) ----------
+from model_multihead import HEADS, build_multihead, serving_model
+from data_utils import make_image_datasets
+from eval_metrics import StreamingBinaryMetrics
+from training_modes import (ThroughputCallback, apply_precision, compile_model, describe_mode,
+                            finalize_checkpoint, record_run, training_mode_from_env)
+
+def per_head_labels(images, labels):
+    """Every head is trained on the same label."""
+    labels = tf.cast(labels, tf.float32)
+    return images, {name: labels for name in HEADS}
+
+def evaluate_heads(model, dataset):
+    """Test metrics for each head and for their average (what multihead_serving.h5 outputs)."""
+    metrics = {name: StreamingBinaryMetrics() for name in HEADS + ("ensemble",)}
+    for x_batch, y_batch in dataset:
+        outputs = model(x_batch, training=False)
+        scores = [output.numpy() for output in outputs]
+        for name, score in zip(HEADS, scores):
+            metrics[name].update(y_batch, score)
+        metrics["ensemble"].update(y_batch, sum(scores) / len(scores))
+    return {name: m.result() for name, m in metrics.items()}
+
+# ---------- Train ----------
+def main():
+    print("Starting multi-head training with settings:")
+    print(f"  BASE_DIR = {BASE_DIR}")
+    print(f"  IMG_SIZE = {IMG_SIZE}, BATCH = {BATCH}, EPOCHS = {EPOCHS}")
+    print(f"  RAM_BUDGET_MB = {RAM_BUDGET_MB}, DISK_CACHE = {DISK_CACHE}")
+    mode = training_mode_from_env()
+    print(f"  MODE = {describe_mode(mode)} (effective batch {BATCH * mode['accumulation_steps']})")
+    apply_precision(mode)
+
+    train_ds, val_ds, test_ds = make_image_datasets(
+        BASE_DIR, IMG_SIZE, BATCH, ram_budget_mb=RAM_BUDGET_MB, disk_cache=DISK_CACHE
+    )
+
+    model = build_multihead(input_shape=(IMG_SIZE[0], IMG_SIZE[1], 3))
+    compile_model(
+        model, mode, learning_rate=1e-4,
+        loss={name: 'binary_crossentropy' for name in HEADS},
+        metrics={name: ['accuracy'] for name in HEADS}
+    )
+
+    model.summary()
+
+    throughput = ThroughputCallback(BATCH)
+    callbacks = [
+        throughput,
+        tf.keras.callbacks.ModelCheckpoint(str(MODEL_OUT), monitor="val_loss", save_best_only=True),
+        tf.keras.callbacks.EarlyStopping(monitor="val_loss", patience=3, restore_best_weights=True),
+        tf.keras.callbacks.ReduceLROnPlateau(monitor="val_loss", factor=0.5, patience=2),
+        tf.keras.callbacks.TensorBoard(log_dir=str(LOG_DIR))
+    ]
+
+    history = model.fit(
+        train_ds.map(per_head_labels),
+        validation_data=val_ds.map(per_head_labels),
+        epochs=EPOCHS,
+        callbacks=callbacks
+    )
+
+    results = evaluate_heads(model, test_ds)
+    for name, metrics in results.items():
+        print(f"{name.upper():12s} - Accuracy: {metrics['accuracy']:.4f}, Loss: {metrics['loss']:.4f}, "
+              f"ROC-AUC: {metrics['roc_auc']:.4f}")
+    record_run("train_multihead", mode, BATCH, throughput, history, results["ensemble"],
+               val_metric="val_cnn_accuracy")
+
+    finalize_checkpoint(MODEL_OUT, mode)
+    # Served from the best checkpoint (already float32), not the last epoch's weights
+    best = tf.keras.models.load_model(str(MODEL_OUT), compile=False)
+    serving_model(best).save(str(SERVING_OUT))
+    print("Training finished. Best model:", MODEL_OUT)
+    print("Serving model saved:", SERVING_OUT)
+
+if __name__ == "__main__":
+    main()
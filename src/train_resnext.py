@@ -3,6 +3,8 @@ import tensorflow as tf
 from pathlib import Path
 from src.data_utils import make_image_datasets
 from src.model_resnext import build_resnext
+from src.training_modes import (ThroughputCallback, apply_precision, compile_model, describe_mode,
+                                finalize_checkpoint, record_run, save_float32, training_mode_from_env)
 
 # ---- SAFE SETTINGS (same as CNN) ----
 BASE_DIR = "../data/Dataset"
@@ -10,27 +12,37 @@ IMG_SIZE = (160, 160)
 BATCH = 8
 EPOCHS = 5
 
+# ---- Block configuration (see model_resnext.BLOCKS) ----
+BLOCK = "legacy"         # the architecture the ensemble's resnext_best.h5 has always had;
+                         # "grouped" trains the bottleneck block (a different model for every consumer)
+CARDINALITY = 8
+GROUP_WIDTH = None       # channels per group; None = half the block's output width
+
 # Make folders
 Path("src/models").mkdir(exist_ok=True)
 Path("src/logs/resnext").mkdir(parents=True, exist_ok=True)
 
 MODEL_OUT = "models/resnext_best.h5"
 
+# ---- Training mode (TRAIN_PRECISION / TRAIN_JIT / TRAIN_ACCUM_STEPS) ----
+mode = training_mode_from_env()
+print(f"Mode: {describe_mode(mode)} (effective batch {BATCH * mode['accumulation_steps']})")
+apply_precision(mode)
+
 # ---- Load data ----
 train_ds, val_ds, test_ds = make_image_datasets(BASE_DIR, IMG_SIZE, BATCH)
 
 # ---- Build ResNeXt ----
-model = build_resnext(input_shape=(IMG_SIZE[0], IMG_SIZE[1], 3))
-model.compile(
-    optimizer=tf.keras.optimizers.Adam(1e-4),
-    loss='binary_crossentropy',
-    metrics=['accuracy']
-)
+model = build_resnext(input_shape=(IMG_SIZE[0], IMG_SIZE[1], 3), block=BLOCK,
+                      cardinality=CARDINALITY, group_width=GROUP_WIDTH)
+compile_model(model, mode, learning_rate=1e-4)
 
 model.summary()
 
 # ---- Callbacks ----
+throughput = ThroughputCallback(BATCH)
 callbacks = [
+    throughput,
     tf.keras.callbacks.ModelCheckpoint(MODEL_OUT, save_best_only=True, monitor="val_accuracy"),
     tf.keras.callbacks.EarlyStopping(monitor="val_accuracy", patience=3, restore_best_weights=True)
 ]
@@ -43,5 +55,9 @@ history = model.fit(
     callbacks=callbacks
 )
 
-model.save("models/resnext_final.h5")
+test_loss, test_accuracy = model.evaluate(test_ds, verbose=0)
+record_run("train_resnext", mode, BATCH, throughput, history, {"accuracy": test_accuracy, "loss": test_loss})
+
+finalize_checkpoint(MODEL_OUT, mode)
+save_float32(model, "models/resnext_final.h5", mode)
 print("Saved:", "models/resnext_final.h5")
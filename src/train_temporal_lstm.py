@@ -0,0 +1,208 @@
+# src/train_temporal_lstm.py
+"""
+Training script for the temporal LSTM over video frame sequences.
+
+Unlike train_lstm.py (which treats the rows of one image as a sequence), this
+model sees real time: each video is sampled at a fixed stride, every sampled
+frame is encoded once by the trained basic CNN's conv blocks, and the LSTM
+is trained on overlapping windows of those frame embeddings.
+
+Frame embeddings are cached per video (keyed by video file and encoder), so
+re-running with a different window, hop or LSTM setting skips the CNN pass
+entirely.
+
+Expected layout (class folders as in data/Dataset):
+    data/Videos/{Train,Validation,Test}/{Fake,Real}/*.mp4
+
+Run from the project root (needs opencv-python-headless):
+    python -m src.train_temporal_lstm
+"""
+
+import hashlib
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+
+from serving.result_cache import model_identity
+from serving.temporal import sliding_windows
+from serving.video import FrameSampler
+from src.model_lstm import build_temporal_lstm, frame_encoder_from_cnn
+from src.training_modes import (ThroughputCallback, apply_precision, compile_model, describe_mode,
+                                finalize_checkpoint, record_run, training_mode_from_env)
+
+# ---------- GPU safety / memory settings ----------
+try:
+    gpus = tf.config.list_physical_devices("GPU")
+    if gpus:
+        for gpu in gpus:
+            tf.config.experimental.set_memory_growth(gpu, True)
+    else:
+        print("No GPU detected by TensorFlow.")
+except Exception as e:
+    print("GPU configuration failed:", e)
+
+# ---------- Config ----------
+VIDEO_DIR = Path("data/Videos")
+CLASS_NAMES = ["Fake", "Real"]  # alphabetical, as image_dataset_from_directory labels them
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".mkv", ".webm", ".avi"}
+MODEL_DIR = Path("src/models")
+CNN_PATH = MODEL_DIR / "basic_cnn_best.h5"
+ENCODER_OUT = MODEL_DIR / "temporal_encoder.h5"
+MODEL_OUT = MODEL_DIR / "temporal_lstm_best.h5"
+FEATURE_CACHE_DIR = Path("cache/temporal_features")
+LOG_DIR = Path("logs/temporal_lstm")
+
+# Sampling must match serving (VIDEO_STRIDE_SECONDS) so windows span the same time
+STRIDE_SECONDS = 0.5
+MAX_FRAMES_PER_VIDEO = 600
+ENCODE_BATCH = 64
+
+WINDOW = 16       # frames per LSTM window (8 s at a 0.5 s stride)
+WINDOW_HOP = 4    # frames between consecutive training windows
+BATCH = 32
+EPOCHS = 20
+
+# ---------- Feature extraction (cached) ----------
+def list_videos(split):
+    """(path, label) for every video in VIDEO_DIR/<split>/<class>/"""
+    items = []
+    for label, class_name in enumerate(CLASS_NAMES):
+        class_dir = VIDEO_DIR / split / class_name
+        if not class_dir.exists():
+            continue
+        items.extend(
+            (path, label) for path in sorted(class_dir.iterdir())
+            if path.suffix.lower() in VIDEO_EXTENSIONS
+        )
+    return items
+
+def feature_cache_path(video_path, encoder_id):
+    """Cache file for one video's embeddings; any change to video, encoder or sampling misses."""
+    stat = video_path.stat()
+    key = f"{video_path.resolve()}|{stat.st_size}|{int(stat.st_mtime)}|{encoder_id}|{STRIDE_SECONDS}|{MAX_FRAMES_PER_VIDEO}"
+    return FEATURE_CACHE_DIR / (hashlib.blake2b(key.encode(), digest_size=16).hexdigest() + ".npy")
+
+def extract_features(video_path, encoder, encoder_id):
+    """
+    Per-frame embeddings of shape (T, D) for one video, from cache when possible.
+
+    Frames are decoded and encoded ENCODE_BATCH at a time, so memory does not
+    grow with video length.
+    """
+    cache_path = feature_cache_path(video_path, encoder_id)
+    if cache_path.exists():
+        return np.load(cache_path)
+
+    height, width = encoder.input_shape[1:3]
+    sampler = FrameSampler(str(video_path), (width, height), mode="stride",
+                           stride_seconds=STRIDE_SECONDS, max_frames=MAX_FRAMES_PER_VIDEO)
+    chunks = []
+    try:
+        while True:
+            pixels, _ = sampler.next_batch(ENCODE_BATCH)
+            if not len(pixels):
+                break
+            chunks.append(encoder.predict(pixels.astype(np.float32) / 255.0, verbose=0))
+    finally:
+        sampler.close()
+
+    features = np.concatenate(chunks) if chunks else np.empty((0, encoder.output_shape[-1]), np.float32)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    np.save(cache_path, features.astype(np.float32))
+    return features
+
+def make_window_dataset(split, encoder, encoder_id, shuffle=False):
+    """
+    Windows of frame embeddings for every video in a split.
+
+    Returns:
+        (tf.data.Dataset of (window, label) batches, per-video window counts, video labels)
+    """
+    videos = list_videos(split)
+    if not videos:
+        raise FileNotFoundError(f"No videos found under {(VIDEO_DIR / split).resolve()}")
+
+    windows, labels, counts = [], [], []
+    for i, (path, label) in enumerate(videos):
+        features = extract_features(path, encoder, encoder_id)
+        video_windows = sliding_windows(features, WINDOW, WINDOW_HOP)
+        windows.append(video_windows)
+        labels.append(np.full(len(video_windows), label, dtype=np.float32))
+        counts.append(len(video_windows))
+        if (i + 1) % 50 == 0:
+            print(f"  {split}: encoded {i + 1}/{len(videos)} videos")
+
+    x = np.concatenate(windows)
+    y = np.concatenate(labels)
+    print(f"{split}: {len(videos)} videos -> {len(x)} windows")
+
+    ds = tf.data.Dataset.from_tensor_slices((x, y))
+    if shuffle:
+        ds = ds.shuffle(len(x), reshuffle_each_iteration=True)
+    ds = ds.batch(BATCH).prefetch(tf.data.AUTOTUNE)
+    return ds, counts, np.array([label for _, label in videos])
+
+def video_level_accuracy(window_scores, counts, video_labels):
+    """Accuracy when each video's verdict is the mean of its window scores."""
+    bounds = np.cumsum([0] + counts)
+    video_scores = np.array([window_scores[bounds[i]:bounds[i + 1]].mean() for i in range(len(counts))])
+    return float(np.mean((video_scores > 0.5).astype(int) == video_labels))
+
+# ---------- Train ----------
+def main():
+    print("Starting temporal LSTM training with settings:")
+    print(f"  VIDEO_DIR = {VIDEO_DIR}, CNN_PATH = {CNN_PATH}")
+    print(f"  STRIDE_SECONDS = {STRIDE_SECONDS}, WINDOW = {WINDOW}, WINDOW_HOP = {WINDOW_HOP}")
+    print(f"  BATCH = {BATCH}, EPOCHS = {EPOCHS}")
+    mode = training_mode_from_env()
+    print(f"  MODE = {describe_mode(mode)} (effective batch {BATCH * mode['accumulation_steps']})")
+
+    MODEL_DIR.mkdir(parents=True, exist_ok=True)
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+
+    # Frozen CNN conv blocks; saved next to the LSTM so serving encodes frames identically
+    cnn = tf.keras.models.load_model(str(CNN_PATH))
+    encoder = frame_encoder_from_cnn(cnn)
+    encoder.save(str(ENCODER_OUT))
+    encoder_id = model_identity(str(CNN_PATH))
+
+    train_ds, _, _ = make_window_dataset("Train", encoder, encoder_id, shuffle=True)
+    val_ds, _, _ = make_window_dataset("Validation", encoder, encoder_id)
+
+    # Only the LSTM trains under the mode; the encoder above stays float32 like serving's
+    apply_precision(mode)
+    model = build_temporal_lstm(window=WINDOW, feature_dim=encoder.output_shape[-1])
+    compile_model(model, mode, learning_rate=1e-3)
+    model.summary()
+
+    throughput = ThroughputCallback(BATCH)
+    callbacks = [
+        throughput,
+        tf.keras.callbacks.ModelCheckpoint(str(MODEL_OUT), monitor="val_accuracy", save_best_only=True),
+        tf.keras.callbacks.EarlyStopping(monitor="val_accuracy", patience=5, restore_best_weights=True),
+        tf.keras.callbacks.ReduceLROnPlateau(monitor="val_loss", factor=0.5, patience=2),
+        tf.keras.callbacks.TensorBoard(log_dir=str(LOG_DIR))
+    ]
+
+    history = model.fit(train_ds, validation_data=val_ds, epochs=EPOCHS, callbacks=callbacks)
+
+    test_metrics = None
+    try:
+        test_ds, counts, video_labels = make_window_dataset("Test", encoder, encoder_id)
+    except FileNotFoundError as e:
+        print(f"Skipping test evaluation: {e}")
+    else:
+        loss, accuracy = model.evaluate(test_ds, verbose=0)
+        scores = model.predict(test_ds, verbose=0).reshape(-1)
+        print(f"Test window accuracy: {accuracy:.4f} (loss {loss:.4f})")
+        print(f"Test video accuracy:  {video_level_accuracy(scores, counts, video_labels):.4f}")
+        test_metrics = {"accuracy": accuracy, "loss": loss}
+    record_run("train_temporal_lstm", mode, BATCH, throughput, history, test_metrics)
+    finalize_checkpoint(MODEL_OUT, mode)
+
+    print("Training finished. Best model:", MODEL_OUT)
+    print("Frame encoder saved:", ENCODER_OUT)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# src/training_modes.py
+"""
+Precision / compilation modes shared by the training scripts.
+
+Every train_*.py reads its mode from the environment, so the same script can
+be run once per mode and the results compared:
+
+    TRAIN_PRECISION    fp32 (default), mixed_float16, mixed_bfloat16, or auto
+                       (mixed_float16 on a GPU, mixed_bfloat16 on CPU)
+    TRAIN_JIT          1 to compile the train step with XLA (jit_compile)
+    TRAIN_ACCUM_STEPS  Apply gradients every N batches, for an effective
+                       batch of BATCH * N without the memory of a larger batch
+
+Under a mixed policy the model builders keep their sigmoid output in float32,
+and Keras wraps the optimizer in a LossScaleOptimizer for float16. Saved
+checkpoints are converted back to plain float32 models, so serving and the
+ensemble load them exactly as before.
+
+Each run appends its throughput and accuracy to logs/training_modes.jsonl;
+summarize them with:
+    python training_modes.py            (from src/, like the train scripts)
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+import tensorflow as tf
+
+PRECISIONS = ("fp32", "mixed_float16", "mixed_bfloat16", "auto")
+RUN_LOG = Path("logs/training_modes.jsonl")
+
+def training_mode_from_env():
+    """The mode requested through TRAIN_PRECISION / TRAIN_JIT / TRAIN_ACCUM_STEPS."""
+    precision = os.environ.get("TRAIN_PRECISION", "fp32").lower()
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown TRAIN_PRECISION: {precision!r} (expected one of {PRECISIONS})")
+    if precision == "auto":
+        precision = "mixed_float16" if tf.config.list_physical_devices("GPU") else "mixed_bfloat16"
+    accumulation_steps = int(os.environ.get("TRAIN_ACCUM_STEPS", "1"))
+    if accumulation_steps < 1:
+        raise ValueError("TRAIN_ACCUM_STEPS must be at least 1")
+    return {
+        "precision": precision,
+        "jit_compile": os.environ.get("TRAIN_JIT", "0").lower() in ("1", "true", "yes"),
+        "accumulation_steps": accumulation_steps,
+    }
+
+def describe_mode(mode):
+    parts = [mode["precision"]]
+    if mode["jit_compile"]:
+        parts.append("xla")
+    if mode["accumulation_steps"] > 1:
+        parts.append(f"accum{mode['accumulation_steps']}")
+    return "+".join(parts)
+
+def apply_precision(mode):
+    """Set the global dtype policy; call before building the model."""
+    policy = "float32" if mode["precision"] == "fp32" else mode["precision"]
+    tf.keras.mixed_precision.set_global_policy(policy)
+
+def make_optimizer(learning_rate, mode):
+    """
+    Adam, accumulating gradients over mode["accumulation_steps"] batches when
+    the optimizer supports it (Keras 3). Otherwise the returned optimizer has
+    no gradient_accumulation_steps and compile_model accumulates in train_step.
+    """
+    if mode["accumulation_steps"] == 1:
+        return tf.keras.optimizers.Adam(learning_rate=learning_rate)
+    try:
+        return tf.keras.optimizers.Adam(learning_rate=learning_rate,
+                                        gradient_accumulation_steps=mode["accumulation_steps"])
+    except (TypeError, ValueError):
+        # Keras 2 (TensorFlow <= 2.15) rejects the argument
+        return tf.keras.optimizers.Adam(learning_rate=learning_rate)
+
+def install_gradient_accumulation(model, steps):
+    """
+    Replace a compiled Keras 2 model's train_step with one that averages
+    gradients over `steps` batches and applies them once.
+
+    Only the instance's train_step changes, so the model saves and loads as
+    the plain functional model it is.
+    """
+    variables = model.trainable_variables
+    accumulated = [tf.Variable(tf.zeros_like(v), trainable=False) for v in variables]
+    batches = tf.Variable(0, dtype=tf.int64, trainable=False)
+    optimizer = model.optimizer
+    loss_scaled = isinstance(optimizer, tf.keras.mixed_precision.LossScaleOptimizer)
+
+    def apply_accumulated():
+        optimizer.apply_gradients(zip([a.read_value() for a in accumulated], variables))
+        for a in accumulated:
+            a.assign(tf.zeros_like(a))
+        return tf.constant(True)
+
+    def train_step(data):
+        x, y, sample_weight = tf.keras.utils.unpack_x_y_sample_weight(data)
+        with tf.GradientTape() as tape:
+            y_pred = model(x, training=True)
+            loss = model.compute_loss(x, y, y_pred, sample_weight)
+            scaled = optimizer.get_scaled_loss(loss) if loss_scaled else loss
+        gradients = tape.gradient(scaled, variables)
+        if loss_scaled:
+            gradients = optimizer.get_unscaled_gradients(gradients)
+        for a, g in zip(accumulated, gradients):
+            if g is not None:
+                a.assign_add(tf.cast(g, a.dtype) / steps)
+        batches.assign_add(1)
+        tf.cond(batches % steps == 0, apply_accumulated, lambda: tf.constant(False))
+        return model.compute_metrics(x, y, y_pred, sample_weight)
+
+    model.train_step = train_step
+    return model
+
+def compile_model(model, mode, learning_rate, loss='binary_crossentropy', metrics=('accuracy',)):
+    """Compile for the mode; loss and metrics may be per-output dicts for multi-output models."""
+    optimizer = make_optimizer(learning_rate, mode)
+    model.compile(
+        optimizer=optimizer,
+        loss=loss,
+        metrics=metrics if isinstance(metrics, dict) else list(metrics),
+        jit_compile=mode["jit_compile"]
+    )
+    if mode["accumulation_steps"] > 1 and not getattr(optimizer, "gradient_accumulation_steps", None):
+        install_gradient_accumulation(model, mode["accumulation_steps"])
+    return model
+
+class ThroughputCallback(tf.keras.callbacks.Callback):
+    """Training images/s per epoch (validation excluded)."""
+
+    def __init__(self, batch_size):
+        super().__init__()
+        self.batch_size = batch_size
+        self.epoch_seconds = []
+        self.images_per_second = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+        self._end = self._start
+        self._steps = 0
+
+    def on_train_batch_end(self, batch, logs=None):
+        self._steps += 1
+        self._end = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = max(self._end - self._start, 1e-9)
+        self.epoch_seconds.append(elapsed)
+        self.images_per_second.append(self._steps * self.batch_size / elapsed)
+
+    def steady_images_per_second(self):
+        """Median over epochs after the first, which includes tracing and XLA compilation."""
+        rates = sorted(self.images_per_second[1:] or self.images_per_second)
+        return rates[len(rates) // 2] if rates else None
+
+def as_float32(model):
+    """A float32 copy of a functional model trained under a mixed policy (weights are already float32)."""
+    config = model.get_config()
+    for layer in config["layers"]:
+        layer["config"]["dtype"] = "float32"
+    clone = tf.keras.Model.from_config(config)
+    clone.set_weights(model.get_weights())
+    return clone
+
+def save_float32(model, path, mode):
+    """Save `model`, converted to float32 if it was trained under a mixed policy."""
+    if mode["precision"] != "fp32":
+        model = as_float32(model)
+    model.save(str(path))
+
+def finalize_checkpoint(path, mode):
+    """Rewrite a ModelCheckpoint file saved under a mixed policy as a float32 model."""
+    path = Path(path)
+    if mode["precision"] == "fp32" or not path.exists():
+        return
+    save_float32(tf.keras.models.load_model(str(path), compile=False), path, mode)
+
+def record_run(script, mode, batch, throughput, history, test_metrics=None, log_path=RUN_LOG,
+               val_metric="val_accuracy"):
+    """Append one run's throughput and accuracy to the comparison log."""
+    val_accuracy = history.history.get(val_metric, [])
+    entry = {
+        "script": script,
+        "mode": describe_mode(mode),
+        **mode,
+        "batch": batch,
+        "effective_batch": batch * mode["accumulation_steps"],
+        "device": "gpu" if tf.config.list_physical_devices("GPU") else "cpu",
+        "epochs": len(throughput.epoch_seconds),
+        "first_epoch_seconds": round(throughput.epoch_seconds[0], 2) if throughput.epoch_seconds else None,
+        "images_per_second": round(throughput.steady_images_per_second() or 0.0, 1),
+        "best_val_accuracy": round(max(val_accuracy), 4) if val_accuracy else None,
+        "test_accuracy": round(test_metrics["accuracy"], 4) if test_metrics else None,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    log_path = Path(log_path)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_path, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+    print(f"Recorded {entry['mode']}: {entry['images_per_second']} img/s, "
+          f"best val_accuracy {entry['best_val_accuracy']}, test accuracy {entry['test_accuracy']}")
+    return entry
+
+def main():
+    if not RUN_LOG.exists():
+        print(f"No runs recorded yet in {RUN_LOG.resolve()}")
+        return
+    entries = [json.loads(line) for line in RUN_LOG.read_text().splitlines() if line.strip()]
+    print(f"{'script':22s} {'mode':28s} {'device':6s} {'eff. batch':>10s} {'img/s':>8s} "
+          f"{'1st epoch s':>11s} {'val acc':>8s} {'test acc':>8s}")
+    for e in entries:
+        print(f"{e['script']:22s} {e['mode']:28s} {e['device']:6s} {e['effective_batch']:>10d} "
+              f"{e['images_per_second']:>8.1f} {e['first_epoch_seconds'] or 0:>11.1f} "
+              f"{e['best_val_accuracy'] or 0:>8.4f} {e['test_accuracy'] or 0:>8.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# tests/test_archives.py
+import io
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+from serving.archives import extract_images
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+def zip_bytes(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+def corrupt_zip():
+    """A zip whose directory is intact but whose compressed member data is not."""
+    data = bytearray(zip_bytes({"a.png": PNG * 50}))
+    offset = data.index(b"a.png") + len("a.png")
+    data[offset:offset + 16] = b"\xff" * 16
+    return bytes(data)
+
+
+def test_extract_images_reads_zip():
+    members = extract_images(zip_bytes({"a.png": PNG, "notes.txt": b"x"}), max_files=10, max_member_bytes=1 << 20)
+    assert members == [("a.png", PNG, None)]
+
+
+@pytest.mark.parametrize("data", [corrupt_zip(), b"not an archive at all"])
+def test_extract_images_rejects_corrupt_archives(data):
+    with pytest.raises(ValueError, match="corrupt archive"):
+        extract_images(data, max_files=10, max_member_bytes=1 << 20)
+
+
+@pytest.mark.parametrize("data", [corrupt_zip(), b"not an archive at all"])
+def test_batch_endpoint_reports_corrupt_archives_per_file(monkeypatch, data):
+    monkeypatch.setattr(app, "require_ready", lambda: None)
+    monkeypatch.setattr(app, "result_cache", None)
+    client = TestClient(app.app)
+    response = client.post("/predict/batch", files=[
+        ("files", ("upload.zip", data, "application/zip")),
+        ("files", ("notes.txt", b"hello", "text/plain")),
+    ])
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == 2 and body["failed"] == 2
+    archive, other = body["results"]
+    assert archive["filename"] == "upload.zip" and "corrupt archive" in archive["error"]
+    assert other["filename"] == "notes.txt"
@@ -0,0 +1,81 @@
+# tests/test_backends.py
+"""
+TFLiteBackend's batch-size buckets, with a fake tflite_runtime interpreter
+that scores each row as the mean of its pixels.
+"""
+
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from serving.backends import TFLiteBackend
+
+
+class FakeInterpreter:
+    instances = []
+
+    def __init__(self, model_path, num_threads=None):
+        self.shape = [1, 8, 8, 3]
+        self.allocations = 0
+        self.resizes = 0
+        FakeInterpreter.instances.append(self)
+
+    def get_input_details(self):
+        return [{"index": 0, "shape": np.array(self.shape), "dtype": np.float32, "quantization": (0.0, 0)}]
+
+    def get_output_details(self):
+        return [{"index": 1, "shape": np.array([self.shape[0], 1]), "dtype": np.float32, "quantization": (0.0, 0)}]
+
+    def resize_tensor_input(self, index, shape):
+        self.shape = list(shape)
+        self.resizes += 1
+
+    def allocate_tensors(self):
+        self.allocations += 1
+
+    def set_tensor(self, index, value):
+        assert list(value.shape) == self.shape
+        self.input = value
+
+    def invoke(self):
+        self.output = self.input.reshape(len(self.input), -1).mean(axis=1, keepdims=True)
+
+    def get_tensor(self, index):
+        return self.output
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    runtime = types.ModuleType("tflite_runtime")
+    interpreter = types.ModuleType("tflite_runtime.interpreter")
+    interpreter.Interpreter = FakeInterpreter
+    monkeypatch.setitem(sys.modules, "tflite_runtime", runtime)
+    monkeypatch.setitem(sys.modules, "tflite_runtime.interpreter", interpreter)
+    FakeInterpreter.instances = []
+    return TFLiteBackend("model.tflite", buckets=(1, 4, 16))
+
+
+def test_one_interpreter_per_bucket_allocated_once(backend):
+    backend.warm_up()
+    allocations = sum(i.allocations for i in FakeInterpreter.instances)
+    assert sorted(i.shape[0] for i in FakeInterpreter.instances) == [1, 4, 16]
+
+    rng = np.random.default_rng(0)
+    for n in (3, 1, 7, 16, 2, 40, 5):
+        batch = rng.random((n, 8, 8, 3), dtype=np.float32)
+        scores = backend.predict(batch)
+        assert scores.shape == (n, 1)
+        np.testing.assert_allclose(scores[:, 0], batch.reshape(n, -1).mean(axis=1), rtol=1e-6)
+
+    # Varying batch sizes never reallocate: they are padded to a bucket
+    assert sum(i.allocations for i in FakeInterpreter.instances) == allocations
+    assert len(FakeInterpreter.instances) == 3
+    # 3->4, 7->16, 2->4, 40 = 16+16+8->16, 5->16 (warm-up pads nothing)
+    assert backend.stats()["padded_rows"] == 1 + 9 + 2 + 8 + 11
+
+
+def test_input_size_and_empty_batch(backend):
+    assert backend.input_size == (8, 8)
+    assert backend.predict(np.zeros((0, 8, 8, 3), np.float32)).shape == (0, 1)
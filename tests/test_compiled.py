@@ -0,0 +1,65 @@
+# tests/test_compiled.py
+"""
+CompiledPredictor's trace/compile accounting. tf.function is faked with one
+that traces (runs the Python function) on its first call only, as a
+tf.function with a fixed input_signature does.
+"""
+
+import importlib.util
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+
+def fake_tensorflow():
+    tf = types.ModuleType("tensorflow")
+    tf.float32 = np.float32
+    tf.TensorSpec = lambda shape, dtype: (shape, dtype)
+    tf.zeros = np.zeros
+
+    def function(fn, input_signature=None, jit_compile=False):
+        traced = []
+
+        def call(x):
+            if not traced:
+                traced.append(True)
+                fn(x)
+            return x[:, :1, 0, 0]
+        return call
+    tf.function = function
+    return tf
+
+
+@pytest.fixture
+def compiled(monkeypatch):
+    monkeypatch.setitem(sys.modules, "tensorflow", fake_tensorflow())
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "serving", "compiled.py")
+    spec = importlib.util.spec_from_file_location("compiled_under_test", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeModel:
+    input_shape = (None, 4, 4, 3)
+
+    def __call__(self, x, training=False):
+        return x
+
+
+def test_repeated_warm_up_does_not_count_as_compiles(compiled):
+    predictor = compiled.CompiledPredictor(FakeModel(), buckets=(1, 4))
+    assert predictor.stats()["compiles"] == 2
+    predictor.warm_up()
+    predictor.warm_up()
+    stats = predictor.stats()
+    assert stats["compiles"] == 2 and stats["traces"] == 2
+    assert stats["traces_per_bucket"] == {"1": 1, "4": 1}
+
+
+def test_unwarmed_predictor_reports_no_compiles(compiled):
+    predictor = compiled.CompiledPredictor(FakeModel(), buckets=(1, 4), warm=False)
+    assert predictor.stats()["compiles"] == 0
@@ -0,0 +1,80 @@
+# tests/test_model_ensemble.py
+"""
+EnsembleModel.predict_parallel's latency budget. Members are plain Python
+objects, so TensorFlow is replaced by an empty module just for the import.
+"""
+
+import importlib.util
+import os
+import sys
+import threading
+import types
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def model_ensemble(monkeypatch):
+    monkeypatch.setitem(sys.modules, "tensorflow", types.ModuleType("tensorflow"))
+    # Loaded under its own name so the TensorFlow-less copy never lands in sys.modules
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "model_ensemble.py")
+    spec = importlib.util.spec_from_file_location("model_ensemble_under_test", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeMember:
+    def __init__(self, score):
+        self.score = score
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def predict(self, x, verbose=0):
+        self.calls += 1
+        self.release.wait()
+        return np.full((len(x), 1), self.score, dtype=np.float32)
+
+
+def make_ensemble(model_ensemble, members):
+    class Ensemble(model_ensemble.EnsembleModel):
+        def _load_models(self):
+            self.models.update(members)
+    return Ensemble(model_paths={name: name for name in members})
+
+
+def test_skipped_member_is_probed_again(model_ensemble):
+    members = {"cnn": FakeMember(0.2), "lstm": FakeMember(0.8)}
+    ensemble = make_ensemble(model_ensemble, members)
+    ensemble.member_latency_ms = {"cnn": 1.0, "lstm": 500.0}  # one slow call
+    x = np.zeros((2, 4), dtype=np.float32)
+
+    for _ in range(model_ensemble.LATENCY_REPROBE_CALLS - 1):
+        _, _, dropped = ensemble.predict_parallel(x, latency_budget_ms=100)
+        assert dropped == ["lstm"]
+    assert members["lstm"].calls == 0
+
+    _, predictions, dropped = ensemble.predict_parallel(x, latency_budget_ms=100)
+    assert dropped == [] and set(predictions) == {"cnn", "lstm"}
+    assert ensemble.member_latency_ms["lstm"] < 500.0
+
+
+def test_member_still_running_gets_no_new_work(model_ensemble):
+    members = {"cnn": FakeMember(0.2), "lstm": FakeMember(0.8)}
+    ensemble = make_ensemble(model_ensemble, members)
+    x = np.zeros((2, 4), dtype=np.float32)
+    members["lstm"].release.clear()
+
+    _, _, dropped = ensemble.predict_parallel(x, latency_budget_ms=50)
+    assert dropped == ["lstm"]
+    _, predictions, dropped = ensemble.predict_parallel(x, latency_budget_ms=50)
+    assert dropped == ["lstm"] and set(predictions) == {"cnn"}
+    assert members["lstm"].calls == 1
+
+    members["lstm"].release.set()
+    ensemble._member_in_flight["lstm"].result(timeout=5)
+    _, predictions, _ = ensemble.predict_parallel(x)
+    assert set(predictions) == {"cnn", "lstm"}
+    assert members["lstm"].calls == 2
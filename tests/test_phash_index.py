@@ -0,0 +1,71 @@
+# tests/test_phash_index.py
+import numpy as np
+import pytest
+
+from serving.phash_index import HASH_BITS, PerceptualHashIndex, _popcount
+
+
+def random_hashes(rng, count):
+    return rng.integers(0, 1 << 63, size=count, dtype=np.int64).view(np.uint64) << np.uint64(1)
+
+
+def flip_bits(value, distance, rng):
+    for bit in rng.choice(HASH_BITS, size=distance, replace=False):
+        value ^= 1 << int(bit)
+    return value
+
+
+def brute_force(index, query):
+    stored = index._hashes[:len(index)]
+    return int(_popcount(np.bitwise_xor(stored, np.uint64(query))).min())
+
+
+@pytest.mark.parametrize("max_distance", [0, 4, 8, 15, 20])
+def test_query_matches_brute_force(max_distance):
+    rng = np.random.default_rng(max_distance)
+    # Small capacity and tail: the ring wraps and the tables are rebuilt along the way
+    index = PerceptualHashIndex(max_entries=3000, tail_size=500)
+    for i, value in enumerate(random_hashes(rng, 5000)):
+        index.add(int(value), float(i))
+    index.rebuild()
+    for value in random_hashes(rng, 50):
+        index.add(int(value), 0.5)  # some entries only in the tail
+
+    stored = index._hashes[:len(index)]
+    for _ in range(200):
+        query = flip_bits(int(stored[rng.integers(len(stored))]), int(rng.integers(0, max_distance + 3)), rng)
+        expected = brute_force(index, query)
+        result = index.query(query, max_distance)
+        if expected <= max_distance:
+            assert result is not None and result[1] == expected
+        else:
+            assert result is None
+
+
+def test_save_and_load_keep_matches(tmp_path):
+    rng = np.random.default_rng(0)
+    index = PerceptualHashIndex()
+    hashes = random_hashes(rng, 2000)
+    for i, value in enumerate(hashes):
+        index.add(int(value), i / 2000)
+    path = tmp_path / "index.npz"
+    index.save(path, model_id="m1")
+
+    loaded = PerceptualHashIndex.load(path, model_id="m1")
+    assert loaded.stats()["unindexed_entries"] == 0
+    score, distance = loaded.query(flip_bits(int(hashes[1234]), 3, rng), 4)
+    assert distance == 3 and score == pytest.approx(1234 / 2000)
+    assert len(PerceptualHashIndex.load(path, model_id="m2")) == 0
+
+
+def test_lookup_compares_a_small_fraction_at_scale(tmp_path):
+    rng = np.random.default_rng(0)
+    entries = 1_000_000
+    path = tmp_path / "index.npz"
+    np.savez(path, hashes=random_hashes(rng, entries), scores=np.zeros(entries, dtype=np.float32),
+             next=np.int64(0), model_id=np.str_(""))
+    index = PerceptualHashIndex.load(path, max_entries=entries)
+
+    candidates = index._candidates(np.uint64(index._hashes[42]), 4)
+    assert 42 in candidates
+    assert len(candidates) < entries // 500
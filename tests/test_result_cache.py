@@ -0,0 +1,98 @@
+# tests/test_result_cache.py
+import asyncio
+import sqlite3
+import time
+
+from serving.result_cache import ResultCache
+
+
+def disk_rows(path):
+    with sqlite3.connect(path) as db:
+        return dict(db.execute("SELECT key, score FROM results").fetchall())
+
+
+def test_put_is_written_in_batches(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResultCache(max_entries=10, disk_path=path, flush_interval=60)
+    for i in range(5):
+        cache.put(f"k{i}", i / 10)
+    # Nothing is committed from put(); the writer flushes on its interval or at close
+    assert disk_rows(path) == {}
+    assert cache.get("k3") == 0.3
+    cache.close()
+    assert disk_rows(path) == {f"k{i}": i / 10 for i in range(5)}
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResultCache(disk_path=path, flush_interval=0.01)
+    cache.put("key", 0.25)
+    cache.close()
+
+    reopened = ResultCache(disk_path=path)
+    assert reopened.get("key") == 0.25
+    assert reopened.stats()["disk_hits"] == 1
+    reopened.close()
+
+
+def test_expired_rows_are_purged_at_startup(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResultCache(disk_path=path)
+    cache.close()
+    with sqlite3.connect(path) as db:
+        db.execute("INSERT INTO results (key, score, created) VALUES ('old', 0.9, ?)", (time.time() - 100,))
+        db.execute("INSERT INTO results (key, score, created) VALUES ('new', 0.1, ?)", (time.time(),))
+
+    cache = ResultCache(ttl_seconds=50, disk_path=path, flush_interval=0.01)
+    cache.close()
+    assert disk_rows(path) == {"new": 0.1}
+    assert cache.purged == 1
+
+
+class CheckingConnection:
+    """sqlite3 connection whose commit first runs a callback (what a concurrent get() would see)."""
+
+    def __init__(self, path, before_commit):
+        self._db = sqlite3.connect(path)
+        self._before_commit = before_commit
+
+    def executemany(self, *args):
+        return self._db.executemany(*args)
+
+    def commit(self):
+        self._before_commit()
+        self._db.commit()
+
+
+def test_pending_entries_stay_readable_until_committed(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResultCache(max_entries=1, disk_path=path, flush_interval=60)
+    cache.put("k1", 0.1)
+    cache.put("k2", 0.2)  # evicts k1 from memory: only the pending write has it
+
+    seen = {}
+
+    def before_commit():
+        seen["k1"] = cache.get("k1")
+        cache.put("k2", 0.3)  # replaced while the old value is being written
+
+    cache._flush(CheckingConnection(path, before_commit))
+    assert seen["k1"] == 0.1
+    assert cache.stats()["misses"] == 0
+    assert "k1" not in cache._pending and cache._pending["k2"][0] == 0.3
+    cache.close()
+    assert disk_rows(path) == {"k1": 0.1, "k2": 0.3}
+
+
+def test_aget_reads_the_disk_tier(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResultCache(disk_path=path, flush_interval=0.01)
+    cache.put("key", 0.75)
+    cache.close()
+
+    reopened = ResultCache(disk_path=path)
+    assert asyncio.run(reopened.aget("key")) == 0.75
+    assert asyncio.run(reopened.aget("missing")) is None
+    stats = reopened.stats()
+    assert stats["disk_hits"] == 1 and stats["misses"] == 1
+    reopened.close()
@@ -0,0 +1,34 @@
+# tests/test_score_bulk.py
+import argparse
+
+import score_bulk
+
+
+def make_args(tmp_path, **overrides):
+    settings = {"shard_size": 10000, "format": "jsonl", "model": str(tmp_path / "model.h5"),
+                "backend": "keras", "no_draft": False}
+    settings.update(overrides)
+    return argparse.Namespace(**settings)
+
+
+def test_resume_with_same_settings(tmp_path):
+    assert score_bulk.frozen_run_config(make_args(tmp_path), tmp_path) == []
+    assert (tmp_path / "run.json").exists()
+    assert score_bulk.frozen_run_config(make_args(tmp_path), tmp_path) == []
+
+
+def test_resume_with_different_settings_is_refused(tmp_path):
+    score_bulk.frozen_run_config(make_args(tmp_path), tmp_path)
+    changed = score_bulk.frozen_run_config(make_args(tmp_path, shard_size=500, format="csv"), tmp_path)
+    assert len(changed) == 2
+    assert any(c.startswith("shard_size:") for c in changed)
+    assert any(c.startswith("format:") for c in changed)
+
+
+def test_resume_with_retrained_model_is_refused(tmp_path):
+    model = tmp_path / "model.h5"
+    model.write_bytes(b"v1")
+    score_bulk.frozen_run_config(make_args(tmp_path), tmp_path)
+    model.write_bytes(b"version 2")
+    changed = score_bulk.frozen_run_config(make_args(tmp_path), tmp_path)
+    assert [c.split(":")[0] for c in changed] == ["model_file"]
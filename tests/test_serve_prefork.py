@@ -0,0 +1,25 @@
+# tests/test_serve_prefork.py
+import importlib.util
+
+import pytest
+
+import serve_prefork
+
+
+@pytest.mark.parametrize("installed", [True, False])
+def test_tflite_is_preloaded_only_with_tflite_runtime(monkeypatch, installed):
+    real_find_spec = importlib.util.find_spec
+
+    def find_spec(name, *args):
+        if name == "tflite_runtime":
+            return object() if installed else None
+        return real_find_spec(name, *args)
+
+    monkeypatch.setattr(importlib.util, "find_spec", find_spec)
+    assert serve_prefork.fork_safe("single", "tflite") == installed
+    assert serve_prefork.fork_safe("single", "tflite_int8") == installed
+
+
+@pytest.mark.parametrize("mode,backend", [("single", "keras"), ("single", "onnx"), ("ensemble", "tflite")])
+def test_tensorflow_backends_load_in_the_workers(mode, backend):
+    assert not serve_prefork.fork_safe(mode, backend)
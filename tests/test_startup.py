@@ -0,0 +1,110 @@
+# tests/test_startup.py
+"""
+Startup wiring of app.load_model.
+
+TensorFlow-backed modules (src.model_ensemble, serving.compiled) are replaced
+by lightweight fakes, so these tests check how the app imports and configures
+them, not inference itself.
+"""
+
+import sys
+import types
+
+import pytest
+
+import app
+
+
+class FakeKerasModel:
+    input_shape = (None, 160, 160, 3)
+
+
+class FakeEnsemble:
+    def __init__(self, model_paths=None, cascade_band=None, member_wrapper=None, wrap_members=True, **kwargs):
+        self.model_paths = model_paths
+        self.cascade_band = cascade_band
+        self.member_wrapper = member_wrapper
+        self.options = kwargs
+        self.models = {name: FakeKerasModel() for name in model_paths}
+        self.predictors = {}
+        if member_wrapper is not None and wrap_members:
+            self.predictors = {name: member_wrapper(m) for name, m in self.models.items()}
+        self.fused_predictor = None
+        self.fused = False
+
+    def fuse(self):
+        self.fused = True
+        if self.member_wrapper is not None:
+            self.fused_predictor = self.member_wrapper(FakeKerasModel())
+
+
+class FakeCompiledPredictor:
+    def __init__(self, model, buckets=None, jit_compile=False):
+        self.model = model
+
+    def stats(self):
+        return {"traces": 1}
+
+
+@pytest.fixture
+def ensemble_mode(monkeypatch, tmp_path):
+    paths = {}
+    for name in ("cnn", "resnext", "lstm"):
+        path = tmp_path / f"{name}.h5"
+        path.write_bytes(b"weights")
+        paths[name] = str(path)
+
+    fake_ensemble = types.ModuleType("src.model_ensemble")
+    fake_ensemble.EnsembleModel = FakeEnsemble
+    fake_compiled = types.ModuleType("serving.compiled")
+    fake_compiled.CompiledPredictor = FakeCompiledPredictor
+    monkeypatch.setitem(sys.modules, "src.model_ensemble", fake_ensemble)
+    monkeypatch.setitem(sys.modules, "serving.compiled", fake_compiled)
+
+    monkeypatch.setattr(app, "configure_gpu", lambda: None)
+    monkeypatch.setattr(app, "SERVING_MODE", "ensemble")
+    monkeypatch.setattr(app, "ENSEMBLE_MODEL_PATHS", paths)
+    monkeypatch.setattr(app, "ENSEMBLE_WEIGHTS_PATH", str(tmp_path / "missing.json"))
+    monkeypatch.setattr(app, "ensemble", None)
+    monkeypatch.setattr(app, "model", None)
+    monkeypatch.setattr(app, "model_id", None)
+    monkeypatch.setattr(app, "input_size", app.IMAGE_SIZE)
+    return paths
+
+
+@pytest.mark.parametrize("strategy", ["parallel", "fused", "cascade"])
+@pytest.mark.parametrize("compiled", [True, False])
+def test_load_model_serves_ensemble(ensemble_mode, monkeypatch, strategy, compiled):
+    monkeypatch.setattr(app, "ENSEMBLE_STRATEGY", strategy)
+    monkeypatch.setattr(app, "INFERENCE_COMPILE", compiled)
+
+    app.load_model()
+
+    assert isinstance(app.ensemble, FakeEnsemble)
+    assert app.ensemble.model_paths == ensemble_mode
+    assert app.ensemble.fused == (strategy == "fused")
+    assert (app.ensemble.member_wrapper is not None) == compiled
+    assert app.input_size == (160, 160)
+    assert app.model_id.startswith("ensemble:cnn.h5-")
+    assert app.is_model_loaded()
+
+
+@pytest.mark.parametrize("strategy", ["parallel", "cascade"])
+def test_member_strategies_compile_members(ensemble_mode, monkeypatch, strategy):
+    monkeypatch.setattr(app, "ENSEMBLE_STRATEGY", strategy)
+    monkeypatch.setattr(app, "INFERENCE_COMPILE", True)
+
+    app.load_model()
+
+    assert set(app.ensemble.predictors) == set(ensemble_mode)
+    assert set(app.compiled_stats()) == set(ensemble_mode)
+
+
+def test_fused_strategy_compiles_only_the_fused_graph(ensemble_mode, monkeypatch):
+    monkeypatch.setattr(app, "ENSEMBLE_STRATEGY", "fused")
+    monkeypatch.setattr(app, "INFERENCE_COMPILE", True)
+
+    app.load_model()
+
+    assert app.ensemble.predictors == {}
+    assert app.compiled_stats() == {"fused": {"traces": 1}}
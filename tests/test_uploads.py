@@ -0,0 +1,157 @@
+# tests/test_uploads.py
+import asyncio
+import io
+
+import pytest
+
+from serving.uploads import (
+    SNIFF_BYTES,
+    UnsupportedImageError,
+    UploadLimitMiddleware,
+    UploadTooLargeError,
+    read_upload,
+)
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 64
+
+
+class NoReadintoFile:
+    """File object without readinto, like SpooledTemporaryFile before Python 3.11."""
+
+    def __init__(self, data):
+        self._file = io.BytesIO(data)
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def seek(self, offset, whence=0):
+        return self._file.seek(offset, whence)
+
+
+class FakeUpload:
+    def __init__(self, fileobj, size):
+        self.file = fileobj
+        self.size = size
+
+
+def test_read_upload_with_readinto():
+    view, image_type = asyncio.run(read_upload(FakeUpload(io.BytesIO(PNG), len(PNG)), max_bytes=1 << 20))
+    assert image_type == "PNG"
+    assert bytes(view) == PNG
+
+
+def test_read_upload_without_readinto():
+    # Longer than the sniffed header, so the rest of the file goes through _readinto_all
+    assert len(PNG) > SNIFF_BYTES
+    upload = FakeUpload(NoReadintoFile(PNG), len(PNG))
+    assert not hasattr(upload.file, "readinto")
+    view, image_type = asyncio.run(read_upload(upload, max_bytes=1 << 20))
+    assert image_type == "PNG"
+    assert bytes(view) == PNG
+
+
+def test_read_upload_rejects_non_images():
+    upload = FakeUpload(io.BytesIO(b"%PDF-1.7" + bytes(64)), 72)
+    with pytest.raises(UnsupportedImageError):
+        asyncio.run(read_upload(upload, max_bytes=1 << 20))
+
+
+@pytest.mark.parametrize("size", [len(PNG), None])
+def test_read_upload_rejects_oversized_files(size):
+    # With the part size known the file is refused up front; without it, while reading
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(read_upload(FakeUpload(io.BytesIO(PNG), size), max_bytes=len(PNG) - 1))
+
+
+# ---------- UploadLimitMiddleware ----------
+BOUNDARY = b"testboundary"
+
+
+def multipart_body(filename, data):
+    return (b"--" + BOUNDARY + b"\r\n"
+            + b'Content-Disposition: form-data; name="file"; filename="' + filename + b'"\r\n'
+            + b"Content-Type: image/png\r\n\r\n" + data + b"\r\n--" + BOUNDARY + b"--\r\n")
+
+
+def run_middleware(middleware_kwargs, chunks, path="/predict", content_length=True):
+    """Send `chunks` as one request; returns (status, body the app received or None)."""
+    seen = {}
+
+    async def app(scope, receive, send):
+        body = b""
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                raise RuntimeError("client disconnected")
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        seen["body"] = body
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    headers = [(b"content-type", b"multipart/form-data; boundary=" + BOUNDARY)]
+    if content_length:
+        headers.append((b"content-length", str(sum(map(len, chunks))).encode()))
+    scope = {"type": "http", "path": path, "headers": headers}
+    messages = [{"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(UploadLimitMiddleware(app, **middleware_kwargs)(scope, receive, send))
+    return sent[0]["status"], seen.get("body")
+
+
+def test_middleware_rejects_declared_oversized_body():
+    body = multipart_body(b"a.png", PNG)
+    status, received = run_middleware({"max_bytes": len(body) - 1}, [body])
+    assert status == 413 and received is None
+
+
+def test_middleware_rejects_chunked_body_once_it_passes_the_limit():
+    body = multipart_body(b"a.png", PNG)
+    chunks = [body[i:i + 1024] for i in range(0, len(body), 1024)]
+    status, received = run_middleware({"max_bytes": len(body) - 1}, chunks, content_length=False)
+    assert status == 413 and received is None
+
+
+@pytest.mark.parametrize("split", [5, 100, 10_000])
+def test_middleware_passes_images_through_unchanged(split):
+    body = multipart_body(b"a.png", PNG)
+    chunks = [body[:split], body[split:]]
+    status, received = run_middleware({"max_bytes": 1 << 20, "image_paths": ("/predict",)}, chunks)
+    assert status == 200 and received == body
+
+
+def test_middleware_rejects_non_image_from_its_first_bytes():
+    body = multipart_body(b"doc.pdf", b"%PDF-1.7" + bytes(200_000))
+    chunks = [body[i:i + 4096] for i in range(0, len(body), 4096)]
+    status, received = run_middleware({"max_bytes": 1 << 20, "image_paths": ("/predict",)}, chunks)
+    assert status == 400 and received is None
+
+
+def test_middleware_only_sniffs_image_paths():
+    body = multipart_body(b"clip.mp4", b"\x00\x00\x00\x18ftypmp42" + bytes(64))
+    status, received = run_middleware({"max_bytes": 1 << 20, "image_paths": ("/predict",)}, [body],
+                                      path="/predict/video")
+    assert status == 200 and received == body
+
+
+def test_middleware_rejections_carry_cors_headers():
+    from fastapi.testclient import TestClient
+
+    import app
+
+    client = TestClient(app.app)
+    response = client.post("/predict", headers={"Origin": "http://localhost:3000"},
+                           files={"file": ("doc.pdf", b"%PDF-1.7" + bytes(64), "image/png")})
+    assert response.status_code == 400
+    assert response.headers["access-control-allow-origin"] == "http://localhost:3000"